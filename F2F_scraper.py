@@ -1,61 +1,123 @@
-import decimal as dec
 import logging
 import re
 from bs4 import PageElement
+from lxml import etree
+from lxml.html import HtmlElement
 import config
-import utils
-from classes import Card, CardCondition
+from card_store import CardStore
+from name_index import same_card
+from normalization import F2F_CONDITIONS, find_frame, price_cents, strip_title_notes
+from parsing import FindNext, xpath_class
 
 
-def create_card_batch_F2F(keyword: str, item: PageElement) -> list[Card] | None:
+_find_title = FindNext("hawk-results__hawk-contentTitle")
+_find_subtitle = FindNext("hawk-results__hawk-contentSubtitle")
+_finish_xpath = etree.XPath(".//*[contains(@id, 'finish_')]/@value", smart_strings=False)
+_condition_xpath = etree.XPath(".//*[contains(@id, 'condition_')]/@value", smart_strings=False)
+_price_xpath = etree.XPath(f".//*[{xpath_class('hawkPrice')}]")
+_stock_xpath = etree.XPath(f".//*[{xpath_class('hawkStock')}]")
+_condition_id = re.compile(r'condition_')
+_finish_id = re.compile(r'finish_')
+
+
+def match_F2F(keyword: str, full_card_name: str) -> str | None:
     """
-        Parses information from the website into a card datatype for each different card found.
+        Checks a product title against the searched card name.
 
         :param keyword: Name of the card
-        :param item: A part of a html page, one product entry
-        :return: A list of dictionaries containing the parsed properties of the item
+        :param full_card_name: Product title, which can carry set and frame notes
+        :return: The card name without notes, None if it is another card
     """
-
-    finish_list = []
-    condition_list = []
-    condition_pattern = re.compile(r'condition_')
-    finish_pattern = re.compile(r'finish_')
-    res = []
     logger = logging.getLogger("Card_Logger")
 
-    full_card_name = item.find_next(class_="hawk-results__hawk-contentTitle").text.rstrip()
-    card_name = re.sub(r"(?:\s*\(.*|\s* - .*)?", "", full_card_name)
+    card_name = strip_title_notes(full_card_name)
     logger.debug(card_name)
 
-    if keyword.lower() != card_name.lower():
+    if not same_card(keyword, card_name):
+        return
+    return card_name
+
+
+def create_card_batch_F2F(keyword: str, item: PageElement, store: CardStore) -> int | None:
+    """
+        Parses information from the website into the card store for each different card found.
+
+        :param keyword: Name of the card
+        :param item: A part of a html page, one product entry
+        :param store: CardStore the parsed listings are appended to
+        :return: The number of listings added, None if the entry is another card
+    """
+    full_card_name = item.find_next(class_="hawk-results__hawk-contentTitle").text.rstrip()
+    card_name = match_F2F(keyword, full_card_name)
+    if card_name is None:
         return
 
     card_set = item.find_next(class_="hawk-results__hawk-contentSubtitle").text
+    finishes = [finish["value"] for finish in item.find_all(id=_finish_id)]
+    conditions = [condition["value"] for condition in item.find_all(id=_condition_id)]
+    prices = [(price.text, item.find(class_="hawkStock", attrs={'data-var-id': price["data-var-id"]})[
+        "data-stock-num"]) for price in item.find_all(class_="hawkPrice")]
 
-    for finish in item.find_all(id=finish_pattern):
-        for condition in item.find_all(id=condition_pattern):
-            condition_list.append(condition["value"])
-            finish_list.append(finish["value"])
+    return add_listings_F2F(card_name, full_card_name, card_set, finishes, conditions, prices, store)
 
-    condition_list.reverse()
-    finish_list.reverse()
 
-    frame = utils.find_card_frame(full_card_name)
+def create_card_batch_F2F_lxml(keyword: str, item: HtmlElement, store: CardStore) -> int | None:
+    """
+        Same as create_card_batch_F2F for an lxml element, using precompiled XPath queries.
+
+        :param keyword: Name of the card
+        :param item: A part of a html page, one product entry
+        :param store: CardStore the parsed listings are appended to
+        :return: The number of listings added, None if the entry is another card
+    """
+    full_card_name = _find_title(item).text_content().rstrip()
+    card_name = match_F2F(keyword, full_card_name)
+    if card_name is None:
+        return
+
+    card_set = _find_subtitle(item).text_content()
+    stocks = {}
+    for stock in _stock_xpath(item):
+        stocks.setdefault(stock.get("data-var-id"), stock.get("data-stock-num"))
+    prices = [(price.text_content(), stocks[price.get("data-var-id")]) for price in _price_xpath(item)]
+
+    return add_listings_F2F(card_name, full_card_name, card_set, _finish_xpath(item),
+                            _condition_xpath(item), prices, store)
+
 
-    for price in item.find_all(class_="hawkPrice"):
-        stock = item.find(class_="hawkStock", attrs={'data-var-id': price["data-var-id"]})[
-            "data-stock-num"]
+def add_listings_F2F(card_name: str, full_card_name: str, card_set: str, finishes: list[str],
+                     conditions: list[str], prices: list[tuple[str, str]], store: CardStore) -> int:
+    """
+        Turns the fields read from one product entry into listings.
+        Each price belongs to a finish and condition pair, in the order the page lists them.
+
+        :param card_name: Name of the card
+        :param full_card_name: Product title, used to find frame keywords
+        :param card_set: Set name
+        :param finishes: value of every finish option
+        :param conditions: value of every condition option
+        :param prices: (price text, stock) of every variant
+        :param store: CardStore the parsed listings are appended to
+        :return: The number of listings added
+    """
+    finish_list = []
+    condition_list = []
+    res = 0
+    logger = logging.getLogger("Card_Logger")
+
+    for finish in finishes:
+        for condition in conditions:
+            condition_list.append(condition)
+            finish_list.append(finish)
+
+    condition_list.reverse()
+    finish_list.reverse()
 
-        price_tag = re.sub(r'[^0-9.]', '', price.text)
+    frame = find_frame(full_card_name)
 
+    for price_text, stock in prices:
         if condition_list:
-            condition_name = condition_list.pop()
-            if condition_name == "NM":
-                condition = CardCondition.NM.value
-            elif condition_name == "PL":
-                condition = CardCondition.MP.value
-            elif condition_name == "HP":
-                condition = CardCondition.HP.value
+            condition = F2F_CONDITIONS.get(condition_list.pop(), "")
         else:
             condition = ""
 
@@ -74,17 +136,10 @@ def create_card_batch_F2F(keyword: str, item: PageElement) -> list[Card] | None:
         if not config.ALLOW_OUT_OF_STOCK and int(stock) == 0:
             continue
 
-        res_card: Card = {
-            'card_name': card_name,
-            'card_set': card_set,
-            'condition': condition,
-            'is_foil': is_foil,
-            'retailer': 'F2F',
-            'stock': stock,
-            'price': dec.Decimal("%0.2f" % float(dec.Decimal(price_tag))),
-            'frame': frame
-        }
-        logger.debug(res_card)
-        res.append(res_card)
+        store.append(card_name, card_set, condition, is_foil, 'F2F', int(stock),
+                     price_cents(price_text), frame)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(store.row(-1))
+        res += 1
 
     return res
@@ -0,0 +1,135 @@
+import http.client
+import random
+import threading
+import time
+from collections import deque
+from playwright.async_api import Error as PlaywrightError
+import config
+from http_fetch import HTTPStatusError
+from metrics import percentile
+
+
+# everything a search can raise while fetching, anything else is a bug and should propagate
+FETCH_ERRORS = (PlaywrightError, OSError, http.client.HTTPException)
+
+SAMPLE_SIZE = 50
+MIN_SAMPLES = 5
+
+
+class WaitTimeout:
+    """
+    Learns how long one retailer's results take to show up.
+    Until enough searches have been seen the timeout stays at config.WAIT_TIMEOUT_MAX.
+    """
+
+    def __init__(self):
+        self._samples: deque[float] = deque(maxlen=SAMPLE_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """
+        Adds the wait of a search that finished.
+        :param seconds: time from navigation to the results or no-results marker
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def timed_out(self, seconds: float) -> None:
+        """
+        Counts a timeout as a slow sample so a timeout learned too tight widens again.
+        :param seconds: the timeout that ran out
+        """
+        self.observe(seconds * 2)
+
+    def seconds(self, attempt: int = 0) -> float:
+        """
+        Timeout for the next wait, doubled for each retry.
+        :param attempt: 0 for the first try
+        :return: timeout in seconds
+        """
+        with self._lock:
+            samples = list(self._samples)
+
+        if len(samples) < MIN_SAMPLES:
+            timeout = config.WAIT_TIMEOUT_MAX
+        else:
+            timeout = percentile(samples, 0.95) * config.WAIT_TIMEOUT_FACTOR
+        timeout = min(config.WAIT_TIMEOUT_MAX, max(config.WAIT_TIMEOUT_MIN, timeout))
+        return min(config.WAIT_TIMEOUT_MAX, timeout * 2 ** attempt)
+
+
+_timeouts: dict[str, WaitTimeout] = {}
+_timeouts_lock = threading.Lock()
+
+
+def wait_timeout(retailer: str) -> WaitTimeout:
+    """
+    Gives the learned timeout of a retailer, kept for the life of the process
+    so later searches from the GUI start from what earlier ones observed.
+    :param retailer: 3-4 char notation for the retailer
+    :return: WaitTimeout
+    """
+    with _timeouts_lock:
+        if retailer not in _timeouts:
+            _timeouts[retailer] = WaitTimeout()
+        return _timeouts[retailer]
+
+
+class RateLimit:
+    """
+    Spaces the requests to one retailer evenly, across every search running in the process.
+    """
+
+    def __init__(self):
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, per_second: float) -> float:
+        """
+        Takes the next free request slot.
+        :param per_second: requests allowed per second
+        :return: seconds to wait before sending the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + 1 / per_second
+            return start - now
+
+
+_rate_limits: dict[str, RateLimit] = {}
+_rate_limits_lock = threading.Lock()
+
+
+def rate_limit_delay(retailer: str) -> float:
+    """
+    Reserves a request to a retailer under config.RETAILER_RATE_LIMITS.
+    :param retailer: 3-4 char notation for the retailer
+    :return: seconds to wait before the request, 0 for retailers without a limit
+    """
+    per_second = config.RETAILER_RATE_LIMITS.get(retailer)
+    if not per_second:
+        return 0.0
+    with _rate_limits_lock:
+        limit = _rate_limits.setdefault(retailer, RateLimit())
+    return limit.reserve(per_second)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Decides whether a failed fetch is worth another try.
+    :param error: one of FETCH_ERRORS
+    :return: False for answers that will not change, such as a 404
+    """
+    if isinstance(error, HTTPStatusError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, FETCH_ERRORS)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with jitter so retries of the same retailer do not line up.
+    :param attempt: 0 before the first retry
+    :return: seconds to sleep
+    """
+    return config.RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
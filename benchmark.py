@@ -0,0 +1,252 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+import numpy as np
+import pandas as pd
+import config
+import deck_cost
+import fixture_server
+import purchase_planner
+import utils
+import web_interaction
+from card_store import CardStore
+
+
+SIZES = (1, 10, 100, 1000)
+
+# start up measurements, each run in a fresh interpreter and printing its own seconds.
+# Interpreter start is left out, it is the same before and after any change here.
+_STARTUP_SETUP = """
+import os, sys, time
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+start = time.perf_counter()
+"""
+STARTUP_SCRIPTS = {
+    # the window is on screen
+    "window": """
+from PySide6.QtWidgets import QApplication
+from card_display import CardWindow
+app = QApplication([])
+window = CardWindow()
+window.show()
+app.processEvents()
+""",
+    # the first search is done when it starts right after the window opened
+    "first_result": """
+import config, fixture_server
+from card_display import load_search_modules
+server, base_url = fixture_server.start_fixture_server()
+fixture_server.use_fixture_server(base_url)
+config.RETAILER_BACKENDS = {"F2F": "http", "WIZ": "http", "401G": "http"}
+config.USE_CACHE = False
+start = time.perf_counter()
+load_search_modules().web_interaction.find_all_retailer_pages([fixture_server.fixture_keywords()[0]],
+                                                              ["F2F", "WIZ", "401G"])
+""",
+    # the same search once the background warm up had time to finish
+    "first_result_warm": """
+import config, fixture_server
+from card_display import load_search_modules
+server, base_url = fixture_server.start_fixture_server()
+fixture_server.use_fixture_server(base_url)
+config.RETAILER_BACKENDS = {"F2F": "http", "WIZ": "http", "401G": "http"}
+config.USE_CACHE = False
+load_search_modules().warm_up()
+start = time.perf_counter()
+load_search_modules().web_interaction.find_all_retailer_pages([fixture_server.fixture_keywords()[0]],
+                                                              ["F2F", "WIZ", "401G"])
+""",
+}
+
+
+def measure(action: Callable[[], object], repeat: int) -> float:
+    """
+    Times an action after one warm up run.
+    :param action: work to time
+    :param repeat: number of timed runs
+    :return: median seconds per run
+    """
+    action()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def benchmark_keywords(size: int) -> list[str]:
+    """
+    Makes a repeatable list of distinct card names the synthesizing fixture server can answer.
+    :param size: number of names
+    :return: list of card names
+    """
+    recorded = fixture_server.fixture_keywords()
+    return [recorded[i] if i < len(recorded) else f"{recorded[i % len(recorded)]} {i}" for i in range(size)]
+
+
+def bench_parse(sizes: tuple[int, ...], repeat: int) -> dict[str, float]:
+    """
+    Parses recorded pages, one page per keyword, with each parser backend.
+    """
+    pages = []
+    for retailer in web_interaction.RETAILERS:
+        folder = os.path.join(fixture_server.FIXTURE_DIR, retailer)
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".html") and not name.startswith("_"):
+                with open(os.path.join(folder, name), encoding="utf-8") as file_object:
+                    pages.append((retailer, name[:-len(".html")].replace("-", " "), file_object.read()))
+
+    res = {}
+    for backend in ("bs4", "lxml"):
+        for size in sizes:
+            batch = [pages[i % len(pages)] for i in range(size)]
+
+            def parse() -> None:
+                store = CardStore()
+                for retailer, keyword, html in batch:
+                    web_interaction.parse_retailer_html(retailer, keyword, html, store, backend)
+
+            res[f"parse/{backend}/{size}"] = measure(parse, repeat if size < 1000 else max(1, repeat // 3))
+    return res
+
+
+def bench_navigation(sizes: tuple[int, ...], repeat: int, backends: dict[str, str],
+                     delay: float) -> dict[str, float]:
+    """
+    Scrapes the local fixture server end to end through find_all_retailer_pages.
+    """
+    server, base_url = fixture_server.start_fixture_server(delay=delay, synthesize=True)
+    fixture_server.use_fixture_server(base_url)
+    config.RETAILER_BACKENDS = backends
+    retailers = list(backends)
+    res = {}
+
+    try:
+        for size in sizes:
+            keywords = benchmark_keywords(size)
+            res[f"navigation/{size}"] = measure(
+                lambda: web_interaction.find_all_retailer_pages(keywords, retailers),
+                repeat if size < 1000 else 1)
+    finally:
+        server.shutdown()
+    return res
+
+
+def bench_startup(repeat: int) -> dict[str, float]:
+    """
+    Times opening the window and the first search in fresh interpreters, since imports
+    are only paid once per process.
+    """
+    res = {}
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name, script in STARTUP_SCRIPTS.items():
+        # os._exit skips tearing down Qt, which is slow and can crash outside app.exec()
+        code = _STARTUP_SETUP + script + "\nprint(time.perf_counter() - start, flush=True)\nos._exit(0)\n"
+        times = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", code], cwd=folder, capture_output=True,
+                                    text=True, check=True).stdout
+            times.append(float(output.split()[-1]))
+        res[f"startup/{name}"] = statistics.median(times)
+    return res
+
+
+def synthetic_listings(size: int, per_card: int = 20, seed: int = 0) -> tuple[pd.DataFrame, dict[str, int]]:
+    """
+    Builds a repeatable listings DataFrame shaped like a scrape of size cards.
+    :return: the listings and the decklist quantities
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array([f"card {i}" for i in range(size)])
+    rows = size * per_card
+    card_df = pd.DataFrame({
+        'card_name': names[rng.integers(0, size, rows)],
+        'retailer': rng.choice(["F2F", "WIZ", "401G"], rows),
+        'condition': rng.choice(["NM", "SP", "MP"], rows),
+        'stock': rng.integers(0, 6, rows),
+        'price_cents': rng.integers(10, 5000, rows),
+    })
+    quantities = {name: int(qty) for name, qty in zip(names, rng.integers(1, 5, size))}
+    return card_df, quantities
+
+
+def bench_cost(sizes: tuple[int, ...], repeat: int) -> dict[str, float]:
+    """
+    Runs the deck cost and purchase planning stages on synthetic listings.
+    """
+    res = {}
+    for size in sizes:
+        card_df, quantities = synthetic_listings(size)
+        res[f"cost/cheapest_fill/{size}"] = measure(lambda: deck_cost.cheapest_fill(card_df, quantities), repeat)
+        res[f"cost/plan/{size}"] = measure(
+            lambda: purchase_planner.plan_purchase(card_df, quantities, time_budget=0.5), max(1, repeat // 3))
+    return res
+
+
+def check_regressions(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    """
+    Finds measurements slower than the baseline by more than the threshold.
+    :param threshold: allowed slowdown, 0.2 is 20%
+    :return: description of each regression
+    """
+    res = []
+    for name, seconds in results.items():
+        if name in baseline and seconds > baseline[name] * (1 + threshold):
+            res.append(f"{name}: {seconds * 1000:.2f} ms vs {baseline[name] * 1000:.2f} ms baseline")
+    return res
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the parse, navigation, cost and startup stages offline.")
+    parser.add_argument("--stages", nargs="*", default=["parse", "navigation", "cost", "startup"])
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(SIZES), help="keyword counts to run")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement, the median is kept")
+    parser.add_argument("--delay", type=float, default=0.0, help="fixture server latency per request")
+    parser.add_argument("--backends", default="F2F=http,WIZ=http,401G=http",
+                        help="retailer=backend pairs used for the navigation stage")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    logger = utils.instantiate_logger()
+    logger.setLevel(logging.WARNING)
+    config.USE_CACHE = False
+    sizes = tuple(args.sizes)
+    results = {}
+
+    if "parse" in args.stages:
+        results.update(bench_parse(sizes, args.repeat))
+    if "navigation" in args.stages:
+        backends = dict(pair.split("=") for pair in args.backends.split(","))
+        results.update(bench_navigation(sizes, args.repeat, backends, args.delay))
+    if "cost" in args.stages:
+        results.update(bench_cost(sizes, args.repeat))
+    if "startup" in args.stages:
+        results.update(bench_startup(args.repeat))
+
+    for name, seconds in results.items():
+        print(f"{name:<32}{seconds * 1000:>12.2f} ms")
+
+    if args.save:
+        with open(args.save, "w") as file_object:
+            json.dump(results, file_object, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file_object:
+            regressions = check_regressions(results, json.load(file_object), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
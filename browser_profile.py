@@ -0,0 +1,91 @@
+import ipaddress
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import urlsplit
+import config
+
+
+# typical transfer size of each resource type, aborted requests never report their real size
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 80_000,
+}
+DEFAULT_ESTIMATE = 10_000
+
+# context options that keep the scraping browser light, service workers are blocked
+# because their requests would bypass the route handler
+CONTEXT_OPTIONS = {
+    "service_workers": "block",
+    "viewport": {"width": 1280, "height": 800},
+    "reduced_motion": "reduce",
+}
+
+
+def site_domain(host: str) -> str:
+    """
+    Strips the subdomain of a store host, so store.401games.ca becomes 401games.ca.
+    :param host: hostname of the retailer's search page
+    :return: domain the retailer's own resources are served from
+    """
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+
+    labels = host.split(".")
+    return ".".join(labels[-2:]) if len(labels) > 2 else host
+
+
+def on_domain(host: str, domain: str) -> bool:
+    return host == domain or host.endswith(f".{domain}")
+
+
+def is_blocked(profile: dict, first_party: str, resource_type: str, url: str) -> bool:
+    """
+    Decides whether the browser should skip a request.
+    :param profile: a config.BROWSER_PROFILES entry
+    :param first_party: site_domain of the retailer
+    :param resource_type: playwright resource type such as "image" or "script"
+    :param url: requested url
+    :return: True to abort the request
+    """
+    if resource_type == "document":
+        return False
+    if resource_type in profile.get("block_types", ()):
+        return True
+
+    host = urlsplit(url).hostname
+    if not host or not profile.get("block_third_party", False):
+        return False
+    if on_domain(host, first_party):
+        return False
+    return not any(on_domain(host, domain) for domain in profile.get("allow_domains", ()))
+
+
+async def apply_profile(context, retailer: str, url: str,
+                        record_blocked: Callable[[Any, int], None]) -> None:
+    """
+    Routes every request of a browser context through the retailer's blocking profile.
+    :param context: playwright BrowserContext used for one retailer
+    :param retailer: 3-4 char notation for the retailer
+    :param url: any search url of the retailer, its host is treated as first party
+    :param record_blocked: called with the playwright Request and its estimated size for every aborted request
+    """
+    profile = config.BROWSER_PROFILES.get(retailer)
+    if not profile:
+        return
+    first_party = site_domain(urlsplit(url).hostname or "")
+
+    async def route(route) -> None:
+        request = route.request
+        if is_blocked(profile, first_party, request.resource_type, request.url):
+            record_blocked(request, ESTIMATED_BYTES.get(request.resource_type, DEFAULT_ESTIMATE))
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    await context.route("**/*", route)
@@ -0,0 +1,271 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from typing import Any
+from playwright.async_api import Error as PlaywrightError, async_playwright
+import config
+from browser_profile import CONTEXT_OPTIONS, apply_profile
+from metrics import RunMetrics
+
+
+class RetailerContext:
+    """
+    A browser context kept open for one retailer between searches, with its idle pages.
+    Pages are opened on demand up to max_pages and replaced after config.BROWSER_PAGE_LOADS loads
+    or when they crash. searches counts the scrapes holding the context, from
+    BrowserSession.context until they call finish_search.
+    """
+
+    def __init__(self, retailer: str, context, max_pages: int):
+        self.retailer = retailer
+        self.context = context
+        self.max_pages = max_pages
+        self.idle = asyncio.Queue()
+        self.open_pages = 0
+        self.leased = 0
+        self.searches = 0
+        self.loads = 0
+        self.page_loads = {}
+        self.crashed = set()
+        self.owners: dict[Any, RunMetrics] = {}
+        self.closed = False
+        self.last_used = time.monotonic()
+        context.on("close", lambda _: setattr(self, "closed", True))
+
+    async def acquire(self, metrics: RunMetrics):
+        """
+        Takes an idle page, or opens one while fewer than max_pages are open, else waits for one.
+        :param metrics: RunMetrics of the search, blocked requests of the page are counted there
+        :return: playwright Page, give it back with release()
+        """
+        while True:
+            if self.idle.empty() and self.open_pages < self.max_pages:
+                self.open_pages += 1
+                try:
+                    page = await self.context.new_page()
+                except BaseException:
+                    self.open_pages -= 1
+                    raise
+                page.on("crash", self.crashed.add)
+                self.page_loads[page] = 0
+            else:
+                page = await self.idle.get()
+                # None wakes a waiter after a page was dropped, so it can open a new one
+                if page is None:
+                    continue
+                if page.is_closed() or page in self.crashed:
+                    await self._drop(page)
+                    continue
+
+            self.leased += 1
+            self.owners[page] = metrics
+            self.last_used = time.monotonic()
+            return page
+
+    def finish_search(self) -> None:
+        """
+        Lets the context be recycled or closed once no other search holds it.
+        """
+        self.searches -= 1
+        self.last_used = time.monotonic()
+
+    @property
+    def in_use(self) -> bool:
+        return self.searches > 0 or self.leased > 0
+
+    async def release(self, page) -> None:
+        self.leased -= 1
+        self.loads += 1
+        self.owners.pop(page, None)
+        self.page_loads[page] = self.page_loads.get(page, 0) + 1
+        self.last_used = time.monotonic()
+
+        if page.is_closed() or page in self.crashed or self.page_loads[page] >= config.BROWSER_PAGE_LOADS:
+            await self._drop(page)
+        else:
+            self.idle.put_nowait(page)
+
+    async def _drop(self, page) -> None:
+        self.open_pages -= 1
+        self.page_loads.pop(page, None)
+        self.crashed.discard(page)
+        try:
+            await page.close()
+        except PlaywrightError:
+            pass
+        self.idle.put_nowait(None)
+
+    def record_blocked(self, request, estimated_bytes: int) -> None:
+        """
+        Counts an aborted request against the search using the page it came from.
+        """
+        try:
+            metrics = self.owners.get(request.frame.page)
+        except PlaywrightError:
+            return
+        if metrics is not None:
+            metrics.record_blocked(self.retailer, estimated_bytes)
+
+    async def close(self) -> None:
+        self.closed = True
+        try:
+            await self.context.close()
+        except PlaywrightError:
+            pass
+
+
+class BrowserSession:
+    """
+    One browser kept running on its own event loop thread, so searches after the first
+    only pay for navigation. Each retailer keeps a warm context between searches.
+    A context is replaced between searches after config.BROWSER_CONTEXT_LOADS loads or when it closed,
+    the browser is started again when it disconnects, and contexts left unused for
+    config.BROWSER_IDLE_TIMEOUT seconds are closed, the browser with the last of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._playwright = None
+        self._browser = None
+        self._contexts: dict[str, RetailerContext] = {}
+        self._evictor = None
+        # held while the browser or a context is opened or closed, so concurrent searches share them
+        self._guard = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the session's event loop and waits for it, from any other thread.
+        :return: what the coroutine returned
+        """
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True, name="browser-session").start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _running_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        logger = logging.getLogger("Card_Logger")
+        await self._shutdown()
+        logger.info("Starting browser")
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._evictor = asyncio.create_task(self._evict_idle())
+        return self._browser
+
+    async def context(self, retailer: str, url: str) -> RetailerContext:
+        """
+        Gives the warm context of a retailer, opening a fresh one when there is none,
+        it closed, or it served config.BROWSER_CONTEXT_LOADS loads and no search is using it.
+        Call finish_search on it when the search is done.
+        :param retailer: 3-4 char notation for the retailer
+        :param url: any search url of the retailer, for its blocking profile
+        :return: RetailerContext
+        """
+        async with self._guard:
+            self.last_used = time.monotonic()
+            browser = await self._running_browser()
+            entry = self._contexts.get(retailer)
+
+            if entry is not None and (entry.closed or (not entry.in_use
+                                                       and entry.loads >= config.BROWSER_CONTEXT_LOADS)):
+                del self._contexts[retailer]
+                await entry.close()
+                entry = None
+
+            if entry is None:
+                entry = RetailerContext(retailer, await browser.new_context(**CONTEXT_OPTIONS),
+                                        max(1, config.MAX_PAGES_PER_RETAILER))
+                await apply_profile(entry.context, retailer, url, entry.record_blocked)
+                self._contexts[retailer] = entry
+
+            entry.searches += 1
+            entry.last_used = time.monotonic()
+            return entry
+
+    async def start(self) -> None:
+        """
+        Starts the browser ahead of the first search.
+        """
+        async with self._guard:
+            self.last_used = time.monotonic()
+            await self._running_browser()
+
+    async def _evict_idle(self) -> None:
+        logger = logging.getLogger("Card_Logger")
+        while True:
+            await asyncio.sleep(max(1.0, config.BROWSER_IDLE_TIMEOUT / 4))
+            async with self._guard:
+                now = time.monotonic()
+                for retailer, entry in list(self._contexts.items()):
+                    if not entry.in_use and now - entry.last_used > config.BROWSER_IDLE_TIMEOUT:
+                        logger.debug(f"Closing idle browser context of {retailer}")
+                        del self._contexts[retailer]
+                        await entry.close()
+                if not self._contexts and now - self.last_used > config.BROWSER_IDLE_TIMEOUT:
+                    logger.debug("Closing idle browser")
+                    self._evictor = None
+                    await self._shutdown()
+                    return
+
+    async def _shutdown(self) -> None:
+        if self._evictor is not None and self._evictor is not asyncio.current_task():
+            self._evictor.cancel()
+        self._evictor = None
+        contexts, self._contexts = list(self._contexts.values()), {}
+        for entry in contexts:
+            await entry.close()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self) -> None:
+        """
+        Closes the browser and stops the event loop thread.
+        """
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_session: BrowserSession | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> BrowserSession:
+    """
+    Gives the browser session of this process, closed when the process exits.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = BrowserSession()
+        return _session
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+atexit.register(close_session)
@@ -0,0 +1,177 @@
+import decimal as dec
+import json
+import logging
+import sqlite3
+import threading
+import time
+import config
+from classes import Card
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    Collapses whitespace and case so equivalent searches share a cache entry.
+    :param keyword: Name of the card
+    :return: normalized name
+    """
+    return " ".join(keyword.split()).casefold()
+
+
+def filter_settings() -> str:
+    """
+    Encodes the config settings the parsers filter on, since they change which cards are kept.
+    :return: settings string used as part of the cache key
+    """
+    return f"foil={int(config.ALLOW_FOIL)};oos={int(config.ALLOW_OUT_OF_STOCK)}"
+
+
+def _encode_cards(cards: list[Card]) -> str:
+    return json.dumps([{**card, 'price': str(card['price'])} for card in cards])
+
+
+def _decode_cards(text: str) -> list[Card]:
+    cards = json.loads(text)
+    for card in cards:
+        card['price'] = dec.Decimal(card['price'])
+    return cards
+
+
+class CardCache:
+    """
+    SQLite store of parsed search results keyed by retailer, keyword and filter settings.
+    Entries expire after the retailer's TTL and the least recently used ones are
+    evicted once the database grows past its size limit.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl: dict[str, float], store_html: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store_html = store_html
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                retailer TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                filters TEXT NOT NULL,
+                cards TEXT NOT NULL,
+                html TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (retailer, keyword, filters)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._conn.commit()
+
+    def get_many(self, retailer: str, keyword_list: list[str]) -> dict[str, list[Card]]:
+        """
+        Looks up every keyword that has a fresh entry.
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword_list: List of card names
+        :return: Dictionary of keyword to its cached list of datatype Card, misses are left out
+        """
+        now = time.time()
+        oldest = now - self.ttl.get(retailer, 0)
+        filters = filter_settings()
+        hits = {}
+        res = {}
+
+        with self._lock:
+            for keyword in keyword_list:
+                key = normalize_keyword(keyword)
+                if key not in hits:
+                    row = self._conn.execute(
+                        "SELECT cards FROM results WHERE retailer = ? AND keyword = ? AND filters = ? "
+                        "AND fetched_at >= ?", (retailer, key, filters, oldest)).fetchone()
+                    hits[key] = None if row is None else _decode_cards(row[0])
+                if hits[key] is not None:
+                    res[keyword] = hits[key]
+
+            if res:
+                self._conn.executemany(
+                    "UPDATE results SET last_used = ? WHERE retailer = ? AND keyword = ? AND filters = ?",
+                    [(now, retailer, key, filters) for key, cards in hits.items() if cards is not None])
+                self._conn.commit()
+
+        return res
+
+    def put(self, retailer: str, keyword: str, cards: list[Card], html: str | None = None) -> None:
+        """
+        Stores the parsed cards of one search, replacing any older entry.
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword: Name of the card that was searched
+        :param cards: Parsed results, may be empty when the store has none
+        :param html: Raw page, only kept when the cache is set to store html
+        """
+        encoded = _encode_cards(cards)
+        html = html if self.store_html else None
+        size = len(encoded) + len(html or "")
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (retailer, normalize_keyword(keyword), filter_settings(), encoded, html, size, now, now))
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """
+        Drops expired entries, then the least recently used ones until under max_bytes.
+        :return: number of entries removed
+        """
+        now = time.time()
+        removed = 0
+
+        with self._lock:
+            for retailer, ttl in self.ttl.items():
+                removed += self._conn.execute("DELETE FROM results WHERE retailer = ? AND fetched_at < ?",
+                                              (retailer, now - ttl)).rowcount
+
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for rowid, size in self._conn.execute("SELECT rowid, size FROM results ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((rowid,))
+                    total -= size
+                self._conn.executemany("DELETE FROM results WHERE rowid = ?", doomed)
+                removed += len(doomed)
+
+            self._conn.commit()
+
+        if removed:
+            logging.getLogger("Card_Logger").debug(f"Cache evicted {removed} entries")
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: CardCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CardCache | None:
+    """
+    Gives the cache described by config, opening it on first use.
+    :return: CardCache, or None when caching is turned off
+    """
+    global _cache
+    if not config.USE_CACHE:
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache.path != config.CACHE_PATH:
+            _cache = CardCache(config.CACHE_PATH, config.CACHE_MAX_BYTES, config.CACHE_TTL,
+                               config.CACHE_STORE_HTML)
+        return _cache
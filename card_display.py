@@ -2,12 +2,15 @@ import logging
 import os
 import sys
 import threading
+from PySide6.QtCore import Qt, QThread, QTimer
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (QMainWindow, QPushButton, QVBoxLayout,
                                QWidget, QLabel, QCheckBox, QTabWidget, QTextEdit, \
-                               QLineEdit, QHBoxLayout, QSpacerItem, QSizePolicy)
+                               QLineEdit, QHBoxLayout, QSpacerItem, QSizePolicy, QComboBox, QTableView,
+                               QHeaderView)
 import config
-import utils
+from card_store import CardStore, format_cents
+from results_model import ResultsModel
 
 
 def change_config(config_setting) -> None:
@@ -23,16 +26,75 @@ def change_config(config_setting) -> None:
         config.ALLOW_OUT_OF_STOCK = not config.ALLOW_OUT_OF_STOCK
     elif config_setting == "output_to_csv":
         config.OUTPUT_CSV = not config.OUTPUT_CSV
+    elif config_setting == "plan_purchase":
+        config.PLAN_PURCHASE = not config.PLAN_PURCHASE
+    elif config_setting == "use_cache":
+        config.USE_CACHE = not config.USE_CACHE
+    elif config_setting == "force_refresh":
+        config.FORCE_REFRESH = not config.FORCE_REFRESH
+    elif config_setting == "incremental_refresh":
+        config.INCREMENTAL_REFRESH = not config.INCREMENTAL_REFRESH
+
+
+def load_search_modules():
+    """
+    Imports the scraping side on first use, so the window opens before pandas, playwright
+    and the parsers are loaded. Later calls, from any thread, return the loaded module.
+    :return: the utils module
+    """
+    import utils
+    utils.instantiate_logger()
+    return utils
 
 
 class QTextEditLogger(logging.Handler):
+    """
+    Collects log lines from any thread. The widget is only touched by show_pending,
+    which the GUI thread calls on a timer to append everything logged since in one go.
+    """
+
     def __init__(self, text_edit):
         super().__init__()
         self.text_edit = text_edit
+        self.text_edit.document().setMaximumBlockCount(config.GUI_LOG_LINES)
+        self.pending = []
 
     def emit(self, record):
         msg = self.format(record)
-        self.text_edit.append(msg)
+        with self.lock:
+            self.pending.append(msg)
+
+    def show_pending(self) -> None:
+        with self.lock:
+            lines, self.pending = self.pending, []
+        if lines:
+            self.text_edit.append("\n".join(lines[-config.GUI_LOG_LINES:]))
+
+
+class SearchWorker(QThread):
+    """
+    Runs one search off the GUI thread. Progress is only stored here and read by the
+    window's refresh timer, so a run of thousands of searches costs one label update per interval.
+    """
+
+    def __init__(self, temp: str, parent=None):
+        super().__init__(parent)
+        self.temp = temp
+        self.cancel = threading.Event()
+        self.found_listings = 0
+        self.progress = ""
+        self.store = None
+
+    def run(self) -> None:
+        try:
+            self.store = load_search_modules().run_search(self.temp, self.search_update, self.cancel)
+        except Exception as error:
+            logging.getLogger("Card_Logger").error(f"Search failed: {type(error).__name__}: {error}")
+
+    def search_update(self, retailer: str, keyword: str, cards: list, total_cents: int) -> None:
+        self.found_listings += len(cards)
+        self.progress = (f"Running cheapest total: ${format_cents(total_cents)} "
+                         f"({self.found_listings} listings)")
 
 
 class CardWindow(QMainWindow):
@@ -55,10 +117,17 @@ class CardWindow(QMainWindow):
         self.logger = logging.getLogger("Card_Logger")
         self.logger_output = QTextEdit(self)
         self.logger_output.setReadOnly(True)
-        log_handler = QTextEditLogger(self.logger_output)
-        self.logger.addHandler(log_handler)
+        self.log_handler = QTextEditLogger(self.logger_output)
+        self.logger.addHandler(self.log_handler)
         self.logger_output.setPlaceholderText("Console information is written here!")
 
+        self.running_total_label = QLabel("")
+        self.worker = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(config.GUI_REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
         # main page
         type_run_layout = QHBoxLayout()
         run_layout = QVBoxLayout()
@@ -68,16 +137,21 @@ class CardWindow(QMainWindow):
 
         self.search_button = QPushButton("Run!")
         self.quick_run_button = QPushButton("Quick, Run!")
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
 
         self.quick_card_name.returnPressed.connect(self.quick_search)
         self.search_button.clicked.connect(self.long_search)
         self.quick_run_button.clicked.connect(self.quick_search)
+        self.stop_button.clicked.connect(self.stop_search)
 
         type_run_layout.addWidget(self.search_button)
         type_run_layout.addWidget(self.quick_run_button)
+        type_run_layout.addWidget(self.stop_button)
 
         run_layout.addWidget(self.quick_card_name)
         run_layout.addLayout(type_run_layout)
+        run_layout.addWidget(self.running_total_label)
         run_layout.addWidget(self.logger_output)
 
         run_container = QWidget()
@@ -92,13 +166,24 @@ class CardWindow(QMainWindow):
         g401.setChecked(True)
         allow_foil = QCheckBox("Allow foil")
         allow_out_of_stock = QCheckBox("Allow out of stock")
-        output_to_csv = QCheckBox("Output to CSV")
+        output_to_csv = QCheckBox("Save results")
+        plan_purchase = QCheckBox("Plan orders with shipping")
+        plan_purchase.setChecked(config.PLAN_PURCHASE)
+        use_cache = QCheckBox("Use cached results")
+        use_cache.setChecked(config.USE_CACHE)
+        force_refresh = QCheckBox("Force refresh")
+        incremental_refresh = QCheckBox("Only refresh stale or volatile prices")
+        incremental_refresh.setChecked(config.INCREMENTAL_REFRESH)
         f2f.stateChanged.connect(lambda: change_config("F2F"))
         wiz.stateChanged.connect(lambda: change_config("WIZ"))
         g401.stateChanged.connect(lambda: change_config("G401"))
         allow_foil.stateChanged.connect(lambda: change_config("allow_foil"))
         allow_out_of_stock.stateChanged.connect(lambda: change_config("allow_out_of_stock"))
         output_to_csv.stateChanged.connect(lambda: change_config("output_to_csv"))
+        plan_purchase.stateChanged.connect(lambda: change_config("plan_purchase"))
+        use_cache.stateChanged.connect(lambda: change_config("use_cache"))
+        force_refresh.stateChanged.connect(lambda: change_config("force_refresh"))
+        incremental_refresh.stateChanged.connect(lambda: change_config("incremental_refresh"))
         spacer = QSpacerItem(0, 30, QSizePolicy.Minimum, QSizePolicy.Expanding)
 
         config_layout = QVBoxLayout()
@@ -108,6 +193,10 @@ class CardWindow(QMainWindow):
         config_layout.addWidget(allow_foil)
         config_layout.addWidget(allow_out_of_stock)
         config_layout.addWidget(output_to_csv)
+        config_layout.addWidget(plan_purchase)
+        config_layout.addWidget(use_cache)
+        config_layout.addWidget(force_refresh)
+        config_layout.addWidget(incremental_refresh)
         config_layout.addItem(spacer)
         config_container = QWidget()
         config_container.setLayout(config_layout)
@@ -119,27 +208,83 @@ class CardWindow(QMainWindow):
         self.input_path.setPlaceholderText("default = 'input.txt'")
         self.output_path = QLineEdit()
         self.output_path.setPlaceholderText("default = 'result.csv'")
+        self.service_url = QLineEdit(config.SERVICE_URL)
+        self.service_url.setPlaceholderText("default = scrape on this computer")
         self.input_path.returnPressed.connect(self.change_path_input)
         self.output_path.returnPressed.connect(self.change_path_output)
+        self.service_url.returnPressed.connect(self.change_service_url)
         self.resulting_label = QLabel("")
         io_layout.addWidget(QLabel("Input Path"))
         io_layout.addWidget(self.input_path)
         io_layout.addWidget(QLabel("Output Path"))
         io_layout.addWidget(self.output_path)
+        io_layout.addWidget(QLabel("Scraping Service"))
+        io_layout.addWidget(self.service_url)
         io_layout.addWidget(self.resulting_label)
         io_layout.addItem(spacer)
 
         io_container = QWidget()
         io_container.setLayout(io_layout)
 
+        # results page
+        results_layout = QVBoxLayout()
+        filter_layout = QHBoxLayout()
+
+        self.results_model = ResultsModel(self)
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results_model)
+        self.results_view.setSortingEnabled(True)
+        self.results_view.sortByColumn(-1, Qt.AscendingOrder)
+        self.results_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.results_view.verticalHeader().setVisible(False)
+        self.results_view.horizontalHeader().setStretchLastSection(True)
+        # size columns from a sample of rows rather than every listing
+        self.results_view.horizontalHeader().setResizeContentsPrecision(200)
+
+        self.name_filter = QLineEdit()
+        self.name_filter.setPlaceholderText("Filter card names")
+        self.retailer_filter = QComboBox()
+        self.condition_filter = QComboBox()
+        self.foil_filter = QComboBox()
+        self.foil_filter.addItems(["Foil and nonfoil", "Foil", "Nonfoil"])
+        self.frame_filter = QComboBox()
+        self.fill_filter_choices()
+        self.results_label = QLabel("")
+
+        self.name_filter.textChanged.connect(self.apply_filters)
+        for combo in (self.retailer_filter, self.condition_filter, self.foil_filter, self.frame_filter):
+            combo.currentIndexChanged.connect(self.apply_filters)
+            filter_layout.addWidget(combo)
+
+        results_layout.addWidget(self.name_filter)
+        results_layout.addLayout(filter_layout)
+        results_layout.addWidget(self.results_view)
+        results_layout.addWidget(self.results_label)
+
+        results_container = QWidget()
+        results_container.setLayout(results_layout)
+
         # navigation tabs
         tab_nav = QTabWidget()
         tab_nav.addTab(run_container, "Run")
+        tab_nav.addTab(results_container, "Results")
         tab_nav.addTab(config_container, "Config")
         tab_nav.addTab(io_container, "I/O path")
 
         self.setCentralWidget(tab_nav)
 
+    def warm_up(self) -> None:
+        """
+        Loads the scraping modules on a background thread while the user types the first search.
+        """
+        def load() -> None:
+            try:
+                load_search_modules().warm_up()
+            except Exception as error:
+                self.logger.debug(f"Warm up failed: {type(error).__name__}: {error}")
+
+        threading.Thread(target=load, daemon=True).start()
+
     def change_path_input(self) -> None:
         config.FILENAME = self.input_path.text()
         self.resulting_label.setText(f"Input changed to '{config.FILENAME}'!")
@@ -148,30 +293,105 @@ class CardWindow(QMainWindow):
         config.OUTPUT_PATH = self.output_path.text()
         self.resulting_label.setText(f"Output changed to '{config.OUTPUT_PATH}'!")
 
+    def change_service_url(self) -> None:
+        config.SERVICE_URL = self.service_url.text().strip()
+        if config.SERVICE_URL:
+            self.resulting_label.setText(f"Searching through '{config.SERVICE_URL}'!")
+        else:
+            self.resulting_label.setText("Searching on this computer!")
+
     def quick_search(self) -> None:
+        if self.worker is not None:
+            return
         if self.quick_card_name.text() == "":
             self.logger.info("No text entered in quick search. ")
             return
-        self.toggle_for_run(False)
-        t1 = threading.Thread(target=self.run_search, args=(self.quick_card_name.text(),))
+        self.start_search(self.quick_card_name.text())
         self.quick_card_name.clear()
-        self.logger_output.clear()
-        t1.start()
 
     def long_search(self) -> None:
         if not os.path.exists(config.FILENAME):
             self.logger.info("Missing file, cannot read.")
             return
+        self.start_search("Full_Run")
+
+    def start_search(self, temp: str) -> None:
         self.toggle_for_run(False)
-        t1 = threading.Thread(target=self.run_search, args=("Full_Run",))
         self.logger_output.clear()
-        t1.start()
+        self.running_total_label.setText("")
+        self.worker = SearchWorker(temp, self)
+        self.worker.finished.connect(self.search_finished)
+        self.worker.start()
 
-    def run_search(self, temp: str) -> None:
-        utils.run_search(temp)
+    def stop_search(self) -> None:
+        if self.worker is None:
+            return
+        self.worker.cancel.set()
+        self.stop_button.setEnabled(False)
+        self.logger.info("Stopping after the searches in progress.")
+
+    def search_finished(self) -> None:
+        self.refresh()
+        if self.worker.store is not None:
+            self.show_results(self.worker.store)
+        self.worker.deleteLater()
+        self.worker = None
         self.toggle_for_run(True)
 
+    def refresh(self) -> None:
+        """
+        Shows what the search thread logged and found since the last refresh.
+        """
+        self.log_handler.show_pending()
+        if self.worker is not None and self.worker.progress != self.running_total_label.text():
+            self.running_total_label.setText(self.worker.progress)
+
+    def show_results(self, store: CardStore) -> None:
+        self.results_model.set_store(store)
+        self.fill_filter_choices()
+        self.apply_filters()
+        self.results_view.resizeColumnsToContents()
+
+    def fill_filter_choices(self) -> None:
+        """
+        Offers the retailers, conditions and frame keywords of the listings shown,
+        keeping the current choice when it is still there.
+        """
+        store = self.results_model.store
+        frames = {keyword for frame in store.frames.values for keyword in frame.split(", ") if keyword}
+        choices = (
+            (self.retailer_filter, "All retailers", store.retailers.values),
+            (self.condition_filter, "All conditions", [condition for condition in store.conditions.values
+                                                       if condition]),
+            (self.frame_filter, "All frames", sorted(frames)),
+        )
+        for combo, everything, values in choices:
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem(everything)
+            combo.addItems(values)
+            combo.setCurrentIndex(max(0, combo.findText(current)))
+            combo.blockSignals(False)
+
+    def apply_filters(self) -> None:
+        def choice(combo: QComboBox) -> str:
+            return combo.currentText() if combo.currentIndex() > 0 else ""
+
+        foil = {1: True, 2: False}.get(self.foil_filter.currentIndex())
+        self.results_model.set_filters(choice(self.retailer_filter), choice(self.condition_filter), foil,
+                                       choice(self.frame_filter), self.name_filter.text().strip())
+        self.results_label.setText(f"{self.results_model.rowCount()} of {len(self.results_model.store)} listings")
+
     def toggle_for_run(self, isRunning: bool) -> None:
         self.quick_card_name.blockSignals(not isRunning)
         self.search_button.setEnabled(isRunning)
         self.quick_run_button.setEnabled(isRunning)
+        self.stop_button.setEnabled(not isRunning)
+
+    def closeEvent(self, event) -> None:
+        if self.worker is not None:
+            self.worker.cancel.set()
+            self.worker.wait()
+        self.logger.removeHandler(self.log_handler)
+        super().closeEvent(event)
@@ -0,0 +1,136 @@
+import functools
+import re
+import unicodedata
+from collections.abc import Callable
+from typing import NamedTuple
+
+
+_QUANTITY = re.compile(r"^\s*(\d+)x?\s+(.*\S)")
+# "(C21) 263", "[C21]" and finish markers such as "*F*" that deck builders export after the name
+_SET_SUFFIX = re.compile(r"(?:\s*\([A-Za-z0-9]{2,6}\)(?:\s+[\w★-]+)?|\s*\[[A-Za-z0-9]{2,6}\]|\s+\*[A-Za-z]+\*)+\s*$")
+# the front face of split, adventure and double faced cards
+_BACK_FACE = re.compile(r"\s*//.*|\s+/\s+.*")
+_SECTION = re.compile(r"^(?:sideboard|commander|companion|deck|maybeboard|mainboard)\s*:?$", re.IGNORECASE)
+_QUOTES = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"'})
+
+
+@functools.cache
+def search_name(name: str) -> str:
+    """
+    The part of a decklist name worth searching for: the front face without set codes or finish markers.
+    :param name: card name as written in a decklist or product title
+    :return: name with its original casing, whitespace collapsed
+    """
+    name = _SET_SUFFIX.sub("", name)
+    name = _BACK_FACE.sub("", name)
+    return " ".join(name.split())
+
+
+@functools.cache
+def canonical_key(name: str) -> str:
+    """
+    Key that every spelling of the same card shares, so decklist lines and retailer listings
+    can be matched regardless of case, accents, quotes, set codes or back faces.
+    :param name: card name as written in a decklist or product title
+    :return: casefolded front face name
+    """
+    name = unicodedata.normalize("NFKD", search_name(name).translate(_QUOTES))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return name.casefold().replace("æ", "ae")
+
+
+def parse_line(line: str) -> tuple[int, str] | None:
+    """
+    Reads one decklist line.
+    :param line: `4 Lightning Bolt`, `4x Lightning Bolt` or a bare card name
+    :return: (quantity, name), None for blank lines, comments and section headers
+    """
+    text = line.strip()
+    if not text or text.startswith(("#", "//")) or _SECTION.match(text):
+        return None
+
+    match = _QUANTITY.match(text)
+    if match:
+        return int(match.group(1)), match.group(2)
+    return 1, text
+
+
+class DeckLine(NamedTuple):
+    """
+    Where a card was asked for.
+    """
+
+    source: str
+    line_number: int
+    text: str
+    quantity: int
+
+
+class DeckIndex:
+    """
+    Maps every decklist line to a canonical card key so each card is searched once,
+    however many lines or decks ask for it, and keeps the lines behind each key.
+    Names go through resolve first when given, such as name_index.correct_name to fix typos.
+    """
+
+    def __init__(self, resolve: Callable[[str], str] | None = None):
+        self.resolve = resolve
+        self.names: dict[str, str] = {}
+        self.lines: dict[str, list[DeckLine]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add_line(self, source: str, line_number: int, line: str) -> str | None:
+        """
+        Indexes one line.
+        :param source: decklist the line came from
+        :param line_number: 1 based line number
+        :param line: raw line
+        :return: canonical key of the card, None when the line holds no card
+        """
+        parsed = parse_line(line)
+        if parsed is None:
+            return None
+        quantity, name = parsed
+        if self.resolve is not None:
+            name = self.resolve(search_name(name))
+
+        key = canonical_key(name)
+        if not key:
+            return None
+        # the first spelling seen is the one searched for
+        self.names.setdefault(key, search_name(name))
+        self.lines.setdefault(key, []).append(DeckLine(source, line_number, line.strip(), quantity))
+        return key
+
+    def add_file(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as file_object:
+            for line_number, line in enumerate(file_object, 1):
+                self.add_line(path, line_number, line)
+
+    def keyword_list(self) -> list[str]:
+        """
+        :return: one search name per card, in the order cards were first seen
+        """
+        return list(self.names.values())
+
+    def quantities(self, source: str | None = None) -> dict[str, int]:
+        """
+        Copies wanted per card, summed over every line asking for it.
+        :param source: only count lines from this decklist, every decklist when None
+        :return: search name to quantity
+        """
+        res = {}
+        for key, lines in self.lines.items():
+            quantity = sum(line.quantity for line in lines if source is None or line.source == source)
+            if quantity:
+                res[self.names[key]] = quantity
+        return res
+
+    def lines_for(self, name: str) -> list[DeckLine]:
+        """
+        :param name: any spelling of a card
+        :return: the decklist lines that asked for it
+        """
+        return self.lines.get(canonical_key(name), [])
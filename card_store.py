@@ -0,0 +1,214 @@
+import decimal as dec
+import sys
+from typing import TYPE_CHECKING
+import numpy as np
+from classes import Card, CardCondition, Retailer
+
+if TYPE_CHECKING:
+    # pandas is only loaded when a DataFrame is asked for, it dominates start up time
+    import pandas as pd
+
+
+CONDITIONS = ("",) + tuple(condition.value for condition in CardCondition)
+RETAILERS = tuple(retailer.value for retailer in Retailer)
+
+_COLUMNS = (
+    ("card_name", np.int32),
+    ("card_set", np.int32),
+    ("condition", np.int8),
+    ("is_foil", np.bool_),
+    ("retailer", np.int8),
+    ("stock", np.int32),
+    ("price_cents", np.int64),
+    ("frame", np.int16),
+)
+
+
+def price_to_cents(price: str | dec.Decimal) -> int:
+    """
+    Converts a price to whole cents, rounding half to even like the old two decimal formatting.
+    :param price: price such as '12.5' or a Decimal
+    :return: integer cents
+    """
+    return int(round(dec.Decimal(price) * 100))
+
+
+def format_cents(cents: int) -> str:
+    """
+    Formats integer cents as dollars.
+    :param cents: amount in cents
+    :return: string such as '12.05'
+    """
+    sign = "-" if cents < 0 else ""
+    cents = abs(int(cents))
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+
+class StringTable:
+    """
+    Interns repeated strings and hands out small integer codes for them.
+    """
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self, values: tuple[str, ...] = ()):
+        self.values = []
+        self._codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            value = sys.intern(str(value))
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[value] = code
+        return code
+
+
+class CardStore:
+    """
+    Column store of card listings.
+    Prices are integer cents, names and sets are interned and condition,
+    retailer and frame are stored as small integer codes.
+    """
+
+    __slots__ = ("_size", "_columns", "names", "sets", "conditions", "retailers", "frames")
+
+    def __init__(self, capacity: int = 256):
+        self._size = 0
+        self._columns = {name: np.empty(max(1, capacity), dtype) for name, dtype in _COLUMNS}
+        self.names = StringTable()
+        self.sets = StringTable()
+        self.conditions = StringTable(CONDITIONS)
+        self.retailers = StringTable(RETAILERS)
+        self.frames = StringTable(("",))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self) -> None:
+        # views handed out by to_dataframe keep the old buffers, so they stay valid
+        for name, column in self._columns.items():
+            grown = np.empty(len(column) * 2, column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def append(self, card_name: str, card_set: str, condition: str, is_foil: bool,
+               retailer: str, stock: int, price_cents: int, frame: str = "") -> None:
+        """
+        Adds one listing.
+        :param condition: a CardCondition value or ""
+        :param retailer: a Retailer value
+        :param price_cents: price in whole cents
+        """
+        if self._size == len(self._columns["price_cents"]):
+            self._grow()
+
+        index = self._size
+        columns = self._columns
+        columns["card_name"][index] = self.names.code(card_name)
+        columns["card_set"][index] = self.sets.code(card_set)
+        columns["condition"][index] = self.conditions.code(condition)
+        columns["is_foil"][index] = is_foil
+        columns["retailer"][index] = self.retailers.code(retailer)
+        columns["stock"][index] = stock
+        columns["price_cents"][index] = price_cents
+        columns["frame"][index] = self.frames.code(frame)
+        self._size += 1
+
+    def truncate(self, size: int) -> None:
+        """
+        Drops every listing from index size on, used to undo a half parsed page.
+        """
+        self._size = min(self._size, max(0, size))
+
+    def append_card(self, card: Card) -> None:
+        self.append(card['card_name'], card['card_set'], card.get('condition', ""), card['is_foil'],
+                    card['retailer'], int(card['stock']), price_to_cents(card['price']), card.get('frame', ""))
+
+    def extend_cards(self, cards: list[Card]) -> None:
+        for card in cards:
+            self.append_card(card)
+
+    def row(self, index: int) -> Card:
+        """
+        Rebuilds one listing as a Card datatype.
+        :param index: position of the listing, negative counts from the end
+        :return: Card datatype
+        """
+        if index < 0:
+            index += self._size
+        columns = self._columns
+
+        return {
+            'card_name': self.names.values[columns["card_name"][index]],
+            'card_set': self.sets.values[columns["card_set"][index]],
+            'condition': self.conditions.values[columns["condition"][index]],
+            'is_foil': bool(columns["is_foil"][index]),
+            'retailer': self.retailers.values[columns["retailer"][index]],
+            'stock': int(columns["stock"][index]),
+            'price': dec.Decimal(int(columns["price_cents"][index])).scaleb(-2),
+            'frame': self.frames.values[columns["frame"][index]],
+        }
+
+    def rows(self, start: int = 0, stop: int | None = None) -> list[Card]:
+        stop = self._size if stop is None else stop
+        return [self.row(index) for index in range(start, stop)]
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Gives a view of the raw column without copying.
+        :param name: column name, string columns are returned as codes
+        :return: numpy array of the filled part of the column
+        """
+        return self._columns[name][:self._size]
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """
+        Exposes the store as a DataFrame.
+        String columns become categoricals over the stored codes and numeric columns
+        are views of the stored arrays, only the float price column is computed.
+        :return: DataFrame with the Card columns plus price_cents
+        """
+        import pandas as pd
+
+        def categorical(name: str, table: StringTable) -> "pd.Categorical":
+            return pd.Categorical.from_codes(self.column(name), categories=pd.Index(table.values, dtype=object))
+
+        price_cents = self.column("price_cents")
+
+        return pd.DataFrame({
+            'card_name': categorical("card_name", self.names),
+            'card_set': categorical("card_set", self.sets),
+            'condition': categorical("condition", self.conditions),
+            'is_foil': self.column("is_foil"),
+            'retailer': categorical("retailer", self.retailers),
+            'stock': self.column("stock"),
+            'price': price_cents / 100,
+            'price_cents': price_cents,
+            'frame': categorical("frame", self.frames),
+        }, copy=False)
+
+    def to_arrow(self):
+        """
+        Exposes the store as a pyarrow Table, string columns are dictionary encoded.
+        Requires the optional pyarrow package.
+        :return: pyarrow.Table
+        """
+        import pyarrow as pa
+
+        def dictionary(name: str, table: StringTable):
+            return pa.DictionaryArray.from_arrays(pa.array(self.column(name)), pa.array(table.values, pa.string()))
+
+        return pa.table({
+            'card_name': dictionary("card_name", self.names),
+            'card_set': dictionary("card_set", self.sets),
+            'condition': dictionary("condition", self.conditions),
+            'is_foil': pa.array(self.column("is_foil")),
+            'retailer': dictionary("retailer", self.retailers),
+            'stock': pa.array(self.column("stock")),
+            'price_cents': pa.array(self.column("price_cents")),
+            'frame': dictionary("frame", self.frames),
+        })
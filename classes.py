@@ -26,3 +26,13 @@ class Card(TypedDict):
     stock: int
     price: dec.Decimal
     frame: NotRequired[str]
+
+
+class Retailer(Enum):
+    """
+    Represents the retailers that can be scraped
+    """
+
+    F2F = "F2F"
+    WIZ = "WIZ"
+    G401 = "401G"
@@ -0,0 +1,258 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from decimal import Decimal
+import config
+import deck_cost
+import output_writers
+import utils
+from card_cache import filter_settings
+from card_keys import DeckIndex
+from name_index import correct_name
+from card_store import CardStore
+from classes import Card
+from metrics import RunMetrics
+
+
+class BatchCheckpoint:
+    """
+    Append-only record of the searches a batch has finished, one json line per search,
+    so an interrupted batch only scrapes what is left when it is started again.
+    The first line holds the filter settings, a checkpoint made with other filters is discarded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def load(self) -> dict[tuple[str, str], list[Card]]:
+        """
+        Reads the searches finished by an earlier run of this batch.
+        :return: (retailer, keyword) to its listings
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+
+        with open(self.path, "r", encoding="utf-8") as file_object:
+            header = file_object.readline()
+            try:
+                if json.loads(header).get("filters") != filter_settings():
+                    return done
+            except ValueError:
+                return done
+
+            for line in file_object:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may be cut short by the interruption
+                    continue
+                cards = [{**card, 'price': Decimal(card['price'])} for card in entry["cards"]]
+                done[(entry["retailer"], entry["keyword"])] = cards
+
+        return done
+
+    def open(self, done: dict[tuple[str, str], list[Card]]) -> None:
+        """
+        Starts writing, keeping the searches that were loaded.
+        :param done: result of load()
+        """
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(json.dumps({"filters": filter_settings()}) + "\n")
+        for (retailer, keyword), cards in done.items():
+            self._write(retailer, keyword, cards)
+        self._file.flush()
+
+    def _write(self, retailer: str, keyword: str, cards: list[Card]) -> None:
+        entry = {
+            "retailer": retailer,
+            "keyword": keyword,
+            "cards": [{**card, 'price': str(card['price'])} for card in cards],
+        }
+        self._file.write(json.dumps(entry) + "\n")
+
+    def add(self, retailer: str, keyword: str, cards: list[Card]) -> None:
+        self._write(retailer, keyword, cards)
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def find_decklists(paths: list[str]) -> list[str]:
+    """
+    Expands directories into the .txt decklists inside them.
+    :param paths: decklist files and directories
+    :return: decklist files in a stable order
+    """
+    res = []
+    for path in paths:
+        if os.path.isdir(path):
+            res.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".txt"))
+        else:
+            res.append(path)
+    return res
+
+
+def run_batch(decklists: list[str], checkpoint: BatchCheckpoint) -> CardStore:
+    """
+    Scrapes every card of several decklists once and prices each deck and the whole batch.
+    :param decklists: decklist files
+    :param checkpoint: where finished searches are kept between runs
+    :return: CardStore with the listings of every card in the batch
+    """
+    logger = logging.getLogger("Card_Logger")
+    index = DeckIndex(correct_name)
+    for path in decklists:
+        index.add_file(path)
+    decks = {path: index.quantities(path) for path in decklists}
+    batch = index.quantities()
+    keyword_list = index.keyword_list()
+    logger.info(f"{len(decks)} decklists, {sum(map(len, index.lines.values()))} lines, "
+                f"{len(keyword_list)} unique cards")
+
+    store = CardStore()
+    metrics = RunMetrics()
+    done = checkpoint.load()
+    retailers = utils.enabled_retailers()
+    done = {pair: cards for pair, cards in done.items() if pair[0] in retailers and pair[1] in batch}
+    if done:
+        logger.info(f"Resuming, {len(done)} searches already done")
+    for cards in done.values():
+        store.extend_cards(cards)
+    if config.INCREMENTAL_REFRESH and config.PRICE_HISTORY:
+        done.update(utils.reuse_recent(keyword_list, store, metrics, skip=done))
+
+    checkpoint.open(done)
+    writer = output_writers.open_writer() if config.OUTPUT_CSV else None
+    try:
+        if writer is not None:
+            for cards in done.values():
+                writer.write(cards)
+        with metrics.stage("scrape"):
+            for retailer, keyword, cards in utils.iter_search(keyword_list, store, metrics, skip=done):
+                checkpoint.add(retailer, keyword, cards)
+                if writer is not None:
+                    writer.write(cards)
+                logger.info(f"{keyword} @ {retailer}: {len(cards)} listings")
+    finally:
+        checkpoint.close()
+        if writer is not None:
+            writer.close()
+
+    if config.PRICE_HISTORY:
+        utils.record_history(store, metrics)
+
+    if not len(store):
+        logger.info("Failed to find.")
+        utils.write_run_report(metrics)
+        return store
+
+    df = store.to_dataframe()
+
+    with metrics.stage("cost"):
+        for path, quantities in decks.items():
+            cost = deck_cost.cheapest_fill(df, quantities)
+            short = sum(cost.missing.values())
+            logger.info(f"{os.path.basename(path)}: ${deck_cost.format_cents(cost.total_cents)}"
+                        + (f", {short} copies not found" if short else ""))
+        logger.info("Whole batch:")
+        cost = utils.cost_of_deck(df, batch)
+        for name in cost.missing:
+            places = ", ".join(f"{os.path.basename(line.source)}:{line.line_number}"
+                               for line in index.lines_for(name))
+            logger.info(f"{name} is wanted at {places}")
+    if config.PLAN_PURCHASE:
+        with metrics.stage("plan"):
+            utils.plan_of_deck(df, batch)
+
+    utils.write_run_report(metrics)
+    return store
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Price one or more decklists without the GUI.")
+    parser.add_argument("paths", nargs="+", help="decklist files or directories of .txt decklists")
+    parser.add_argument("--retailers", nargs="+", choices=["F2F", "WIZ", "401G"],
+                        help="retailers to scrape, every retailer enabled in config.py by default")
+    parser.add_argument("--workers", type=int, help="scraping processes, 0 for every core")
+    parser.add_argument("--service", metavar="URL", help="send the searches to a running scrape_service.py")
+    parser.add_argument("--checkpoint", default="batch_checkpoint.jsonl",
+                        help="file that keeps finished searches so an interrupted batch can resume")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and scrape everything")
+    parser.add_argument("--output", help="write every listing found to this file")
+    parser.add_argument("--format", choices=sorted(output_writers.WRITERS), help="format of the output file")
+    parser.add_argument("--partition", choices=["retailer", "date"], help="one output file per retailer or day")
+    parser.add_argument("--foil", action="store_true", help="include foil listings")
+    parser.add_argument("--out-of-stock", action="store_true", help="include out of stock listings")
+    parser.add_argument("--refresh", action="store_true", help="scrape even when the cache is fresh")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only search cards whose recorded prices are stale or volatile")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the result cache")
+    parser.add_argument("--no-plan", action="store_true", help="skip the shipping aware purchase plan")
+    return parser.parse_args(argv)
+
+
+def apply_args(args: argparse.Namespace) -> None:
+    """
+    Copies the command line options over the settings in config.py.
+    """
+    if args.retailers:
+        config.IS_F2F_SCRAPE = "F2F" in args.retailers
+        config.IS_WIZ_SCRAPE = "WIZ" in args.retailers
+        config.IS_401_SCRAPE = "401G" in args.retailers
+    if args.workers is not None:
+        config.SCRAPE_WORKERS = args.workers
+    if args.service:
+        config.SERVICE_URL = args.service
+    if args.output:
+        config.OUTPUT_CSV = True
+        config.OUTPUT_PATH = args.output
+    if args.format:
+        config.OUTPUT_FORMAT = args.format
+    if args.partition:
+        config.OUTPUT_PARTITION = args.partition
+    config.ALLOW_FOIL = config.ALLOW_FOIL or args.foil
+    config.ALLOW_OUT_OF_STOCK = config.ALLOW_OUT_OF_STOCK or args.out_of_stock
+    config.FORCE_REFRESH = config.FORCE_REFRESH or args.refresh
+    config.INCREMENTAL_REFRESH = config.INCREMENTAL_REFRESH or args.incremental
+    config.USE_CACHE = config.USE_CACHE and not args.no_cache
+    config.PLAN_PURCHASE = config.PLAN_PURCHASE and not args.no_plan
+
+
+def main(argv: list[str] | None = None) -> int:
+    # scraping workers are spawned, in a frozen build they start this executable again
+    multiprocessing.freeze_support()
+    args = parse_args(argv)
+    apply_args(args)
+    logger = utils.instantiate_logger()
+
+    decklists = find_decklists(args.paths)
+    missing = [path for path in decklists if not os.path.isfile(path)]
+    if missing or not decklists:
+        logger.error(f"No decklist at {missing[0]}" if missing else "No decklists found")
+        return 1
+
+    checkpoint = BatchCheckpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.remove()
+
+    run_batch(decklists, checkpoint)
+    checkpoint.remove()
+    logger.info("Program finished.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
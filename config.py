@@ -7,6 +7,112 @@ ALLOW_OUT_OF_STOCK = False
 IS_F2F_SCRAPE = True
 IS_WIZ_SCRAPE = True
 IS_401_SCRAPE = True
-OUTPUT_CSV = False
+OUTPUT_CSV = False  # save every listing to OUTPUT_PATH
+# "csv", "jsonl" or "parquet", the extension of OUTPUT_PATH follows the format.
+# OUTPUT_PARTITION "retailer" or "date" writes one file per value in OUTPUT_PATH's folder.
+OUTPUT_FORMAT = "csv"
+OUTPUT_PARTITION = ""
 
+# concurrent scraping limits
+MAX_PAGES_PER_RETAILER = 4
+MAX_PAGES_TOTAL = 8
+# results pages read per search, later pages are fetched side by side once the first shows
+# how many there are. 1 only reads the first page.
+MAX_RESULT_PAGES = 5
+# decklist searches split over this many processes, each with its own browser and the page
+# limits above. 1 scrapes in the GUI's process, 0 uses every core.
+SCRAPE_WORKERS = 1
 
+# the browser stays open between searches with one context per retailer. Pages are replaced
+# after BROWSER_PAGE_LOADS searches and contexts after BROWSER_CONTEXT_LOADS to keep memory
+# in check, contexts unused for BROWSER_IDLE_TIMEOUT seconds are closed, the browser with the last.
+BROWSER_PAGE_LOADS = 100
+BROWSER_CONTEXT_LOADS = 1000
+BROWSER_IDLE_TIMEOUT = 5 * 60
+# waiting for browser results, in seconds. The wait timeout is learned per retailer from the
+# slowest recent searches (times WAIT_TIMEOUT_FACTOR) and kept between the min and max.
+NAVIGATION_TIMEOUT = 15.0
+WAIT_TIMEOUT_MIN = 0.75
+WAIT_TIMEOUT_MAX = 5.0
+WAIT_TIMEOUT_FACTOR = 3.0
+# requests per second allowed to each retailer by every search in the process together,
+# retailers left out are not limited
+RETAILER_RATE_LIMITS = {}
+# timeouts, dropped connections and 429/5xx answers are retried with exponential backoff
+FETCH_RETRIES = 2
+RETRY_BACKOFF = 0.5  # seconds before the first retry
+
+# scraping service started with `python scrape_service.py`, such as "http://192.168.1.20:8402".
+# When set, searches are sent to it instead of scraping here. SERVICE_JOBS is how many
+# scrapes the service runs at once, SERVICE_TIMEOUT how long a client waits for the next result.
+SERVICE_URL = r""
+SERVICE_JOBS = 4
+SERVICE_TIMEOUT = 120.0  # seconds
+# how each retailer is fetched: "browser" renders with playwright, "http" downloads the
+# page with pooled keep-alive connections, "json" uses the retailer's data endpoint
+RETAILER_BACKENDS = {"F2F": "browser", "WIZ": "http", "401G": "browser"}
+# scheme://host overrides per retailer, used to point the scraper at fixture_server.py
+RETAILER_BASE_URLS = {}
+# what the scraping browser skips downloading per retailer. Hosts outside the retailer's own
+# domain are aborted when "block_third_party" is set unless they end with one of "allow_domains".
+BROWSER_PROFILES = {
+    "F2F": {"block_types": ("image", "media", "font", "stylesheet"), "block_third_party": True,
+            "allow_domains": ("hawksearch.com",)},
+    "WIZ": {"block_types": ("image", "media", "font", "stylesheet", "script"), "block_third_party": True,
+            "allow_domains": ()},
+    "401G": {"block_types": ("image", "media", "font", "stylesheet"), "block_third_party": True,
+             "allow_domains": ("fastsimon.com", "shopify.com")},
+}
+# card name index built with `python name_index.py --scryfall`, used to correct decklist typos
+# and to match listings. Names at least NAME_MATCH_THRESHOLD similar to a known card are corrected.
+NAME_INDEX_PATH = r"card_names.idx"
+NAME_MATCH_THRESHOLD = 0.85
+# "lxml" parses pages with precompiled XPath queries, "bs4" with BeautifulSoup and html5lib
+PARSER_BACKEND = "lxml"
+
+# result cache
+USE_CACHE = True
+FORCE_REFRESH = False
+CACHE_PATH = r"card_cache.sqlite3"
+CACHE_TTL = {"F2F": 6 * 60 * 60, "WIZ": 6 * 60 * 60, "401G": 6 * 60 * 60}  # seconds
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_STORE_HTML = False
+
+# purchase planning, amounts in cents. "free_over" is the subtotal that ships free and
+# "min_order" the smallest order a retailer accepts. Adjust to the stores' current policies.
+PLAN_PURCHASE = True
+SHIPPING_RULES = {
+    "F2F": {"flat": 1000, "free_over": 10000, "min_order": 0},
+    "WIZ": {"flat": 1000, "free_over": 10000, "min_order": 0},
+    "401G": {"flat": 1000, "free_over": 10000, "min_order": 0},
+}
+# retailers that only say whether a card is in stock, not how many copies. Their in-stock
+# listings cover any quantity and are marked availability only in the cost report.
+AVAILABILITY_ONLY_RETAILERS = ("401G",)
+PLANNER_TIME_BUDGET = 2.0  # seconds
+PLANNER_EXACT_LIMIT = 16  # cards, larger decks only use the heuristic
+
+# price history, every scraped listing is appended as parquet under PRICE_HISTORY_PATH.
+# With INCREMENTAL_REFRESH a card searched less than STALE_REFRESH_AGE seconds ago is not searched
+# again, unless its price moved by more than PRICE_VOLATILITY (a fraction) over the last
+# PRICE_HISTORY_WINDOW days, then it is searched again after VOLATILE_REFRESH_AGE seconds.
+PRICE_HISTORY = True
+PRICE_HISTORY_PATH = r"price_history"
+INCREMENTAL_REFRESH = False
+STALE_REFRESH_AGE = 24 * 60 * 60
+VOLATILE_REFRESH_AGE = 60 * 60
+PRICE_VOLATILITY = 0.1
+PRICE_HISTORY_WINDOW = 30  # days
+
+# run reports, left empty to skip. METRICS_REPORT is a path without extension that gets
+# a .json and a .csv, METRICS_PROMETHEUS a .prom file for a node exporter textfile collector
+METRICS_REPORT = r""
+METRICS_PROMETHEUS = r""
+
+
+# GUI, log lines and the running total reach the window at most once per refresh interval
+GUI_REFRESH_INTERVAL = 100  # milliseconds
+GUI_LOG_LINES = 5000  # older console lines are dropped
+# the GUI loads the scraping modules in the background once the window is shown,
+# PREWARM_BROWSER also starts the browser session so the first search finds it running
+PREWARM_BROWSER = True
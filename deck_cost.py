@@ -0,0 +1,129 @@
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+import config
+from card_keys import canonical_key
+from card_store import format_cents, price_to_cents
+from classes import Card
+
+
+class DeckCost(NamedTuple):
+    """
+    Cheapest way found to buy a decklist.
+    Prices are integer cents.
+    """
+
+    fills: pd.DataFrame
+    subtotals: dict[str, int]
+    total_cents: int
+    missing: dict[str, int]
+
+
+def price_cents(card_df: pd.DataFrame) -> np.ndarray:
+    """
+    Reads listing prices as integer cents.
+    :param card_df: A dataset that contains a price or price_cents column.
+    :return: int64 array of prices in cents
+    """
+    if "price_cents" in card_df.columns:
+        return card_df["price_cents"].to_numpy(dtype=np.int64)
+    return np.rint(card_df["price"].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+
+
+class RunningTotal:
+    """
+    Cheapest price seen so far for every wanted card, updated as listings stream in.
+    Stock limits are ignored, cheapest_fill gives the exact cost once every listing is in.
+    """
+
+    def __init__(self, quantities: dict[str, int] | None = None):
+        self.quantities = {canonical_key(name): qty for name, qty in (quantities or {}).items()}
+        self.cheapest = {}
+        self.total_cents = 0
+
+    def add(self, cards: list[Card]) -> int:
+        """
+        Folds new listings into the total.
+        :param cards: listings that just arrived
+        :return: the updated total in cents
+        """
+        for card in cards:
+            if int(card['stock']) <= 0:
+                continue
+
+            key = canonical_key(card['card_name'])
+            cents = price_to_cents(card['price'])
+            old = self.cheapest.get(key)
+            if old is None or cents < old:
+                self.total_cents += (cents - (old or 0)) * self.quantities.get(key, 1)
+                self.cheapest[key] = cents
+
+        return self.total_cents
+
+
+def cheapest_fill(card_df: pd.DataFrame, quantities: dict[str, int] | None = None) -> DeckCost:
+    """
+    Buys the wanted number of copies of every card from the cheapest listings,
+    moving on to the next cheapest listing, at any retailer, when one runs out of stock.
+
+    In-stock listings of config.AVAILABILITY_ONLY_RETAILERS cover any quantity, since those
+    retailers only say whether a card is in stock, and their fills are marked availability_only.
+
+    :param card_df: A dataset of listings with card_name, price and stock columns.
+    :param quantities: Copies wanted per card, matched on card_keys.canonical_key. One of each card when None.
+    :return: DeckCost with the chosen listings, per-retailer subtotals and cards that could not be filled.
+    """
+    if card_df.empty:
+        return DeckCost(card_df.assign(quantity=[], line_cents=[], availability_only=[]), {}, 0,
+                        dict(quantities or {}))
+
+    keys = card_df["card_name"].map(canonical_key)
+    codes, uniques = pd.factorize(keys)
+    cents = price_cents(card_df)
+    stock = pd.to_numeric(card_df["stock"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+    stock = np.maximum(stock, 0)
+
+    if quantities is None:
+        wanted = np.ones(len(uniques), dtype=np.int64)
+    else:
+        folded = {canonical_key(name): qty for name, qty in quantities.items()}
+        wanted = np.array([folded.get(key, 0) for key in uniques], dtype=np.int64)
+
+    if "retailer" in card_df.columns:
+        availability_only = card_df["retailer"].isin(config.AVAILABILITY_ONLY_RETAILERS).to_numpy() & (stock > 0)
+    else:
+        availability_only = np.zeros(len(card_df), dtype=bool)
+    stock = np.where(availability_only, wanted[codes], stock)
+
+    # cheapest first within each card, then walk down the stock of each card
+    order = np.lexsort((cents, codes))
+    sorted_codes = codes[order]
+    sorted_stock = stock[order]
+    running = np.cumsum(sorted_stock)
+    group_start = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    offsets = np.maximum.accumulate(np.where(group_start, running - sorted_stock, 0))
+    before = running - sorted_stock - offsets
+    take = np.clip(wanted[sorted_codes] - before, 0, sorted_stock)
+
+    chosen = order[take > 0]
+    fills = card_df.iloc[chosen].copy()
+    fills["quantity"] = take[take > 0]
+    fills["price_cents"] = cents[chosen]
+    fills["line_cents"] = fills["quantity"] * fills["price_cents"]
+    fills["availability_only"] = availability_only[chosen]
+
+    subtotals = fills.groupby("retailer", sort=True, observed=True)["line_cents"].sum()
+    filled = np.bincount(codes[chosen], weights=take[take > 0], minlength=len(uniques)).astype(np.int64)
+
+    missing = {}
+    if quantities is not None:
+        found = dict(zip(uniques, filled))
+        missing = {name: qty - int(found.get(canonical_key(name), 0)) for name, qty in quantities.items()
+                   if qty > found.get(canonical_key(name), 0)}
+    else:
+        missing = {name: 1 for name, count in zip(uniques, filled) if count == 0}
+
+    return DeckCost(fills.reset_index(drop=True),
+                    {retailer: int(cents) for retailer, cents in subtotals.items()},
+                    int(fills["line_cents"].sum()),
+                    missing)
@@ -0,0 +1,312 @@
+import argparse
+import functools
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import config
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# request path -> (retailer folder, query parameter holding the keyword, file extension)
+ROUTES = {
+    "/search/": ("F2F", "keyword", "html"),
+    "/products/search": ("WIZ", "q", "html"),
+    "/pages/search-results": ("401G", "q", "html"),
+    "/search/suggest.json": ("401G", "q", "json"),
+}
+
+
+def fixture_slug(keyword: str) -> str:
+    """
+    Turns a card name into the file name used for its recorded page.
+    :param keyword: Name of the card
+    :return: lowercase name with every other character replaced by '-'
+    """
+    return re.sub(r"[^a-z0-9]+", "-", keyword.lower()).strip("-")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Answers retailer search urls with the recorded pages in fixtures/.
+    Unknown cards get the retailer's recorded empty search page, or with synthesize set,
+    a recorded page picked by the card name with that card renamed.
+    Later results pages come from fixtures/<retailer>/_pages and 401G searches for a card
+    in fixtures/401G/_products redirect to its product page.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, without this every keep-alive response stalls on delayed acks
+    disable_nagle_algorithm = True
+    delay = 0.0
+    synthesize = False
+
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        route = ROUTES.get(parts.path)
+
+        if route is None:
+            if parts.path.startswith("/products/"):
+                self._send_product(parts.path[len("/products/"):])
+            else:
+                self._send(404, b"", "text/plain")
+            return
+
+        retailer, param, extension = route
+        query = parse_qs(parts.query)
+        keyword = query.get(param, [""])[0]
+        page_number = int(query.get("pg", query.get("page", ["1"]))[0])
+
+        def fixture_path(name: str) -> str:
+            # later results pages are recorded as _pages/<slug>-<page>.html
+            slug = fixture_slug(name)
+            if page_number > 1:
+                return os.path.join(FIXTURE_DIR, retailer, "_pages", f"{slug}-{page_number}.{extension}")
+            return os.path.join(FIXTURE_DIR, retailer, f"{slug}.{extension}")
+
+        product = os.path.join(FIXTURE_DIR, retailer, "_products", f"{fixture_slug(keyword)}.js")
+        if retailer == "401G" and extension == "html" and os.path.exists(product):
+            # an exact match sends the search straight to the product page, like 401 Games does
+            self.send_response(302)
+            self.send_header("Location", f"/products/{fixture_slug(keyword)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        path = fixture_path(keyword)
+        recorded_name = None
+        if not os.path.exists(path):
+            if self.synthesize and keyword:
+                recorded = fixture_keywords()
+                recorded_name = recorded[zlib.crc32(keyword.encode()) % len(recorded)]
+                path = fixture_path(recorded_name)
+            if recorded_name is None or not os.path.exists(path):
+                recorded_name = None
+                path = os.path.join(FIXTURE_DIR, retailer, f"_empty.{extension}")
+
+        with open(path, "rb") as file_object:
+            body = file_object.read()
+
+        if recorded_name is not None:
+            body = re.sub(re.escape(recorded_name).encode(), keyword.encode().replace(b"\\", b"\\\\"),
+                          body, flags=re.IGNORECASE)
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        content_type = "application/json" if extension == "json" else "text/html; charset=utf-8"
+        self._send(200, body, content_type)
+
+    def _send_product(self, handle: str) -> None:
+        # products/<handle> is the product page a search redirected to, products/<handle>.js its json
+        name = handle if handle.endswith(".js") else f"{handle}.html"
+        path = os.path.join(FIXTURE_DIR, "401G", "_products", name)
+        if "/" in handle or not os.path.exists(path):
+            self._send(404, b"", "text/plain")
+            return
+
+        with open(path, "rb") as file_object:
+            body = file_object.read()
+        if self.delay:
+            time.sleep(self.delay)
+        self._send(200, body, "application/json" if name.endswith(".js") else "text/html; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        logging.getLogger("Card_Logger").debug(format % args)
+
+
+def start_fixture_server(port: int = 0, delay: float = 0.0,
+                         synthesize: bool = False) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Serves the recorded retailer pages from a background thread.
+    :param port: Port to listen on, 0 picks a free one
+    :param delay: Seconds to wait before answering, to imitate network latency
+    :param synthesize: Answer unknown cards with a renamed recorded page instead of no results
+    :return: the running server and its base url
+    """
+    handler = type("ConfiguredFixtureHandler", (FixtureHandler,), {"delay": delay, "synthesize": synthesize})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def use_fixture_server(base_url: str) -> None:
+    """
+    Points every retailer at the fixture server.
+    :param base_url: scheme://host:port of the server
+    """
+    config.RETAILER_BASE_URLS = {retailer: base_url for retailer in ("F2F", "WIZ", "401G")}
+
+
+@functools.cache
+def fixture_keywords() -> list[str]:
+    """
+    Lists the card names that have recorded pages for every retailer.
+    :return: list of card names, as slugs with spaces
+    """
+    slugs = None
+    for retailer in ("F2F", "WIZ", "401G"):
+        names = {name.rsplit(".", 1)[0] for name in os.listdir(os.path.join(FIXTURE_DIR, retailer))
+                 if not name.startswith("_")}
+        slugs = names if slugs is None else slugs & names
+
+    return sorted(slug.replace("-", " ") for slug in slugs)
+
+
+def fixture_pages() -> list[tuple[str, str, str]]:
+    """
+    Lists every recorded html page: first and later results pages, the empty search
+    and the product pages searches redirect to.
+    :return: (retailer, keyword, path) for each page, the keyword is "" for the empty search
+    """
+    pages = []
+    for retailer in ("F2F", "WIZ", "401G"):
+        for folder in ("", "_pages", "_products"):
+            directory = os.path.join(FIXTURE_DIR, retailer, folder)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".html"):
+                    continue
+                slug = name[:-len(".html")]
+                if folder == "_pages":
+                    slug = slug.rsplit("-", 1)[0]
+                keyword = "" if slug == "_empty" else slug.replace("-", " ")
+                pages.append((retailer, keyword, os.path.join(directory, name)))
+
+    return pages
+
+
+def compare_backends(keyword_list: list[str], backends: list[str]) -> None:
+    """
+    Scrapes the fixture server once per backend, logging the time taken
+    and whether each backend found the same cards as the first one.
+    :param keyword_list: List of card names to search for.
+    :param backends: backends to compare, e.g. ["browser", "http"]
+    """
+    import web_interaction
+
+    logger = logging.getLogger("Card_Logger")
+    original_backends = config.RETAILER_BACKENDS
+    original_refresh = config.FORCE_REFRESH
+    config.FORCE_REFRESH = True
+    reference = {}
+
+    try:
+        for backend in backends:
+            retailers = [retailer for retailer in web_interaction.RETAILERS
+                         if backend != "json" or "json_url" in web_interaction.RETAILERS[retailer]]
+            config.RETAILER_BACKENDS = {retailer: backend for retailer in retailers}
+
+            start = time.perf_counter()
+            store = web_interaction.find_all_retailer_pages(keyword_list, retailers)
+            elapsed = time.perf_counter() - start
+
+            for retailer in retailers:
+                rows = sorted(tuple(card.values()) for card in store.rows() if card['retailer'] == retailer)
+                match = reference.setdefault(retailer, rows) == rows
+                logger.info(f"{backend:>7} {retailer:>4}: {len(rows)} cards, "
+                            f"{'same' if match else 'DIFFERENT'} results")
+            logger.info(f"{backend:>7} total: {elapsed:.2f}s")
+    finally:
+        config.RETAILER_BACKENDS = original_backends
+        config.FORCE_REFRESH = original_refresh
+
+
+def compare_parsers(repeat: int = 20) -> bool:
+    """
+    Parses every recorded page with both parser backends under each foil and stock setting,
+    checking that they produce identical listings and logging the parse time per page.
+    :param repeat: times each page is parsed for the timing
+    :return: True when every page matched
+    """
+    import web_interaction
+    from card_store import CardStore
+
+    logger = logging.getLogger("Card_Logger")
+    original = config.ALLOW_FOIL, config.ALLOW_OUT_OF_STOCK
+    timings = {"bs4": 0.0, "lxml": 0.0}
+    pages = 0
+    matched = True
+
+    try:
+        for retailer, keyword, path in fixture_pages():
+            with open(path, encoding="utf-8") as file_object:
+                html = file_object.read()
+            name = os.path.relpath(path, os.path.join(FIXTURE_DIR, retailer))
+            pages += 1
+
+            for config.ALLOW_FOIL, config.ALLOW_OUT_OF_STOCK in ((False, False), (True, False),
+                                                                 (False, True), (True, True)):
+                rows = {}
+                for backend in timings:
+                    store = CardStore()
+                    web_interaction.parse_retailer_html(retailer, keyword, html, store, backend)
+                    rows[backend] = store.rows()
+
+                if rows["bs4"] != rows["lxml"]:
+                    matched = False
+                    logger.info(f"{retailer}/{name} foil={config.ALLOW_FOIL} "
+                                f"oos={config.ALLOW_OUT_OF_STOCK}: parsers DIFFER")
+
+            for backend in timings:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    web_interaction.parse_retailer_html(retailer, keyword, html, CardStore(), backend)
+                timings[backend] += time.perf_counter() - start
+    finally:
+        config.ALLOW_FOIL, config.ALLOW_OUT_OF_STOCK = original
+
+    for backend, total in timings.items():
+        logger.info(f"{backend:>4}: {total / (pages * repeat) * 1000:.2f} ms per page")
+    logger.info(f"{pages} pages, parsers {'match' if matched else 'DIFFER'}")
+    return matched
+
+
+def main() -> None:
+    import utils
+
+    parser = argparse.ArgumentParser(description="Serve recorded retailer pages for offline scraping.")
+    parser.add_argument("--port", type=int, default=8401)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds of fake latency per request")
+    parser.add_argument("--compare", nargs="*", metavar="BACKEND",
+                        help="scrape the fixtures with each backend and compare, default browser http")
+    parser.add_argument("--parsers", action="store_true",
+                        help="check that the bs4 and lxml parsers agree on every fixture and time them")
+    args = parser.parse_args()
+
+    logger = utils.instantiate_logger()
+    if args.parsers:
+        raise SystemExit(0 if compare_parsers() else 1)
+
+    server, base_url = start_fixture_server(args.port, args.delay)
+    logger.info(f"Serving {FIXTURE_DIR} on {base_url}")
+
+    if args.compare is not None:
+        use_fixture_server(base_url)
+        compare_backends(fixture_keywords() + ["Not A Real Card"], args.compare or ["browser", "http"])
+        server.shutdown()
+        return
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+{"id": 7301, "title": "Mana Crypt (Eternal Masters)", "handle": "mana-crypt", "vendor": "Eternal Masters", "available": true, "variants": [{"id": 73011, "title": "Default Title", "price": 24999, "available": true}, {"id": 73012, "title": "Foil", "price": 44999, "available": false}]}
@@ -0,0 +1,179 @@
+import asyncio
+import gzip
+import http.client
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+import config
+
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+MAX_REDIRECTS = 5
+
+
+class FetchResponse(NamedTuple):
+    """
+    Body of a finished request and the url it ended on after redirects.
+    """
+
+    status: int
+    url: str
+    text: str
+
+
+class HTTPStatusError(ConnectionError):
+    """
+    Raised when a page answers with an error status.
+    """
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"{status} for {url}")
+        self.status = status
+        self.url = url
+
+
+class ConnectionPool:
+    """
+    Keeps keep-alive connections open per host so repeated searches
+    against the same storefront skip the TCP and TLS handshakes.
+    """
+
+    def __init__(self, max_per_host: int = 4, timeout: float = 10):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle: dict[tuple, queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+
+    def _idle_for(self, key: tuple) -> queue.LifoQueue:
+        with self._lock:
+            if key not in self._idle:
+                self._idle[key] = queue.LifoQueue(maxsize=self.max_per_host)
+            return self._idle[key]
+
+    def _connect(self, scheme: str, host: str, port: int | None) -> http.client.HTTPConnection:
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _request_once(self, url: str) -> tuple[int, dict, bytes]:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = {
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+        idle = self._idle_for(key)
+
+        for attempt in range(2):
+            try:
+                conn = idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connect(*key)
+                reused = False
+
+            try:
+                conn.request("GET", target, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                # a kept-alive socket may have been dropped by the server, retry on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    idle.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+
+            return response.status, {k.lower(): v for k, v in response.getheaders()}, body
+
+    def fetch(self, url: str) -> FetchResponse:
+        """
+        GETs a url, following redirects and decoding the body.
+        :param url: Absolute url to request
+        :return: FetchResponse of the final page
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, body = self._request_once(url)
+            if status in (301, 302, 303, 307, 308) and "location" in headers:
+                url = urljoin(url, headers["location"])
+                continue
+            break
+        else:
+            raise ConnectionError(f"Too many redirects for {url}")
+
+        encoding = headers.get("content-encoding", "")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+
+        charset = "utf-8"
+        content_type = headers.get("content-type", "")
+        if "charset=" in content_type:
+            charset = content_type.split("charset=")[-1].split(";")[0].strip()
+
+        return FetchResponse(status, url, body.decode(charset, errors="replace"))
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._idle.values())
+            self._idle.clear()
+        for idle in pools:
+            while not idle.empty():
+                idle.get_nowait().close()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+# the event loop's default executor can be smaller than config.MAX_PAGES_TOTAL on small machines
+_threads: ThreadPoolExecutor | None = None
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Gives the process wide connection pool, creating it on first use.
+    :return: ConnectionPool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(max_per_host=config.MAX_PAGES_PER_RETAILER)
+        return _pool
+
+
+def fetch_text(url: str) -> FetchResponse:
+    """
+    Fetches a page with the shared pool and fails on error statuses.
+    :param url: Absolute url to request
+    :return: FetchResponse of the final page
+    """
+    response = get_pool().fetch(url)
+    if response.status >= 400:
+        raise HTTPStatusError(response.status, response.url)
+    return response
+
+
+async def fetch_text_async(url: str) -> FetchResponse:
+    """
+    Runs fetch_text on threads of its own, enough for config.MAX_PAGES_TOTAL requests at once.
+    :param url: Absolute url to request
+    :return: FetchResponse of the final page
+    """
+    global _threads
+    with _pool_lock:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=max(1, config.MAX_PAGES_TOTAL), thread_name_prefix="fetch")
+    return await asyncio.get_running_loop().run_in_executor(_threads, fetch_text, url)
@@ -1,6 +1,7 @@
+import logging
+import multiprocessing
 import sys
 from PySide6.QtWidgets import QApplication
-import utils
 from card_display import CardWindow
 
 
@@ -8,11 +9,16 @@ def init_window():
     app = QApplication(sys.argv)
     window = CardWindow()
     window.show()
+    window.warm_up()
     sys.exit(app.exec())
 
 
 def main():
-    utils.instantiate_logger()
+    # scraping workers are spawned, in a frozen build they start this executable again
+    multiprocessing.freeze_support()
+    # utils is loaded after the window is shown and sets the console format then,
+    # the level is set now so the window gets info messages from the start
+    logging.getLogger().setLevel(logging.INFO)
     init_window()
 
 
@@ -0,0 +1,208 @@
+import csv
+import json
+import logging
+import math
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TypedDict
+
+
+class SearchMetric(TypedDict):
+    """
+    Timings of one keyword search on one retailer, in seconds.
+    """
+
+    retailer: str
+    keyword: str
+    source: str
+    navigation: float
+    wait: float
+    parse: float
+    listings: int
+    failure: str
+    retries: int
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile.
+    :param values: measurements
+    :param fraction: 0.5 for the median, 0.95 for p95
+    :return: the percentile, 0 when there are no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class RunMetrics:
+    """
+    Collects per-search and per-stage timings of one run and exports them as reports.
+    Safe to record into from the scraping thread while the GUI reads it.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.searches: list[SearchMetric] = []
+        self.stages: dict[str, float] = {}
+        self.blocked: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, retailer: str, keyword: str, source: str, navigation: float = 0.0, wait: float = 0.0,
+               parse: float = 0.0, listings: int = 0, failure: str = "", retries: int = 0) -> None:
+        """
+        Adds one search.
+        :param source: backend the result came from, "cache" or "history"
+        :param failure: short reason such as "timeout", empty when the search worked
+        :param retries: attempts made after the first one
+        """
+        metric: SearchMetric = {
+            'retailer': retailer,
+            'keyword': keyword,
+            'source': source,
+            'navigation': navigation,
+            'wait': wait,
+            'parse': parse,
+            'listings': listings,
+            'failure': failure,
+            'retries': retries,
+        }
+        with self._lock:
+            self.searches.append(metric)
+
+    def record_blocked(self, retailer: str, estimated_bytes: int) -> None:
+        """
+        Counts one request the browser profile aborted.
+        :param estimated_bytes: typical size of that resource type, the real size is never downloaded
+        """
+        with self._lock:
+            blocked = self.blocked.setdefault(retailer, {'requests': 0, 'bytes': 0})
+            blocked['requests'] += 1
+            blocked['bytes'] += estimated_bytes
+
+    def merge(self, searches: list[SearchMetric], blocked: dict[str, dict[str, int]]) -> None:
+        """
+        Adds the searches and blocked requests recorded by a worker process.
+        """
+        with self._lock:
+            self.searches.extend(searches)
+            for retailer, counts in blocked.items():
+                own = self.blocked.setdefault(retailer, {'requests': 0, 'bytes': 0})
+                own['requests'] += counts['requests']
+                own['bytes'] += counts['bytes']
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Times a block of work as a named stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Aggregates the searches of each retailer, latency covers navigation, waiting and parsing.
+        :return: retailer to its counts and p50/p95 latency in seconds
+        """
+        with self._lock:
+            searches = list(self.searches)
+            blocked = {retailer: dict(counts) for retailer, counts in self.blocked.items()}
+
+        res = {}
+        for retailer in dict.fromkeys(metric['retailer'] for metric in searches):
+            own = [metric for metric in searches if metric['retailer'] == retailer]
+            scraped = [metric['navigation'] + metric['wait'] + metric['parse']
+                       for metric in own if metric['source'] not in ("cache", "history")]
+            res[retailer] = {
+                'searches': len(own),
+                'cached': sum(metric['source'] in ("cache", "history") for metric in own),
+                'failures': sum(bool(metric['failure']) for metric in own),
+                'timeouts': sum(metric['failure'] == "timeout" for metric in own),
+                'retries': sum(metric['retries'] for metric in own),
+                'listings': sum(metric['listings'] for metric in own),
+                'p50': percentile(scraped, 0.5),
+                'p95': percentile(scraped, 0.95),
+                'blocked_requests': blocked.get(retailer, {}).get('requests', 0),
+                'blocked_bytes': blocked.get(retailer, {}).get('bytes', 0),
+            }
+        return res
+
+    def log_summary(self) -> None:
+        logger = logging.getLogger("Card_Logger")
+
+        for retailer, stats in self.summary().items():
+            logger.info(f"{retailer}: {stats['searches']} searches ({stats['cached']} cached), "
+                        f"{stats['listings']} listings, p50 {stats['p50'] * 1000:.0f} ms, "
+                        f"p95 {stats['p95'] * 1000:.0f} ms, {stats['failures']} failed "
+                        f"({stats['timeouts']} timeouts), {stats['retries']} retries")
+            if stats['blocked_requests']:
+                logger.info(f"{retailer}: blocked {stats['blocked_requests']} requests, "
+                            f"about {stats['blocked_bytes'] / 1024 / 1024:.1f} MiB saved")
+
+        for name, seconds in self.stages.items():
+            logger.info(f"Stage {name}: {seconds:.2f}s")
+
+    def write_json(self, path: str) -> None:
+        with self._lock:
+            report = {
+                'started': self.started,
+                'stages': dict(self.stages),
+                'searches': list(self.searches),
+            }
+        report['summary'] = self.summary()
+
+        with open(path, "w") as file_object:
+            json.dump(report, file_object, indent=2)
+
+    def write_csv(self, path: str) -> None:
+        with self._lock:
+            searches = list(self.searches)
+
+        with open(path, "w", newline="") as file_object:
+            writer = csv.DictWriter(file_object, fieldnames=list(SearchMetric.__annotations__))
+            writer.writeheader()
+            writer.writerows(searches)
+
+    def prometheus_text(self) -> str:
+        """
+        Formats the run as Prometheus text exposition, for a node exporter textfile collector.
+        :return: metrics text
+        """
+        lines = [
+            "# TYPE card_scraper_searches_total counter",
+            "# TYPE card_scraper_failures_total counter",
+            "# TYPE card_scraper_timeouts_total counter",
+            "# TYPE card_scraper_retries_total counter",
+            "# TYPE card_scraper_listings_total counter",
+            "# TYPE card_scraper_search_seconds summary",
+            "# TYPE card_scraper_blocked_requests_total counter",
+            "# TYPE card_scraper_blocked_bytes_estimate_total counter",
+        ]
+        for retailer, stats in self.summary().items():
+            label = f'retailer="{retailer}"'
+            lines.append(f"card_scraper_searches_total{{{label}}} {stats['searches']}")
+            lines.append(f"card_scraper_failures_total{{{label}}} {stats['failures']}")
+            lines.append(f"card_scraper_timeouts_total{{{label}}} {stats['timeouts']}")
+            lines.append(f"card_scraper_retries_total{{{label}}} {stats['retries']}")
+            lines.append(f"card_scraper_listings_total{{{label}}} {stats['listings']}")
+            lines.append(f'card_scraper_search_seconds{{{label},quantile="0.5"}} {stats["p50"]:.6f}')
+            lines.append(f'card_scraper_search_seconds{{{label},quantile="0.95"}} {stats["p95"]:.6f}')
+            lines.append(f"card_scraper_blocked_requests_total{{{label}}} {stats['blocked_requests']}")
+            lines.append(f"card_scraper_blocked_bytes_estimate_total{{{label}}} {stats['blocked_bytes']}")
+
+        lines.append("# TYPE card_scraper_stage_seconds gauge")
+        for name, seconds in self.stages.items():
+            lines.append(f'card_scraper_stage_seconds{{stage="{name}"}} {seconds:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        with open(path, "w") as file_object:
+            file_object.write(self.prometheus_text())
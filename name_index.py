@@ -0,0 +1,286 @@
+import argparse
+import difflib
+import functools
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import numpy as np
+import config
+from card_keys import canonical_key
+
+
+MAGIC = b"CNI1"
+_HEADER = struct.Struct("<4s4I")
+_NOT_ALNUM = re.compile(r"[^a-z0-9]+")
+SCRYFALL_NAMES_URL = "https://api.scryfall.com/catalog/card-names"
+
+
+@functools.cache
+def loose_key(name: str) -> str:
+    """
+    canonical_key without punctuation, so "Jace, the Mind-Sculptor" and "jace the mind sculptor" meet.
+    :param name: card name in any spelling
+    :return: lowercase ascii letters, digits and single spaces
+    """
+    return " ".join(_NOT_ALNUM.sub(" ", canonical_key(name)).split())
+
+
+def _trigrams(key: str) -> np.ndarray:
+    padded = f" {key} ".encode("ascii")
+    grams = {padded[i] << 16 | padded[i + 1] << 8 | padded[i + 2] for i in range(len(padded) - 2)}
+    return np.fromiter(grams, dtype=np.uint32, count=len(grams))
+
+
+def _offsets(lengths: list[int]) -> np.ndarray:
+    return np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.uint32)
+
+
+def build_index(names, path: str) -> int:
+    """
+    Writes the name index file: sorted loose keys for exact lookups, the display name of each,
+    and a trigram posting list for typo correction. Every section is a flat array so the file
+    can be memory mapped and searched without parsing.
+
+    :param names: card names, duplicates and spellings of the same card are merged
+    :param path: file to write
+    :return: the number of distinct cards indexed
+    """
+    display = {}
+    for name in names:
+        key = loose_key(name)
+        if key:
+            display.setdefault(key, " ".join(name.split()))
+    keys = sorted(display)
+
+    postings: dict[int, list[int]] = {}
+    for card_id, key in enumerate(keys):
+        for gram in _trigrams(key).tolist():
+            postings.setdefault(gram, []).append(card_id)
+    grams = sorted(postings)
+
+    key_blobs = [key.encode("ascii") for key in keys]
+    name_blobs = [display[key].encode("utf-8") for key in keys]
+    gram_lists = [postings[gram] for gram in grams]
+    sections = [
+        _offsets([len(blob) for blob in key_blobs]),
+        _offsets([len(blob) for blob in name_blobs]),
+        np.array(grams, dtype=np.uint32),
+        _offsets([len(ids) for ids in gram_lists]),
+        np.array([card_id for ids in gram_lists for card_id in ids], dtype=np.uint32),
+    ]
+    key_blob = b"".join(key_blobs)
+
+    with open(path, "wb") as file_object:
+        file_object.write(_HEADER.pack(MAGIC, len(keys), len(grams), len(sections[4]), len(key_blob)))
+        for section in sections:
+            file_object.write(section.astype("<u4").tobytes())
+        file_object.write(key_blob)
+        file_object.write(b"".join(name_blobs))
+
+    return len(keys)
+
+
+class NameIndex:
+    """
+    Memory mapped card name index. Opening it only maps the file, exact lookups
+    binary search the sorted keys and suggestions rank trigram candidates.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, gram_count, posting_count, key_bytes = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a card name index")
+
+        position = _HEADER.size
+
+        def section(length: int) -> np.ndarray:
+            nonlocal position
+            array = np.frombuffer(self._map, dtype="<u4", count=length, offset=position)
+            position += length * 4
+            return array
+
+        self._key_offsets = section(self.count + 1)
+        self._name_offsets = section(self.count + 1)
+        self._grams = section(gram_count)
+        self._gram_starts = section(gram_count + 1)
+        self._postings = section(posting_count)
+        self._keys_start = position
+        self._names_start = position + key_bytes
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key(self, card_id: int) -> bytes:
+        start = self._keys_start
+        return self._map[start + int(self._key_offsets[card_id]):start + int(self._key_offsets[card_id + 1])]
+
+    def name(self, card_id: int) -> str:
+        start = self._names_start
+        return self._map[start + int(self._name_offsets[card_id]):
+                         start + int(self._name_offsets[card_id + 1])].decode("utf-8")
+
+    def find(self, name: str) -> int | None:
+        """
+        Exact lookup ignoring case, accents and punctuation.
+        :param name: card name in any spelling
+        :return: id of the card, None when it is not a known card
+        """
+        target = loose_key(name).encode("ascii")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == target:
+            return low
+        return None
+
+    def suggest(self, name: str, limit: int = 5) -> list[tuple[str, float]]:
+        """
+        Known card names closest to a possibly misspelled one.
+        :param name: card name as typed
+        :param limit: number of suggestions
+        :return: (card name, similarity from 0 to 1), best first
+        """
+        key = loose_key(name)
+        if not key:
+            return []
+        grams = _trigrams(key)
+        slots = np.searchsorted(self._grams, grams)
+        slots = slots[slots < len(self._grams)]
+        slots = slots[np.isin(self._grams[slots], grams)]
+        if not len(slots):
+            return []
+
+        candidates = np.concatenate([self._postings[self._gram_starts[slot]:self._gram_starts[slot + 1]]
+                                     for slot in slots])
+        ids, shared = np.unique(candidates, return_counts=True)
+        shortlist = ids[np.argsort(-shared, kind="stable")[:limit * 4]]
+
+        matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+        scored = []
+        for card_id in shortlist.tolist():
+            matcher.set_seq1(self._key(card_id).decode("ascii"))
+            scored.append((matcher.ratio(), card_id))
+        scored.sort(key=lambda pair: -pair[0])
+        return [(self.name(card_id), score) for score, card_id in scored[:limit]]
+
+    def correct(self, name: str) -> str | None:
+        """
+        :param name: card name as typed
+        :return: the known card it names or most likely means, None when nothing is close enough
+        """
+        card_id = self.find(name)
+        if card_id is not None:
+            return self.name(card_id)
+        suggestions = self.suggest(name, 1)
+        if suggestions and suggestions[0][1] >= config.NAME_MATCH_THRESHOLD:
+            return suggestions[0][0]
+        return None
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+_indexes: dict[str, NameIndex] = {}
+_active: NameIndex | None = None
+
+
+def get_index() -> NameIndex | None:
+    """
+    Opens the index at config.NAME_INDEX_PATH once per process. A missing index is looked for
+    again on every call, so one built while the program runs is picked up.
+    :return: NameIndex, None when no index has been built
+    """
+    global _active
+    path = config.NAME_INDEX_PATH
+    index = _indexes.get(path)
+    if index is None and path and os.path.exists(path):
+        index = _indexes[path] = NameIndex(path)
+
+    if index is not _active:
+        # same_card answers depend on the index they were made with
+        _active = index
+        same_card.cache_clear()
+    return index
+
+
+def correct_name(name: str) -> str:
+    """
+    Fixes typos in a decklist or quick search name before it costs a search on every retailer.
+    :param name: card name as typed
+    :return: the corrected name, or the name unchanged when there is no index or no close match
+    """
+    index = get_index()
+    if index is None or index.find(name) is not None:
+        return name
+
+    logger = logging.getLogger("Card_Logger")
+    corrected = index.correct(name)
+    if corrected is None:
+        logger.info(f"{name}: not a known card name, searching anyway")
+        return name
+    logger.info(f"{name}: searching for {corrected} instead")
+    return corrected
+
+
+@functools.lru_cache(maxsize=65536)
+def same_card(keyword: str, card_name: str) -> bool:
+    """
+    Whether a listing's card name is the searched card. Names that differ only by case,
+    accents or punctuation match. With an index, a title that is not a known card is matched
+    through its closest known card, since retailers misspell titles too.
+    :param keyword: name that was searched
+    :param card_name: name from the retailer with set and finish notes removed
+    :return: True when the listing is the card searched for
+    """
+    if canonical_key(keyword) == canonical_key(card_name):
+        return True
+
+    index = get_index()
+    wanted = None if index is None else index.find(keyword)
+    if wanted is None:
+        return loose_key(keyword) == loose_key(card_name)
+
+    listed = index.find(card_name)
+    if listed is None:
+        corrected = index.correct(card_name)
+        listed = None if corrected is None else index.find(corrected)
+    return listed == wanted
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or query the local card name index.")
+    parser.add_argument("--build-from", help="text file with one card name per line")
+    parser.add_argument("--scryfall", action="store_true", help="download every card name from Scryfall")
+    parser.add_argument("--check", nargs="+", help="names to look up in the index")
+    args = parser.parse_args(argv)
+
+    if args.build_from or args.scryfall:
+        names = []
+        if args.build_from:
+            with open(args.build_from, "r", encoding="utf-8") as file_object:
+                names.extend(line.strip() for line in file_object if line.strip())
+        if args.scryfall:
+            import http_fetch
+            names.extend(json.loads(http_fetch.fetch_text(SCRYFALL_NAMES_URL).text)["data"])
+        print(f"Indexed {build_index(names, config.NAME_INDEX_PATH)} cards into {config.NAME_INDEX_PATH}")
+
+    for name in args.check or ():
+        index = get_index()
+        if index is None:
+            print(f"No index at {config.NAME_INDEX_PATH}")
+            return
+        print(f"{name}: {index.correct(name)} {index.suggest(name)}")
+
+
+if __name__ == "__main__":
+    main()
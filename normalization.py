@@ -0,0 +1,92 @@
+import functools
+import re
+from classes import CardCondition
+
+
+# frame keywords in the order they are listed in a listing's frame
+FRAME_KEYWORDS = ("extended", "borderless", "promo", "serial numbered", "showcase", "oversized",
+                  "retro", "chinese", "japanese")
+# condition option values on F2F
+F2F_CONDITIONS = {"NM": CardCondition.NM.value, "PL": CardCondition.MP.value, "HP": CardCondition.HP.value}
+# the first phrase found in a WIZ variant description decides its condition
+WIZ_CONDITIONS = (("NM", CardCondition.NM.value), ("Slightly Played", CardCondition.SP.value),
+                  ("Moderately Played", CardCondition.MP.value))
+
+# everything after the first "(" or " - " of a product title, "Lightning Bolt - Foil (M10)"
+_TITLE_NOTES = re.compile(r"\s*\(.*|\s* - .*")
+# every "(...)" group of a product title, "Sol Ring (Borderless) (Commander Legends)"
+_PARENTHESES = re.compile(r"\s*\(.*?\)")
+_FRAME = re.compile("|".join(map(re.escape, FRAME_KEYWORDS)))
+_PRICE = re.compile(r"(\d[\d,]*)?(?:\.(\d+))?")
+
+# product titles repeat across pages, keywords and retailers, so their cleanup is cached
+TITLE_CACHE_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=TITLE_CACHE_SIZE)
+def strip_title_notes(full_card_name: str) -> str:
+    """
+    Cuts the set, finish and frame notes off a product title.
+    :param full_card_name: Product title such as "Lightning Bolt - Foil"
+    :return: The card name, "Lightning Bolt"
+    """
+    return _TITLE_NOTES.sub("", full_card_name)
+
+
+@functools.lru_cache(maxsize=TITLE_CACHE_SIZE)
+def strip_parentheses(full_card_name: str) -> str:
+    """
+    Removes every parenthesized note of a product title.
+    :param full_card_name: Product title such as "Sol Ring (Extended Art) (Commander Masters)"
+    :return: The card name, "Sol Ring"
+    """
+    return _PARENTHESES.sub("", full_card_name).strip()
+
+
+@functools.lru_cache(maxsize=TITLE_CACHE_SIZE)
+def find_frame(full_card_name: str) -> str:
+    """
+    Finds the frame keywords of a product title in one pass over it.
+    :param full_card_name: Product title, which sometimes provides frame information
+    :return: the keywords found, in FRAME_KEYWORDS order and separated by ", "
+    """
+    found = set(_FRAME.findall(full_card_name.lower()))
+    if not found:
+        return ""
+    return ", ".join(keyword for keyword in FRAME_KEYWORDS if keyword in found)
+
+
+@functools.lru_cache(maxsize=256)
+def wiz_condition(description: str) -> str:
+    """
+    Reads the condition of a WIZ variant row.
+    :param description: Variant description such as "NM-Mint, English"
+    :return: a CardCondition value, "" when none is named
+    """
+    for phrase, condition in WIZ_CONDITIONS:
+        if phrase in description:
+            return condition
+    return ""
+
+
+def price_cents(text: str) -> int:
+    """
+    Reads the first amount of a price text as whole cents without going through Decimal.
+    Digits past the cents are rounded half to even, like price_to_cents.
+    :param text: price text such as "CAD $1,234.50"
+    :return: integer cents, 123450
+    """
+    for match in _PRICE.finditer(text):
+        dollars, fraction = match.groups()
+        if dollars is None and fraction is None:
+            continue
+
+        cents = int(dollars.replace(",", "")) * 100 if dollars else 0
+        fraction = fraction or ""
+        cents += int(fraction[:2].ljust(2, "0"))
+        rest = fraction[2:].rstrip("0")
+        if rest and (rest > "5" or (rest[0] == "5" and cents % 2)):
+            cents += 1
+        return cents
+
+    raise ValueError(f"No price in {text!r}")
@@ -0,0 +1,227 @@
+import csv
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+import pandas as pd
+import config
+from card_store import price_to_cents
+from classes import Card
+
+
+class ResultWriter(ABC):
+    """
+    Streams listings to a file as searches finish, so memory stays flat on large runs.
+    """
+
+    extension = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @abstractmethod
+    def write(self, cards: list[Card]) -> None:
+        """
+        Adds the listings of one search.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CsvWriter(ResultWriter):
+    """
+    One row per listing with the Card fields, prices written as exact dollar strings.
+    """
+
+    extension = ".csv"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=list(Card.__annotations__))
+        self._writer.writeheader()
+
+    def write(self, cards: list[Card]) -> None:
+        self._writer.writerows({**card, 'price': str(card['price'])} for card in cards)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JsonlWriter(ResultWriter):
+    """
+    One json object per line, with the price as a dollar string and as integer cents.
+    """
+
+    extension = ".jsonl"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, cards: list[Card]) -> None:
+        self._file.writelines(json.dumps({**card, 'price': str(card['price']),
+                                          'price_cents': price_to_cents(card['price'])}) + "\n"
+                              for card in cards)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter(ResultWriter):
+    """
+    Typed columns with dictionary encoded strings and integer cents, written in row groups
+    so a large run never holds more than one group in memory. Requires pyarrow.
+    """
+
+    extension = ".parquet"
+    row_group_size = 50_000
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        super().__init__(path)
+        text = pa.dictionary(pa.int32(), pa.string())
+        self._schema = pa.schema([
+            ("card_name", text),
+            ("card_set", text),
+            ("condition", text),
+            ("is_foil", pa.bool_()),
+            ("retailer", text),
+            ("stock", pa.int32()),
+            ("price_cents", pa.int64()),
+            ("frame", text),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._buffer: list[Card] = []
+
+    def write(self, cards: list[Card]) -> None:
+        self._buffer.extend(cards)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        import pyarrow as pa
+
+        if not self._buffer:
+            return
+        cards, self._buffer = self._buffer, []
+        self._writer.write_table(pa.table({
+            'card_name': [card['card_name'] for card in cards],
+            'card_set': [card['card_set'] for card in cards],
+            'condition': [card.get('condition', "") for card in cards],
+            'is_foil': [bool(card['is_foil']) for card in cards],
+            'retailer': [card['retailer'] for card in cards],
+            'stock': [int(card['stock']) for card in cards],
+            'price_cents': [price_to_cents(card['price']) for card in cards],
+            'frame': [card.get('frame', "") for card in cards],
+        }, schema=self._schema))
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+# output formats by name, add a ResultWriter subclass here to support another one
+WRITERS: dict[str, type[ResultWriter]] = {
+    "csv": CsvWriter,
+    "jsonl": JsonlWriter,
+    "parquet": ParquetWriter,
+}
+
+
+class PartitionedWriter(ResultWriter):
+    """
+    Splits listings into one file per partition value in hive style folders,
+    such as results/retailer=F2F/results.parquet, which pandas and pyarrow read back as one table.
+    """
+
+    def __init__(self, path: str, writer: type[ResultWriter], column: str, value: Callable[[Card], str],
+                 file_name: str):
+        super().__init__(path)
+        self._writer = writer
+        self._column = column
+        self._value = value
+        self._file_name = file_name
+        self._open: dict[str, ResultWriter] = {}
+
+    def write(self, cards: list[Card]) -> None:
+        groups: dict[str, list[Card]] = {}
+        for card in cards:
+            groups.setdefault(self._value(card), []).append(card)
+
+        for value, group in groups.items():
+            if value not in self._open:
+                path = os.path.join(self.path, f"{self._column}={value}", self._file_name)
+                self._open[value] = self._writer(path)
+            self._open[value].write(group)
+
+    def close(self) -> None:
+        for writer in self._open.values():
+            writer.close()
+
+
+def open_writer(path: str | None = None, output_format: str | None = None,
+                partition: str | None = None) -> ResultWriter:
+    """
+    Opens the results file of a run.
+    :param path: config.OUTPUT_PATH when None, its extension follows the format
+    :param output_format: a WRITERS key, config.OUTPUT_FORMAT when None
+    :param partition: "retailer", "date" or "" for a single file, config.OUTPUT_PARTITION when None
+    :return: ResultWriter, close it or use it as a context manager
+    """
+    output_format = output_format or config.OUTPUT_FORMAT
+    partition = config.OUTPUT_PARTITION if partition is None else partition
+    writer = WRITERS[output_format]
+    stem = os.path.splitext(path or config.OUTPUT_PATH)[0]
+
+    if partition == "retailer":
+        return PartitionedWriter(stem, writer, "retailer", lambda card: card['retailer'],
+                                 os.path.basename(stem) + writer.extension)
+    if partition == "date":
+        # runs append new files next to earlier ones from the same day,
+        # the suffix keeps runs started in the same second apart
+        day = time.strftime("%Y-%m-%d")
+        file_name = f"{os.path.basename(stem)}-{time.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}{writer.extension}"
+        return PartitionedWriter(stem, writer, "date", lambda card: day, file_name)
+    return writer(stem + writer.extension)
+
+
+def read_results(path: str | None = None, output_format: str | None = None) -> pd.DataFrame:
+    """
+    Loads a results file or partitioned folder back for analysis.
+    :param path: what open_writer was given, config.OUTPUT_PATH when None
+    :param output_format: a WRITERS key, config.OUTPUT_FORMAT when None
+    :return: DataFrame of the listings
+    """
+    output_format = output_format or config.OUTPUT_FORMAT
+    stem = os.path.splitext(path or config.OUTPUT_PATH)[0]
+    extension = WRITERS[output_format].extension
+    target = stem + extension if os.path.exists(stem + extension) else stem
+
+    if output_format == "parquet":
+        return pd.read_parquet(target)
+
+    if os.path.isdir(target):
+        files = [os.path.join(folder, name) for folder, _, names in os.walk(target)
+                 for name in names if name.endswith(extension)]
+    else:
+        files = [target]
+    if output_format == "jsonl":
+        frames = [pd.read_json(file, lines=True, dtype={'price': str}) for file in sorted(files)]
+    else:
+        frames = [pd.read_csv(file, dtype={'price': str}, keep_default_na=False) for file in sorted(files)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
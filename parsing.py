@@ -0,0 +1,43 @@
+import lxml.html
+from lxml import etree
+from lxml.html import HtmlElement
+
+
+def xpath_class(name: str) -> str:
+    """
+    Builds an XPath predicate matching elements the way BeautifulSoup's class_ argument does.
+    A single name matches any element carrying that class, a name with spaces
+    must equal the whole class attribute.
+    :param name: class name, or several separated by spaces
+    :return: XPath predicate without the surrounding brackets
+    """
+    if " " in name:
+        return f"@class = '{name}'"
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def parse_html(html: str) -> HtmlElement | None:
+    """
+    Parses a page or a fragment of one with lxml.
+    :param html: page source
+    :return: root element, None when there is nothing to parse
+    """
+    if not html.strip():
+        return
+    return lxml.html.fromstring(html)
+
+
+class FindNext:
+    """
+    Precompiled lxml version of BeautifulSoup's find_next(class_=name).
+    Looks inside the element first, which is where the match usually is,
+    and only then scans the rest of the document.
+    """
+
+    def __init__(self, class_name: str):
+        self._inside = etree.XPath(f"(.//*[{xpath_class(class_name)}])[1]")
+        self._after = etree.XPath(f"(following::*[{xpath_class(class_name)}])[1]")
+
+    def __call__(self, element: HtmlElement) -> HtmlElement:
+        found = self._inside(element) or self._after(element)
+        return found[0]
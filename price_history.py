@@ -0,0 +1,283 @@
+import argparse
+import datetime
+import logging
+import os
+import time
+import uuid
+from collections.abc import Collection
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import config
+import deck_cost
+from card_keys import canonical_key
+from card_store import CardStore
+from classes import Card
+
+
+# every run is appended as one parquet file under date=YYYY-MM-DD/, so old days can be
+# skipped without opening them and a day's files can be compacted into one
+_PARTITION = "date"
+# price of the row that stands for a search without listings, it is never in stock
+EMPTY_SEARCH_CENTS = -1
+
+
+def _dataset():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(config.PRICE_HISTORY_PATH):
+        return None
+    partitioning = ds.partitioning(pa.schema([(_PARTITION, pa.string())]), flavor="hive")
+    return ds.dataset(config.PRICE_HISTORY_PATH, format="parquet", partitioning=partitioning)
+
+
+def record(store: CardStore, searched: Collection[tuple[str, str]] | None = None,
+           scraped_at: float | None = None) -> int:
+    """
+    Appends the listings of a run to the history. A search that found nothing is recorded as
+    one row priced EMPTY_SEARCH_CENTS, so an incremental refresh can skip it like the others.
+    :param store: listings of the run
+    :param searched: (retailer, keyword) pairs that were scraped rather than read from a cache,
+                     only their listings are recorded. Every listing when None.
+    :param scraped_at: unix time of the run, now when None
+    :return: the number of listings recorded
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    scraped_at = time.time() if scraped_at is None else scraped_at
+    parts = []
+    recorded = 0
+    found = set()
+
+    if len(store):
+        table = store.to_arrow()
+        keys = [canonical_key(name) for name in store.names.values]
+        key_codes = np.array(keys, dtype=object)[store.column("card_name")]
+        if searched is not None:
+            wanted = {(retailer, canonical_key(keyword)) for retailer, keyword in searched}
+            retailers = np.array(store.retailers.values, dtype=object)[store.column("retailer")]
+            mask = np.fromiter(((retailer, key) in wanted for retailer, key in zip(retailers, key_codes)),
+                               dtype=bool, count=len(store))
+            table = table.filter(pa.array(mask))
+            key_codes = key_codes[mask]
+            found = set(zip(retailers[mask], key_codes))
+        parts.append((table, key_codes))
+        recorded = len(table)
+
+    if searched is not None:
+        empty = {}
+        for retailer, keyword in searched:
+            if (retailer, canonical_key(keyword)) not in found:
+                empty.setdefault((retailer, canonical_key(keyword)), keyword)
+        if empty:
+            markers = CardStore(len(empty))
+            for (retailer, _), keyword in empty.items():
+                markers.append(keyword, "", "", False, retailer, 0, EMPTY_SEARCH_CENTS)
+            parts.append((markers.to_arrow(), np.array([key for _, key in empty], dtype=object)))
+
+    parts = [(table, key_codes) for table, key_codes in parts if len(table)]
+    if not parts:
+        return 0
+    table = pa.concat_tables([table.append_column("card_key", pa.array(key_codes, pa.string()).dictionary_encode())
+                              for table, key_codes in parts])
+    table = table.append_column("scraped_at", pa.array(np.full(len(table), int(scraped_at)),
+                                                       pa.timestamp("s", tz="UTC")))
+
+    day = datetime.datetime.fromtimestamp(scraped_at, datetime.timezone.utc).strftime("%Y-%m-%d")
+    folder = os.path.join(config.PRICE_HISTORY_PATH, f"{_PARTITION}={day}")
+    os.makedirs(folder, exist_ok=True)
+    pq.write_table(table, os.path.join(folder, f"run-{int(scraped_at * 1000)}-{uuid.uuid4().hex[:8]}.parquet"))
+    return recorded
+
+
+def load(days: float | None = None, cards: Collection[str] | None = None,
+         retailers: Collection[str] | None = None) -> pd.DataFrame:
+    """
+    Reads recorded listings, pruning whole days and filtering rows inside the parquet reader.
+    :param days: only the last this many days, everything when None
+    :param cards: card names in any spelling, every card when None
+    :param retailers: 3-4 char notation of the retailers, every retailer when None
+    :return: DataFrame with the listing columns, card_key and scraped_at, searches that found
+             nothing have a single row priced EMPTY_SEARCH_CENTS
+    """
+    import pyarrow.dataset as ds
+
+    dataset = _dataset()
+    if dataset is None:
+        return pd.DataFrame(columns=["card_name", "card_set", "condition", "is_foil", "retailer", "stock",
+                                     "price_cents", "frame", "card_key", "scraped_at"])
+
+    condition = None
+
+    def both(expression):
+        return expression if condition is None else condition & expression
+
+    if days is not None:
+        cutoff = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=days)
+        condition = both(ds.field(_PARTITION) >= cutoff.strftime("%Y-%m-%d"))
+        condition = both(ds.field("scraped_at") >= cutoff.to_pydatetime())
+    if cards is not None:
+        condition = both(ds.field("card_key").isin(sorted({canonical_key(card) for card in cards})))
+    if retailers is not None:
+        condition = both(ds.field("retailer").isin(sorted(retailers)))
+
+    df = dataset.to_table(filter=condition).to_pandas()
+    return df.drop(columns=[_PARTITION], errors="ignore")
+
+
+def cheapest(days: float = 30, cards: Collection[str] | None = None) -> pd.DataFrame:
+    """
+    Lowest in-stock price of each card over a period.
+    :param days: how far back to look
+    :param cards: card names in any spelling, every recorded card when None
+    :return: DataFrame with one row per card: its cheapest listing and when it was seen
+    """
+    df = load(days, cards)
+    df = df[df["stock"] > 0]
+    if df.empty:
+        return df
+    best = df.sort_values(["price_cents", "scraped_at"]).drop_duplicates("card_key")
+    return best.sort_values("card_key").reset_index(drop=True)
+
+
+def _run_minimums(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[df["stock"] > 0]
+    grouped = df.groupby(["card_key", "retailer", "scraped_at"], observed=True)
+    return grouped.agg(price_cents=("price_cents", "min"), card_name=("card_name", "first")).reset_index()
+
+
+def price_drops(cards: Collection[str] | None = None, days: float = 30) -> pd.DataFrame:
+    """
+    Cards whose cheapest in-stock price at a retailer fell between its last two recorded searches.
+    :param cards: card names in any spelling, every recorded card when None
+    :param days: how far back to look for the previous search
+    :return: DataFrame of card_key, card_name, retailer, previous_cents, price_cents and drop_cents,
+             largest drop first
+    """
+    runs = _run_minimums(load(days, cards)).sort_values("scraped_at")
+    if runs.empty:
+        return runs.assign(previous_cents=[], drop_cents=[])
+
+    grouped = runs.groupby(["card_key", "retailer"], observed=True)
+    latest = grouped.nth(-1).set_index(["card_key", "retailer"])
+    previous = grouped.nth(-2).set_index(["card_key", "retailer"])
+    both = latest.join(previous["price_cents"].rename("previous_cents"), how="inner")
+    both["drop_cents"] = both["previous_cents"] - both["price_cents"]
+    return both[both["drop_cents"] > 0].sort_values("drop_cents", ascending=False).reset_index()
+
+
+def fresh_listings(keyword_list: list[str], retailers: list[str]) -> dict[tuple[str, str], list[Card]]:
+    """
+    Finds the searches an incremental refresh can skip: the card was searched recently and
+    its price has been steady. Stale searches, and volatile cards searched more than
+    config.VOLATILE_REFRESH_AGE ago, are left out so they are scraped again.
+
+    :param keyword_list: card names about to be searched
+    :param retailers: 3-4 char notation of the retailers about to be searched
+    :return: (retailer, keyword) to the listings of its latest recorded search, empty when it found nothing
+    """
+    df = load(config.PRICE_HISTORY_WINDOW, keyword_list, retailers)
+    if df.empty:
+        return {}
+
+    now = pd.Timestamp.now(tz="UTC")
+    # the latest search counts even when it found the card out of stock everywhere
+    last_seen = df.groupby(["card_key", "retailer"], observed=True)["scraped_at"].max()
+    prices = _run_minimums(df).groupby(["card_key", "retailer"], observed=True)["price_cents"]
+    spread = ((prices.max() - prices.min()) / prices.min().clip(lower=1)).reindex(last_seen.index, fill_value=0)
+
+    age = (now - last_seen).dt.total_seconds()
+    volatile = spread > config.PRICE_VOLATILITY
+    fresh = (age < config.STALE_REFRESH_AGE) & (~volatile | (age < config.VOLATILE_REFRESH_AGE))
+
+    keyword_by_key = {canonical_key(keyword): keyword for keyword in keyword_list}
+    fresh = last_seen[fresh].rename("last_seen").reset_index()
+    latest = df.merge(fresh, on=["card_key", "retailer"])
+    latest = latest[(latest["scraped_at"] == latest["last_seen"]) & latest["card_key"].isin(keyword_by_key)]
+
+    res = {}
+    columns = ["card_key", "card_name", "card_set", "condition", "is_foil", "retailer", "stock", "price_cents", "frame"]
+    for key, card_name, card_set, condition, is_foil, retailer, stock, cents, frame in \
+            latest[columns].itertuples(index=False, name=None):
+        listings = res.setdefault((retailer, keyword_by_key[key]), [])
+        if cents == EMPTY_SEARCH_CENTS:
+            # found nothing recently, there is nothing to search for again yet
+            continue
+        listings.append({
+            'card_name': card_name,
+            'card_set': card_set,
+            'condition': condition,
+            'is_foil': bool(is_foil),
+            'retailer': retailer,
+            'stock': int(stock),
+            'price': Decimal(int(cents)).scaleb(-2),
+            'frame': frame,
+        })
+
+    return res
+
+
+def compact(keep_days: int = 1) -> int:
+    """
+    Merges each older day's run files into one file so reads open fewer files.
+    :param keep_days: the most recent days left untouched, since runs may still append to them
+    :return: the number of days compacted
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not os.path.isdir(config.PRICE_HISTORY_PATH):
+        return 0
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=keep_days)).strftime("%Y-%m-%d")
+
+    res = 0
+    for folder in sorted(os.listdir(config.PRICE_HISTORY_PATH)):
+        path = os.path.join(config.PRICE_HISTORY_PATH, folder)
+        files = sorted(name for name in os.listdir(path) if name.endswith(".parquet"))
+        if folder.split("=")[-1] >= cutoff or len(files) < 2:
+            continue
+
+        # read the files on their own so the date folder is not added as a column
+        table = pa.concat_tables([pq.ParquetFile(os.path.join(path, name)).read() for name in files])
+        pq.write_table(table, os.path.join(path, "compacted.parquet.tmp"))
+        for name in files:
+            os.remove(os.path.join(path, name))
+        os.replace(os.path.join(path, "compacted.parquet.tmp"), os.path.join(path, "compacted.parquet"))
+        res += 1
+
+    return res
+
+
+def log_price_drops(cards: Collection[str]) -> None:
+    """
+    Logs the cards of a search that got cheaper since they were last searched.
+    """
+    logger = logging.getLogger("Card_Logger")
+
+    for row in price_drops(cards).itertuples(index=False):
+        logger.info(f"{row.card_name} @ {row.retailer}: ${deck_cost.format_cents(row.previous_cents)} -> "
+                    f"${deck_cost.format_cents(row.price_cents)}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Query the recorded price history.")
+    parser.add_argument("cards", nargs="*", help="card names, every recorded card when left out")
+    parser.add_argument("--cheapest", type=float, metavar="DAYS", help="cheapest listing over the last DAYS")
+    parser.add_argument("--drops", action="store_true", help="price drops between the last two searches")
+    parser.add_argument("--compact", action="store_true", help="merge each older day's runs into one file")
+    args = parser.parse_args(argv)
+    cards = args.cards or None
+
+    pd.set_option("display.width", 200)
+    if args.cheapest is not None:
+        print(cheapest(args.cheapest, cards).to_string(index=False))
+    if args.drops:
+        print(price_drops(cards).to_string(index=False))
+    if args.compact:
+        print(f"Compacted {compact()} days")
+
+
+if __name__ == "__main__":
+    main()
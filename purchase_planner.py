@@ -0,0 +1,240 @@
+import itertools
+import math
+import time
+from typing import NamedTuple
+import pandas as pd
+import config
+import deck_cost
+from card_keys import canonical_key
+
+
+class PurchasePlan(NamedTuple):
+    """
+    Which listings to buy from which retailer, including shipping.
+    Prices are integer cents.
+    """
+
+    fills: pd.DataFrame
+    subtotals: dict[str, int]
+    shipping: dict[str, int]
+    total_cents: int
+    exact: bool
+    missing: dict[str, int]
+
+
+class _Option(NamedTuple):
+    cost: int
+    contrib: tuple[int, ...]
+    rows: pd.DataFrame
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def shipping_cost(retailer: str, subtotal: int) -> int | None:
+    """
+    Applies config.SHIPPING_RULES to one order.
+    :param retailer: 3-4 char notation for the retailer
+    :param subtotal: order subtotal in cents
+    :return: shipping in cents, or None when the order is below the retailer's minimum
+    """
+    rules = config.SHIPPING_RULES.get(retailer, {})
+    if subtotal < rules.get("min_order", 0):
+        return None
+    if "free_over" in rules and subtotal >= rules["free_over"]:
+        return 0
+    return rules.get("flat", 0)
+
+
+def _card_options(card_df: pd.DataFrame, quantities: dict[str, int],
+                  retailers: list[str]) -> tuple[list[list[_Option]], dict[str, int]]:
+    """
+    Lists the ways each card can be bought: the cheapest fill within every group of retailers,
+    so single retailers as well as every split across them. A card that cannot be filled in
+    full only gets the partial fill across all retailers.
+    """
+    groups = {}
+    for size in range(1, len(retailers)):
+        for group in itertools.combinations(retailers, size):
+            groups[group] = deck_cost.cheapest_fill(card_df[card_df["retailer"].isin(group)], quantities)
+    overall = groups[tuple(retailers)] = deck_cost.cheapest_fill(card_df, quantities)
+
+    grouped = {group: dict(list(fills.fills.groupby(fills.fills["card_name"].map(canonical_key), observed=True)))
+               for group, fills in groups.items()}
+
+    options = []
+    for name in quantities:
+        key = canonical_key(name)
+        card_options = {}
+
+        for group, fills in groups.items():
+            rows = grouped[group].get(key)
+            if rows is None or (name in fills.missing and fills is not overall):
+                continue
+            by_retailer = rows.groupby("retailer", observed=True)["line_cents"].sum()
+            contrib = tuple(int(by_retailer.get(retailer, 0)) for retailer in retailers)
+            # groups whose cheapest fill leaves one of their retailers out repeat a smaller group
+            card_options.setdefault(contrib, _Option(sum(contrib), contrib, rows))
+
+        if card_options:
+            options.append(sorted(card_options.values(), key=lambda option: option.cost))
+
+    return options, overall.missing
+
+
+def _total(retailers: list[str], subtotals: list[int]) -> float:
+    total = 0
+    for retailer, subtotal in zip(retailers, subtotals):
+        if subtotal:
+            shipping = shipping_cost(retailer, subtotal)
+            if shipping is None:
+                return math.inf
+            total += subtotal + shipping
+    return total
+
+
+def _subtotals(options: list[list[_Option]], choice: list[int], size: int) -> list[int]:
+    subtotals = [0] * size
+    for card_options, picked in zip(options, choice):
+        for index, amount in enumerate(card_options[picked].contrib):
+            subtotals[index] += amount
+    return subtotals
+
+
+def _local_search(retailers: list[str], options: list[list[_Option]], choice: list[int],
+                  deadline: float) -> tuple[float, list[int]]:
+    """
+    Moves single cards to another option while that lowers the total, until no move helps.
+    """
+    subtotals = _subtotals(options, choice, len(retailers))
+    best = _total(retailers, subtotals)
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for card, card_options in enumerate(options):
+            current = card_options[choice[card]].contrib
+            for picked, option in enumerate(card_options):
+                if picked == choice[card]:
+                    continue
+                trial = [s - old + new for s, old, new in zip(subtotals, current, option.contrib)]
+                total = _total(retailers, trial)
+                if total < best:
+                    best, subtotals, choice[card] = total, trial, picked
+                    current = option.contrib
+                    improved = True
+
+    return best, choice
+
+
+def _heuristic(retailers: list[str], options: list[list[_Option]],
+               deadline: float) -> tuple[float, list[int]]:
+    """
+    Greedy cheapest option per card within every group of retailers, improved by local search.
+    """
+    best, best_choice = math.inf, [0] * len(options)
+
+    groups = [group for size in range(1, len(retailers) + 1)
+              for group in itertools.combinations(range(len(retailers)), size)]
+    for group in groups:
+        if time.perf_counter() >= deadline and best < math.inf:
+            break
+        allowed = set(group)
+        choice = []
+        for card_options in options:
+            picked = next((index for index, option in enumerate(card_options)
+                           if all(amount == 0 or retailer in allowed
+                                  for retailer, amount in enumerate(option.contrib))), 0)
+            choice.append(picked)
+
+        total, choice = _local_search(retailers, options, choice, deadline)
+        if total < best:
+            best, best_choice = total, list(choice)
+
+    return best, best_choice
+
+
+def _branch_and_bound(retailers: list[str], options: list[list[_Option]], deadline: float,
+                      best: float, best_choice: list[int]) -> tuple[float, list[int], bool]:
+    """
+    Searches every combination of options, pruning on item cost alone since
+    shipping can only drop as an order grows.
+    """
+    order = sorted(range(len(options)),
+                   key=lambda card: options[card][0].cost - options[card][-1].cost)
+    min_rest = [0] * (len(order) + 1)
+    for depth in range(len(order) - 1, -1, -1):
+        min_rest[depth] = min_rest[depth + 1] + options[order[depth]][0].cost
+
+    subtotals = [0] * len(retailers)
+    choice = list(best_choice)
+
+    def search(depth: int, item_cost: int) -> None:
+        nonlocal best, best_choice
+        if time.perf_counter() > deadline:
+            raise _OutOfTime
+        if item_cost + min_rest[depth] >= best:
+            return
+        if depth == len(order):
+            total = _total(retailers, subtotals)
+            if total < best:
+                best, best_choice = total, list(choice)
+            return
+
+        card = order[depth]
+        for picked, option in enumerate(options[card]):
+            for index, amount in enumerate(option.contrib):
+                subtotals[index] += amount
+            choice[card] = picked
+            search(depth + 1, item_cost + option.cost)
+            for index, amount in enumerate(option.contrib):
+                subtotals[index] -= amount
+
+    try:
+        search(0, 0)
+    except _OutOfTime:
+        return best, best_choice, False
+    return best, best_choice, True
+
+
+def plan_purchase(card_df: pd.DataFrame, quantities: dict[str, int] | None = None,
+                  time_budget: float | None = None) -> PurchasePlan:
+    """
+    Picks listings for the whole decklist that minimize item cost plus each retailer's shipping.
+    Decks of up to config.PLANNER_EXACT_LIMIT cards are solved exactly when the time budget allows,
+    larger ones use greedy assignment and local search.
+
+    :param card_df: A dataset of listings with card_name, retailer, price and stock columns.
+    :param quantities: Copies wanted per card name, one of each card when None.
+    :param time_budget: Seconds to spend, config.PLANNER_TIME_BUDGET when None.
+    :return: PurchasePlan, exact is True only when the plan is proven optimal among plans that buy
+             each card from the cheapest listings of the retailers it is bought from.
+    """
+    deadline = time.perf_counter() + (config.PLANNER_TIME_BUDGET if time_budget is None else time_budget)
+    if quantities is None:
+        names = {}
+        for name in dict.fromkeys(card_df["card_name"]):
+            names.setdefault(canonical_key(name), name)
+        quantities = {name: 1 for name in names.values()}
+
+    retailers = sorted(card_df["retailer"].unique()) if not card_df.empty else []
+    options, missing = _card_options(card_df, quantities, retailers)
+
+    best, choice = _heuristic(retailers, options, deadline)
+    exact = False
+    if len(options) <= config.PLANNER_EXACT_LIMIT:
+        best, choice, exact = _branch_and_bound(retailers, options, deadline, best, choice)
+
+    if options:
+        fills = pd.concat([card_options[picked].rows for card_options, picked in zip(options, choice)],
+                          ignore_index=True)
+    else:
+        fills = card_df.iloc[0:0]
+
+    subtotals = _subtotals(options, choice, len(retailers))
+    used = {retailer: subtotal for retailer, subtotal in zip(retailers, subtotals) if subtotal}
+    shipping = {retailer: shipping_cost(retailer, subtotal) or 0 for retailer, subtotal in used.items()}
+
+    return PurchasePlan(fills, used, shipping, sum(used.values()) + sum(shipping.values()),
+                        exact and best < math.inf, missing)
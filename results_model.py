@@ -0,0 +1,150 @@
+import numpy as np
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from card_store import CardStore, format_cents
+
+
+# (header, CardStore column, CardStore string table or None for plain values)
+COLUMNS = (
+    ("Card", "card_name", "names"),
+    ("Set", "card_set", "sets"),
+    ("Condition", "condition", "conditions"),
+    ("Foil", "is_foil", None),
+    ("Retailer", "retailer", "retailers"),
+    ("Stock", "stock", None),
+    ("Price", "price_cents", None),
+    ("Frame", "frame", "frames"),
+)
+
+
+def _matching_codes(values: list[str], wanted: str, part: bool = False) -> np.ndarray:
+    """
+    Marks the codes of a string table that pass a filter, so rows are filtered by code lookups.
+    :param values: StringTable.values
+    :param wanted: value to match, case insensitive
+    :param part: match values containing wanted instead of equal to it
+    :return: bool array indexed by code
+    """
+    wanted = wanted.casefold()
+    if part:
+        return np.fromiter((wanted in value.casefold() for value in values), dtype=bool, count=len(values))
+    return np.fromiter((value.casefold() == wanted for value in values), dtype=bool, count=len(values))
+
+
+class ResultsModel(QAbstractTableModel):
+    """
+    Table model reading straight from a CardStore's columns. The view only asks for the rows
+    on screen, and sorting and filtering only rebuild one array of row numbers,
+    so tens of thousands of listings scroll and sort without building a row per listing.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = CardStore()
+        self._rows = np.arange(0)
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._filters = {}
+
+    def set_store(self, store: CardStore) -> None:
+        """
+        Shows the listings of a finished search, keeping the current sorting and filters.
+        The store must not be appended to while it is shown.
+        """
+        self.beginResetModel()
+        self.store = store
+        self._rebuild()
+        self.endResetModel()
+
+    def set_filters(self, retailer: str = "", condition: str = "", foil: bool | None = None,
+                    frame: str = "", name: str = "") -> None:
+        """
+        :param retailer: only this retailer, every retailer when ""
+        :param condition: only this condition, every condition when ""
+        :param foil: only foil when True, only nonfoil when False, both when None
+        :param frame: only frames that include this keyword, every frame when ""
+        :param name: only cards whose name contains this text, every card when ""
+        """
+        self.beginResetModel()
+        self._filters = {"retailer": retailer, "condition": condition, "foil": foil, "frame": frame, "name": name}
+        self._rebuild()
+        self.endResetModel()
+
+    def _mask(self) -> np.ndarray | None:
+        store = self.store
+        filters = self._filters
+        mask = None
+
+        def both(rows: np.ndarray) -> np.ndarray:
+            return rows if mask is None else mask & rows
+
+        if filters.get("retailer"):
+            mask = both(_matching_codes(store.retailers.values, filters["retailer"])[store.column("retailer")])
+        if filters.get("condition"):
+            mask = both(_matching_codes(store.conditions.values, filters["condition"])[store.column("condition")])
+        if filters.get("foil") is not None:
+            mask = both(store.column("is_foil") == filters["foil"])
+        if filters.get("frame"):
+            mask = both(_matching_codes(store.frames.values, filters["frame"], part=True)[store.column("frame")])
+        if filters.get("name"):
+            mask = both(_matching_codes(store.names.values, filters["name"], part=True)[store.column("card_name")])
+        return mask
+
+    def _sort_key(self, column: int) -> np.ndarray:
+        _, name, table = COLUMNS[column]
+        codes = self.store.column(name)
+        if table is None:
+            return codes.astype(np.int64)
+        # rank each string once, then every row sorts by the rank of its code
+        values = getattr(self.store, table).values
+        rank = np.empty(len(values), dtype=np.int64)
+        rank[sorted(range(len(values)), key=lambda code: values[code].casefold())] = np.arange(len(values))
+        return rank[codes]
+
+    def _rebuild(self) -> None:
+        mask = self._mask()
+        rows = np.arange(len(self.store)) if mask is None else np.flatnonzero(mask)
+        if self._sort_column >= 0:
+            key = self._sort_key(self._sort_column)[rows]
+            if self._sort_order == Qt.DescendingOrder:
+                key = -key
+            rows = rows[np.argsort(key, kind="stable")]
+        self._rows = rows
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        _, name, table = COLUMNS[index.column()]
+
+        if role == Qt.TextAlignmentRole:
+            if table is None and name != "is_foil":
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+            return None
+        if role != Qt.DisplayRole:
+            return None
+
+        value = self.store.column(name)[self._rows[index.row()]]
+        if table is not None:
+            return getattr(self.store, table).values[value]
+        if name == "is_foil":
+            return "Foil" if value else ""
+        if name == "price_cents":
+            return f"${format_cents(value)}"
+        return str(value)
+
+    def sort(self, column, order=Qt.AscendingOrder) -> None:
+        self.layoutAboutToBeChanged.emit()
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild()
+        self.layoutChanged.emit()
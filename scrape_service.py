@@ -0,0 +1,197 @@
+import argparse
+import json
+import logging
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+import web_interaction
+from card_cache import normalize_keyword
+from classes import Card
+
+
+class SearchQueue:
+    """
+    Runs the searches asked for by every client of the service. A (retailer, keyword) search
+    that is already running is not started again, later clients wait on the same result.
+    Searches are scraped with foil and out of stock listings kept, each client filters for itself,
+    so one cached result serves every client whatever its settings.
+    """
+
+    def __init__(self, jobs: int):
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[str, str], Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="scrape")
+        self.searches = 0
+        self.coalesced = 0
+
+    def search(self, searches: list[tuple[str, str]]) -> Iterator[tuple[str, str, list[Card] | None]]:
+        """
+        Streams the results of a client's searches as they finish.
+        :param searches: (retailer, keyword) pairs
+        :return: Iterator of (retailer, keyword, list of datatype Card or None when the search failed)
+        """
+        # spellings of one card that normalize to the same search share its future
+        futures: dict[Future, list[tuple[str, str]]] = {}
+        todo: dict[str, list[str]] = {}
+        owned: dict[tuple[str, str], Future] = {}
+
+        with self._lock:
+            for retailer, keyword in dict.fromkeys(searches):
+                if retailer not in web_interaction.RETAILERS:
+                    continue
+                key = (retailer, normalize_keyword(keyword))
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = owned[key] = Future()
+                    todo.setdefault(retailer, []).append(keyword)
+                    self.searches += 1
+                else:
+                    self.coalesced += 1
+                futures.setdefault(future, []).append((retailer, keyword))
+
+        if todo:
+            self._executor.submit(self._scrape, todo, owned)
+
+        for future in as_completed(futures):
+            for retailer, keyword in futures[future]:
+                yield retailer, keyword, future.result()
+
+    def _finish(self, owned: dict[tuple[str, str], Future], retailer: str, keyword: str,
+                cards: list[Card] | None) -> None:
+        # only a scrape's own futures are resolved, a later scrape of the same search has its own
+        key = (retailer, normalize_keyword(keyword))
+        future = owned.get(key)
+        with self._lock:
+            if future is None or future.done():
+                return
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            future.set_result(cards)
+
+    def _scrape(self, todo: dict[str, list[str]], owned: dict[tuple[str, str], Future]) -> None:
+        logger = logging.getLogger("Card_Logger")
+        keyword_list = list(dict.fromkeys(keyword for keywords in todo.values() for keyword in keywords))
+        skip = {(retailer, keyword) for retailer in todo for keyword in keyword_list
+                if keyword not in todo[retailer]}
+        try:
+            web_interaction.find_all_retailer_pages(keyword_list, list(todo),
+                                                    lambda *result: self._finish(owned, *result), skip=skip)
+        except Exception as error:
+            logger.error(f"Scrape failed: {type(error).__name__}: {error}")
+        finally:
+            # searches that failed never reached _finish, their clients get None
+            for retailer, keywords in todo.items():
+                for keyword in keywords:
+                    self._finish(owned, retailer, keyword, None)
+
+    def status(self) -> dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._in_flight), "searches": self.searches, "coalesced": self.coalesced}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    POST /search with {"searches": [[retailer, keyword], ...]} answers one json line per search
+    as it finishes: {"retailer", "keyword", "cards"}, or "failed" instead of "cards".
+    GET /health answers the queue status.
+    """
+
+    queue: SearchQueue = None
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, {"status": "ok", **self.queue.status()})
+
+    def do_POST(self) -> None:
+        if self.path != "/search":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            searches = [(str(retailer), str(keyword))
+                        for retailer, keyword in json.loads(self.rfile.read(length))["searches"]]
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": "expected {\"searches\": [[retailer, keyword], ...]}"})
+            return
+
+        # no content length, the response ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for retailer, keyword, cards in self.queue.search(searches):
+                entry = {"retailer": retailer, "keyword": keyword}
+                if cards is None:
+                    entry["failed"] = True
+                else:
+                    entry["cards"] = [{**card, 'price': str(card['price'])} for card in cards]
+                self.wfile.write(json.dumps(entry).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client went away, the searches still finish and fill the cache for others
+            pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        logging.getLogger("Card_Logger").debug(format % args)
+
+
+def start_service(host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Serves searches from a background thread. Foil and out of stock listings are kept
+    from now on in this process, since clients filter the results themselves.
+    :param host: address to listen on, 0.0.0.0 to serve the other computers of the shop
+    :param port: port to listen on, 0 picks a free one
+    :return: the running server and its base url
+    """
+    config.ALLOW_FOIL = True
+    config.ALLOW_OUT_OF_STOCK = True
+    handler = type("ConfiguredServiceHandler", (ServiceHandler,), {"queue": SearchQueue(config.SERVICE_JOBS)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+
+def main() -> None:
+    import utils
+
+    parser = argparse.ArgumentParser(description="Scrape for several GUI or CLI clients on the local network.")
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 to accept other computers")
+    parser.add_argument("--port", type=int, default=8402)
+    parser.add_argument("--fixtures", action="store_true",
+                        help="scrape a local fixture server over http instead of the real retailers")
+    args = parser.parse_args()
+
+    logger = utils.instantiate_logger()
+    if args.fixtures:
+        import fixture_server
+
+        fixtures, fixture_url = fixture_server.start_fixture_server(synthesize=True)
+        fixture_server.use_fixture_server(fixture_url)
+        config.RETAILER_BACKENDS = {retailer: "http" for retailer in web_interaction.RETAILERS}
+        logger.info(f"Scraping fixtures on {fixture_url}")
+
+    server, base_url = start_service(args.host, args.port)
+    logger.info(f"Serving searches on {base_url}, set config.SERVICE_URL to it on the clients")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,137 @@
 import logging
-import decimal as dec
-import re
+from typing import Any
 from bs4 import PageElement
+from lxml import etree
+from lxml.html import HtmlElement
 import config
-import utils
-from classes import Card
+from card_store import CardStore, format_cents
+from name_index import same_card
+from normalization import find_frame, price_cents, strip_parentheses
+from parsing import xpath_class
 
 
+_title_xpath = etree.XPath(f"(.//*[{xpath_class('fs-product-title')}])[1]/@aria-label", smart_strings=False)
+_in_stock_xpath = etree.XPath(f"boolean(.//*[{xpath_class('in-stock')}])")
+_vendor_xpath = etree.XPath(f"(.//*[{xpath_class('fs-product-vendor')}])[1]")
+_price_xpath = etree.XPath(f"(.//*[{xpath_class('price')}])[1]")
 
-def clean_string(s):
-    s = re.sub(r'\s*\(.*?\)', '', s)
-    s = s.strip()
-    return s
 
-
-def create_card_401(keyword: str, item: PageElement) -> Card | None:
+def build_card_401(keyword: str, full_card_name: str, in_stock: bool,
+                   card_set: str, price: str, store: CardStore) -> bool:
     """
-        Parses information from the website into a Card datatype.
+        Adds the card 401 Games exposes for one product to the card store.
 
         :param keyword: Name of the card
-        :param item: A part of a html page, one product entry
-        :return: Card datatype
+        :param full_card_name: Product title including set and finish notes
+        :param in_stock: Whether the product can be bought
+        :param card_set: Set name, 401 Games lists it as the vendor
+        :param price: Price text of the product
+        :param store: CardStore the parsed listing is appended to
+        :return: True if a listing was added
     """
     logger = logging.getLogger("Card_Logger")
 
-    full_card_name = item.find(class_="fs-product-title")['aria-label']
-    card_name = clean_string(full_card_name)
+    card_name = strip_parentheses(full_card_name)
     logger.debug(card_name)
 
-    if keyword.lower() != card_name.lower():
-        return
-    if item.find(class_="in-stock") is not None:
+    if not same_card(keyword, card_name):
+        return False
+    if in_stock:
         stock = 1
     else:
         if not config.ALLOW_OUT_OF_STOCK:
-            return
+            return False
         stock = 0
-    if "(Foil)" in card_name:
+    # the finish is one of the notes strip_parentheses removed from the name
+    if "(Foil)" in full_card_name:
         if not config.ALLOW_FOIL:
-            return
+            return False
         is_foil = True
     else:
         is_foil = False
 
-    card_set = item.find(class_="fs-product-vendor").text
-
-    price = item.find(class_="price").text
-    price = re.sub(r'[^0-9.]', '', price)
-
-    res: Card = {
-        'card_name': card_name,
-        'card_set': card_set,
-        'condition': "",
-        'is_foil': is_foil,
-        'retailer': '401G',
-        'stock': stock,
-        'price': dec.Decimal("%0.2f" % float(dec.Decimal(price))),
-        'frame': utils.find_card_frame(full_card_name)
-    }
-    logger.debug(res)
+    store.append(card_name, card_set, "", is_foil, '401G', stock, price_cents(price),
+                 find_frame(full_card_name))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(store.row(-1))
+    return True
+
+
+def create_card_401(keyword: str, item: PageElement, store: CardStore) -> int | None:
+    """
+        Parses information from the website into the card store.
+
+        :param keyword: Name of the card
+        :param item: A part of a html page, one product entry
+        :param store: CardStore the parsed listing is appended to
+        :return: The number of listings added, None if the entry is another card
+    """
+    full_card_name = item.find(class_="fs-product-title")['aria-label']
+
+    if not same_card(keyword, strip_parentheses(full_card_name)):
+        return
+
+    return int(build_card_401(keyword, full_card_name,
+                              item.find(class_="in-stock") is not None,
+                              item.find(class_="fs-product-vendor").text,
+                              item.find(class_="price").text, store))
+
+
+def create_card_401_lxml(keyword: str, item: HtmlElement, store: CardStore) -> int | None:
+    """
+        Same as create_card_401 for an lxml element, using precompiled XPath queries.
+
+        :param keyword: Name of the card
+        :param item: A part of a html page, one product entry
+        :param store: CardStore the parsed listing is appended to
+        :return: The number of listings added, None if the entry is another card
+    """
+    full_card_name = _title_xpath(item)[0]
+
+    if not same_card(keyword, strip_parentheses(full_card_name)):
+        return
+
+    return int(build_card_401(keyword, full_card_name, _in_stock_xpath(item),
+                              _vendor_xpath(item)[0].text_content(),
+                              _price_xpath(item)[0].text_content(), store))
+
+
+def create_cards_401_json(keyword: str, data: dict[str, Any], store: CardStore) -> int:
+    """
+        Parses the store's json search suggestions into the card store.
+
+        :param keyword: Name of the card
+        :param data: Decoded response of the search/suggest.json endpoint
+        :param store: CardStore the parsed listings are appended to
+        :return: The number of listings added
+    """
+    res = 0
+    products = data.get("resources", {}).get("results", {}).get("products", [])
+
+    for product in products:
+        res += build_card_401(keyword, product["title"], product.get("available", False),
+                              product.get("vendor", ""), str(product.get("price", "0")), store)
+
+    return res
+
+
+def create_cards_401_product(keyword: str, data: dict[str, Any], store: CardStore) -> int:
+    """
+        Parses the json of the product page a search redirected to, one listing per variant.
+
+        :param keyword: Name of the card
+        :param data: Decoded response of the products/<handle>.js endpoint
+        :param store: CardStore the parsed listings are appended to
+        :return: The number of listings added
+    """
+    res = 0
+
+    for variant in data.get("variants", []):
+        full_card_name = data.get("title", "")
+        if variant.get("title", "Default Title") != "Default Title":
+            full_card_name = f"{full_card_name} ({variant['title']})"
+        # variant prices are in cents
+        res += build_card_401(keyword, full_card_name, variant.get("available", False),
+                              data.get("vendor", ""), format_cents(variant.get("price", 0)), store)
+
     return res
@@ -0,0 +1,73 @@
+import http.client
+import json
+import threading
+import time
+from collections.abc import Collection, Iterator
+from decimal import Decimal
+from urllib.parse import urlsplit
+import config
+from http_fetch import HTTPStatusError
+from card_store import CardStore
+from classes import Card
+from metrics import RunMetrics
+
+
+def keep_card(card: Card) -> bool:
+    """
+    Applies this client's foil and stock settings, the service keeps every listing.
+    """
+    return (config.ALLOW_FOIL or not card['is_foil']) and (config.ALLOW_OUT_OF_STOCK or card['stock'] > 0)
+
+
+def iter_service_pages(keyword_list: list[str], retailers: list[str], store: CardStore | None = None,
+                       metrics: RunMetrics | None = None, skip: Collection[tuple[str, str]] = (),
+                       cancel: threading.Event | None = None) -> Iterator[tuple[str, str, list[Card]]]:
+    """
+        Streams search results from the scraping service at config.SERVICE_URL,
+        so it can stand in for web_interaction.iter_retailer_pages.
+
+        :param keyword_list: List of card names to search for.
+        :param retailers: 3-4 char notation for each retailer to scrape
+        :param store: CardStore that holds every listing once the generator is exhausted
+        :param metrics: RunMetrics that receives every search, timed from the request
+        :param skip: (retailer, keyword) pairs that are already done and not searched again
+        :param cancel: once set, the iterator ends at the next result, the service still finishes the searches
+        :return: Iterator of (retailer, keyword, list of datatype Card)
+    """
+    searches = [(retailer, keyword) for retailer in retailers for keyword in dict.fromkeys(keyword_list)
+                if (retailer, keyword) not in skip]
+    if not searches:
+        return
+
+    parts = urlsplit(config.SERVICE_URL)
+    connection_type = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_type(parts.hostname, parts.port, timeout=config.SERVICE_TIMEOUT)
+    start = time.perf_counter()
+    try:
+        connection.request("POST", "/search", json.dumps({"searches": searches}),
+                           {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise HTTPStatusError(response.status, config.SERVICE_URL)
+
+        for line in response:
+            entry = json.loads(line)
+            retailer, keyword = entry["retailer"], entry["keyword"]
+            elapsed = time.perf_counter() - start
+            if entry.get("failed"):
+                if metrics is not None:
+                    metrics.record(retailer, keyword, "service", navigation=elapsed, failure="service")
+                continue
+
+            cards = [card for card in ({**card, 'price': Decimal(card['price'])} for card in entry["cards"])
+                     if keep_card(card)]
+            if store is not None:
+                store.extend_cards(cards)
+            if metrics is not None:
+                metrics.record(retailer, keyword, "service", navigation=elapsed, listings=len(cards))
+            yield retailer, keyword, cards
+
+            if cancel is not None and cancel.is_set():
+                return
+    finally:
+        connection.close()
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+import config
+from card_store import price_to_cents
+from deck_cost import cheapest_fill
+from normalization import price_cents
+
+
+def listings(*rows: tuple[str, str, float, int]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["card_name", "retailer", "price", "stock"])
+
+
+def bought(fills: pd.DataFrame) -> list[tuple[str, str, int, int]]:
+    return [(row.card_name, row.retailer, int(row.price_cents), int(row.quantity)) for row in fills.itertuples()]
+
+
+def test_copies_run_down_the_cheapest_listings_across_retailers():
+    card_df = listings(("Sol Ring", "F2F", 3, 2), ("Sol Ring", "WIZ", 1, 1),
+                       ("Sol Ring", "WIZ", 2, 1), ("Sol Ring", "401G", 9, 0))
+    cost = cheapest_fill(card_df, {"Sol Ring": 3})
+
+    assert bought(cost.fills) == [("Sol Ring", "WIZ", 100, 1), ("Sol Ring", "WIZ", 200, 1),
+                                  ("Sol Ring", "F2F", 300, 1)]
+    assert cost.subtotals == {"F2F": 300, "WIZ": 300}
+    assert cost.total_cents == 600
+    assert cost.missing == {}
+
+
+def test_decklist_names_match_listings_whatever_their_spelling():
+    card_df = listings(("Lightning Bolt", "F2F", 1, 4), ("Counterspell", "WIZ", 2, 4))
+    cost = cheapest_fill(card_df, {"lightning bolt (M10) 146": 2, "Counterspell": 1})
+
+    assert bought(cost.fills) == [("Lightning Bolt", "F2F", 100, 2), ("Counterspell", "WIZ", 200, 1)]
+
+
+def test_missing_counts_the_copies_that_could_not_be_bought():
+    card_df = listings(("Sol Ring", "F2F", 1, 1), ("Sol Ring", "WIZ", 2, -3), ("Mana Crypt", "F2F", 99, 0))
+    cost = cheapest_fill(card_df, {"Sol Ring": 3, "Mana Crypt": 1, "Counterspell": 2})
+
+    assert cost.missing == {"Sol Ring": 2, "Mana Crypt": 1, "Counterspell": 2}
+    assert bought(cost.fills) == [("Sol Ring", "F2F", 100, 1)]
+
+
+def test_missing_without_quantities_lists_cards_out_of_stock():
+    cost = cheapest_fill(listings(("Sol Ring", "F2F", 1, 1), ("Mana Crypt", "F2F", 99, 0)))
+
+    assert cost.missing == {"mana crypt": 1}
+    assert cost.total_cents == 100
+
+
+def test_availability_only_listings_cover_any_quantity(monkeypatch):
+    monkeypatch.setattr(config, "AVAILABILITY_ONLY_RETAILERS", ("401G",))
+    card_df = listings(("Sol Ring", "401G", 1, 1), ("Sol Ring", "F2F", 2, 4), ("Counterspell", "401G", 1, 0))
+    cost = cheapest_fill(card_df, {"Sol Ring": 3, "Counterspell": 1})
+
+    assert bought(cost.fills) == [("Sol Ring", "401G", 100, 3)]
+    assert list(cost.fills["availability_only"]) == [True]
+    assert cost.missing == {"Counterspell": 1}
+
+
+def test_an_empty_frame_misses_everything():
+    cost = cheapest_fill(listings(), {"Sol Ring": 2})
+
+    assert cost.missing == {"Sol Ring": 2}
+    assert cost.total_cents == 0
+    assert "availability_only" in cost.fills.columns
+
+
+@pytest.mark.parametrize("text, cents", [
+    ("$1.99", 199), ("CAD $1,234.50", 123450), ("12", 1200), ("$.5", 50), ("0.10", 10),
+    # digits past the cents round half to even
+    ("1.005", 100), ("1.015", 102), ("1.0050", 100), ("1.0051", 101), ("2.994", 299), ("2.999", 300),
+])
+def test_price_cents_reads_and_rounds_like_price_to_cents(text, cents):
+    assert price_cents(text) == cents
+    assert price_to_cents(text.strip("$CAD ").replace(",", "")) == cents
+
+
+def test_price_cents_without_a_price_is_an_error():
+    with pytest.raises(ValueError):
+        price_cents("Out of stock")
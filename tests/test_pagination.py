@@ -0,0 +1,27 @@
+import os
+import web_interaction
+from fixture_server import FIXTURE_DIR
+
+
+def read(retailer: str, name: str) -> str:
+    with open(os.path.join(FIXTURE_DIR, retailer, name), encoding="utf-8") as file_object:
+        return file_object.read()
+
+
+def test_page_count_comes_from_the_pagination_links():
+    assert web_interaction.html_last_page("F2F", read("F2F", "lightning-bolt.html")) == 2
+    assert web_interaction.html_last_page("WIZ", read("WIZ", "lightning-bolt.html")) == 2
+    assert web_interaction.html_last_page("WIZ", read("WIZ", "sol-ring.html")) == 1
+
+
+def test_page_links_outside_the_pagination_are_ignored():
+    html = read("WIZ", "sol-ring.html").replace(
+        "</body>", '<footer><a href="/collections/all?page=9">Sale</a></footer></body>')
+    assert web_interaction.html_last_page("WIZ", html) == 1
+
+
+def test_product_redirects_are_recognised():
+    assert web_interaction.product_json_url("401G", "https://store.401games.ca/products/mana-crypt?x=1") \
+        == "https://store.401games.ca/products/mana-crypt.js"
+    assert web_interaction.product_json_url("401G", "https://store.401games.ca/pages/search-results?q=a") is None
+    assert web_interaction.product_json_url("F2F", "https://www.facetofacegames.com/products/a") is None
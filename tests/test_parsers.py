@@ -0,0 +1,62 @@
+import json
+import os
+import pytest
+import config
+import web_interaction
+from card_store import CardStore
+from fixture_server import FIXTURE_DIR, fixture_pages
+from scraper_401 import create_cards_401_product
+
+
+PAGES = fixture_pages()
+SETTINGS = [(False, False), (True, False), (False, True), (True, True)]
+
+
+@pytest.fixture(params=SETTINGS, ids=lambda setting: f"foil={setting[0]}-oos={setting[1]}")
+def filters(request, monkeypatch):
+    allow_foil, allow_out_of_stock = request.param
+    monkeypatch.setattr(config, "ALLOW_FOIL", allow_foil)
+    monkeypatch.setattr(config, "ALLOW_OUT_OF_STOCK", allow_out_of_stock)
+    return request.param
+
+
+def parse(retailer: str, keyword: str, path: str, backend: str) -> list:
+    with open(path, encoding="utf-8") as file_object:
+        html = file_object.read()
+    store = CardStore()
+    web_interaction.parse_retailer_html(retailer, keyword, html, store, backend)
+    return store.rows()
+
+
+def test_every_kind_of_fixture_is_covered():
+    folders = {os.path.basename(os.path.dirname(path)) for _, _, path in PAGES}
+    assert {"_pages", "_products"} <= folders
+
+
+@pytest.mark.parametrize("retailer, keyword, path", PAGES,
+                         ids=[os.path.relpath(path, FIXTURE_DIR) for _, _, path in PAGES])
+def test_bs4_and_lxml_parse_the_same_rows(retailer, keyword, path, filters):
+    assert parse(retailer, keyword, path, "bs4") == parse(retailer, keyword, path, "lxml")
+
+
+def test_later_pages_hold_listings():
+    later = [(retailer, keyword, path) for retailer, keyword, path in PAGES
+             if os.path.basename(os.path.dirname(path)) == "_pages"]
+    assert later
+    for retailer, keyword, path in later:
+        assert parse(retailer, keyword, path, "lxml")
+
+
+def test_product_json_lists_every_variant(filters):
+    allow_foil, allow_out_of_stock = filters
+    with open(os.path.join(FIXTURE_DIR, "401G", "_products", "mana-crypt.js"), encoding="utf-8") as file_object:
+        data = json.load(file_object)
+    store = CardStore()
+    create_cards_401_product("Mana Crypt", data, store)
+
+    rows = store.rows()
+    # the foil variant is sold out, it only shows with both settings on
+    assert len(rows) == (2 if allow_foil and allow_out_of_stock else 1)
+    assert str(rows[0]['price']) == "249.99"
+    assert all(row['card_name'] == "Mana Crypt" and row['retailer'] == "401G" for row in rows)
+    assert [row['is_foil'] for row in rows] == [False, True][:len(rows)]
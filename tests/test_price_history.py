@@ -0,0 +1,65 @@
+import os
+import time
+from decimal import Decimal
+import pytest
+import config
+import price_history
+from card_store import CardStore
+
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture(autouse=True)
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PRICE_HISTORY_PATH", str(tmp_path / "price_history"))
+    return tmp_path / "price_history"
+
+
+def sol_ring(stock: int = 2, price_cents: int = 150) -> CardStore:
+    store = CardStore()
+    store.append("Sol Ring", "Commander Masters", "NM", False, "F2F", stock, price_cents)
+    return store
+
+
+def test_searches_without_listings_are_recorded_and_skipped():
+    searched = [("F2F", "Sol Ring"), ("F2F", "Mana Crypt"), ("WIZ", "Mana Crypt"), ("WIZ", "mana crypt")]
+    assert price_history.record(sol_ring(), searched) == 1
+
+    fresh = price_history.fresh_listings(["Sol Ring", "Mana Crypt"], ["F2F", "WIZ"])
+    assert fresh[("F2F", "Mana Crypt")] == fresh[("WIZ", "Mana Crypt")] == []
+    assert [card['price'] for card in fresh[("F2F", "Sol Ring")]] == [Decimal("1.50")]
+    assert ("WIZ", "Sol Ring") not in fresh
+
+
+def test_empty_searches_are_not_listings():
+    price_history.record(CardStore(), [("F2F", "Mana Crypt")])
+
+    assert len(price_history.load()) == 1
+    assert price_history.cheapest().empty
+    assert price_history.price_drops().empty
+
+
+def test_a_card_that_sold_out_is_fresh_without_listings():
+    now = time.time()
+    price_history.record(sol_ring(), [("F2F", "Sol Ring")], now - 60)
+    price_history.record(CardStore(), [("F2F", "Sol Ring")], now)
+
+    assert price_history.fresh_listings(["Sol Ring"], ["F2F"]) == {("F2F", "Sol Ring"): []}
+
+
+def test_stale_empty_searches_are_searched_again():
+    price_history.record(CardStore(), [("F2F", "Mana Crypt")], time.time() - config.STALE_REFRESH_AGE - 60)
+
+    assert price_history.fresh_listings(["Mana Crypt"], ["F2F"]) == {}
+
+
+def test_compact_merges_the_runs_of_earlier_days(history):
+    midnight = time.time() // DAY * DAY
+    for scraped_at in (midnight - 3 * DAY + 60, midnight - 3 * DAY + 120, midnight + 60, midnight + 120):
+        price_history.record(sol_ring(), scraped_at=scraped_at)
+
+    assert price_history.compact() == 1
+    files = {folder: sorted(os.listdir(history / folder)) for folder in os.listdir(history)}
+    assert sorted(map(len, files.values())) == [1, 2]
+    assert len(price_history.load()) == 4
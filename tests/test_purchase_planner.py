@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+import config
+from card_store import CardStore
+from purchase_planner import plan_purchase
+
+
+def listings(*rows: tuple[str, str, float, int]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["card_name", "retailer", "price", "stock"])
+
+
+@pytest.fixture
+def flat_shipping(monkeypatch):
+    rules = {retailer: {"flat": 1000} for retailer in ("F2F", "WIZ", "401G")}
+    monkeypatch.setattr(config, "SHIPPING_RULES", rules)
+    return rules
+
+
+def bought(plan) -> dict[tuple[str, str], int]:
+    return {(row.card_name, row.retailer): int(row.quantity) for row in plan.fills.itertuples()}
+
+
+def test_copies_of_a_card_are_split_across_retailers(flat_shipping):
+    card_df = listings(("X", "F2F", 10, 2), ("X", "WIZ", 1, 1), ("Y", "WIZ", 50, 4), ("Z", "F2F", 50, 4))
+    plan = plan_purchase(card_df, {"X": 2, "Y": 1, "Z": 1})
+
+    assert plan.exact
+    assert plan.total_cents == 13100
+    assert bought(plan) == {("X", "F2F"): 1, ("X", "WIZ"): 1, ("Y", "WIZ"): 1, ("Z", "F2F"): 1}
+    assert plan.shipping == {"F2F": 1000, "WIZ": 1000}
+
+
+def test_shipping_can_outweigh_a_cheaper_listing(flat_shipping):
+    card_df = listings(("A", "F2F", 5, 1), ("A", "WIZ", 4, 1), ("B", "F2F", 5, 1))
+    plan = plan_purchase(card_df)
+
+    assert plan.exact
+    assert bought(plan) == {("A", "F2F"): 1, ("B", "F2F"): 1}
+    assert plan.total_cents == 2000
+
+
+def test_large_decks_fall_back_to_the_heuristic(flat_shipping, monkeypatch):
+    monkeypatch.setattr(config, "PLANNER_EXACT_LIMIT", 0)
+    card_df = listings(("A", "F2F", 5, 1), ("A", "WIZ", 4, 1), ("B", "F2F", 5, 1))
+    plan = plan_purchase(card_df)
+
+    assert not plan.exact
+    assert plan.total_cents == 2000
+
+
+def test_an_exhausted_time_budget_is_not_reported_exact(flat_shipping):
+    card_df = listings(("A", "F2F", 5, 1), ("B", "WIZ", 5, 1))
+    plan = plan_purchase(card_df, time_budget=0)
+
+    assert not plan.exact
+    assert plan.total_cents == 3000
+
+
+def test_orders_below_the_minimum_are_avoided(flat_shipping):
+    flat_shipping["WIZ"]["min_order"] = 2000
+    card_df = listings(("A", "F2F", 8, 1), ("A", "WIZ", 5, 1), ("B", "F2F", 8, 1))
+    plan = plan_purchase(card_df)
+
+    assert plan.exact
+    assert set(plan.subtotals) == {"F2F"}
+    assert plan.total_cents == 2600
+
+
+def test_free_shipping_can_make_one_order_cheaper(flat_shipping):
+    flat_shipping["F2F"]["free_over"] = 9000
+    card_df = listings(("A", "F2F", 40, 1), ("A", "WIZ", 35, 1), ("B", "F2F", 50, 1), ("B", "WIZ", 60, 1))
+    plan = plan_purchase(card_df)
+
+    assert plan.exact
+    assert plan.shipping == {"F2F": 0}
+    assert plan.total_cents == 9000
+
+
+def test_cards_nobody_stocks_are_missing(flat_shipping):
+    card_df = listings(("A", "F2F", 5, 1), ("B", "WIZ", 5, 0))
+    plan = plan_purchase(card_df, {"A": 2, "B": 1})
+
+    assert plan.missing == {"A": 1, "B": 1}
+    assert bought(plan) == {("A", "F2F"): 1}
+
+
+@pytest.mark.filterwarnings("error")
+def test_card_store_frames_plan_without_empty_options(flat_shipping):
+    store = CardStore()
+    store.append("A", "M10", "NM", False, "F2F", 1, 500)
+    store.append("A", "M10", "NM", False, "WIZ", 1, 400)
+    store.append("B", "M10", "NM", False, "WIZ", 0, 100)
+    plan = plan_purchase(store.to_dataframe(), {"A": 1, "B": 1})
+
+    assert plan.missing == {"B": 1}
+    assert list(plan.fills["card_name"]) == ["A"]
+    assert plan.total_cents == 1400
@@ -0,0 +1,142 @@
+import threading
+from operator import itemgetter
+import pytest
+import config
+import fixture_server
+import scrape_service
+import service_client
+import web_interaction
+
+
+@pytest.fixture(scope="module")
+def fixture_url():
+    server, base_url = fixture_server.start_fixture_server()
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def offline(fixture_url, monkeypatch):
+    """
+    Scrapes the fixture server over http, without the result cache.
+    """
+    monkeypatch.setattr(config, "RETAILER_BASE_URLS", {retailer: fixture_url for retailer in ("F2F", "WIZ", "401G")})
+    monkeypatch.setattr(config, "RETAILER_BACKENDS", {retailer: "http" for retailer in ("F2F", "WIZ", "401G")})
+    monkeypatch.setattr(config, "USE_CACHE", False)
+    # start_service keeps every listing, these restore the settings afterwards
+    monkeypatch.setattr(config, "ALLOW_FOIL", True)
+    monkeypatch.setattr(config, "ALLOW_OUT_OF_STOCK", True)
+
+
+@pytest.fixture
+def service(offline, monkeypatch):
+    server, base_url = scrape_service.start_service()
+    monkeypatch.setattr(config, "SERVICE_URL", base_url)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def gated(monkeypatch):
+    """
+    Holds every scrape until the gate opens and counts what they searched for.
+    """
+    gate = threading.Event()
+    scraped = []
+    find_all_retailer_pages = web_interaction.find_all_retailer_pages
+
+    def find(keyword_list, retailers, *args, **kwargs):
+        scraped.append((list(keyword_list), list(retailers)))
+        gate.wait(timeout=10)
+        return find_all_retailer_pages(keyword_list, retailers, *args, **kwargs)
+
+    monkeypatch.setattr(web_interaction, "find_all_retailer_pages", find)
+    return gate, scraped
+
+
+def collect(queue: scrape_service.SearchQueue, searches: list[tuple[str, str]], results: list) -> threading.Thread:
+    thread = threading.Thread(target=lambda: results.extend(queue.search(searches)))
+    thread.start()
+    return thread
+
+
+def wait_for(condition) -> None:
+    for _ in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("timed out")
+
+
+def test_identical_searches_of_two_clients_are_scraped_once(offline, gated):
+    gate, scraped = gated
+    queue = scrape_service.SearchQueue(2)
+    first, second = [], []
+
+    threads = [collect(queue, [("F2F", "Sol Ring")], first)]
+    wait_for(lambda: queue.status()["in_flight"] == 1)
+    threads.append(collect(queue, [("F2F", "sol  ring"), ("F2F", "Counterspell")], second))
+    wait_for(lambda: len(scraped) == 2)
+    gate.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert scraped == [(["Sol Ring"], ["F2F"]), (["Counterspell"], ["F2F"])]
+    assert queue.status() == {"in_flight": 0, "searches": 2, "coalesced": 1}
+    assert first[0][2] and first[0][2] == dict((keyword, cards) for _, keyword, cards in second)["sol  ring"]
+
+
+def test_a_finished_scrape_leaves_a_newer_search_of_its_card_alone(offline, monkeypatch):
+    queue = scrape_service.SearchQueue(2)
+    find_all_retailer_pages = web_interaction.find_all_retailer_pages
+    scrapes, threads, later = [], [], []
+
+    def find(keyword_list, retailers, on_listings, *args, **kwargs):
+        scrapes.append(keyword_list)
+        if len(scrapes) > 1:
+            return find_all_retailer_pages(keyword_list, retailers, on_listings, *args, **kwargs)
+        on_listings("F2F", "Sol Ring", [])
+        # a second client asks for the same card before the first scrape has wrapped up
+        threads.append(collect(queue, [("F2F", "Sol Ring")], later))
+        wait_for(lambda: queue.status()["in_flight"] == 1)
+
+    monkeypatch.setattr(web_interaction, "find_all_retailer_pages", find)
+    assert list(queue.search([("F2F", "Sol Ring")])) == [("F2F", "Sol Ring", [])]
+    # the first client has its result before the second one starts
+    wait_for(lambda: threads)
+    threads[0].join(timeout=10)
+
+    assert len(later) == 1 and later[0][2]
+
+
+def test_spellings_of_one_card_each_get_a_result(offline):
+    queue = scrape_service.SearchQueue(1)
+    results = list(queue.search([("WIZ", "Sol Ring"), ("WIZ", "Counterspell"), ("WIZ", "sol ring")]))
+
+    assert sorted(keyword for _, keyword, _ in results) == ["Counterspell", "Sol Ring", "sol ring"]
+    cards = {keyword: cards for _, keyword, cards in results}
+    assert cards["Sol Ring"] and cards["Sol Ring"] == cards["sol ring"]
+    assert queue.status()["searches"] == 2
+
+
+def test_search_streams_every_result_to_the_client(service):
+    results = list(service_client.iter_service_pages(["Sol Ring", "Lightning Bolt"], ["F2F", "WIZ"]))
+
+    assert sorted((retailer, keyword) for retailer, keyword, _ in results) == [
+        ("F2F", "Lightning Bolt"), ("F2F", "Sol Ring"), ("WIZ", "Lightning Bolt"), ("WIZ", "Sol Ring")]
+    assert all(cards for _, _, cards in results)
+
+
+def test_clients_filter_the_listings_themselves(service, monkeypatch):
+    everything = [card for _, _, cards in service_client.iter_service_pages(["Lightning Bolt"], ["F2F", "WIZ"])
+                  for card in cards]
+    monkeypatch.setattr(config, "ALLOW_FOIL", False)
+    monkeypatch.setattr(config, "ALLOW_OUT_OF_STOCK", False)
+    filtered = [card for _, _, cards in service_client.iter_service_pages(["Lightning Bolt"], ["F2F", "WIZ"])
+                for card in cards]
+
+    assert any(card['is_foil'] or card['stock'] <= 0 for card in everything)
+    # the retailers finish in any order, their listings keep theirs
+    by_retailer = itemgetter('retailer')
+    assert sorted(filtered, key=by_retailer) == sorted(
+        (card for card in everything if not card['is_foil'] and card['stock'] > 0), key=by_retailer)
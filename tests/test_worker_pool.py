@@ -0,0 +1,70 @@
+import queue
+import pytest
+import worker_pool
+
+
+class FakeProcess:
+    def __init__(self, exitcode: int | None):
+        self.exitcode = exitcode
+        self.terminated = False
+
+    def start(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+    def join(self) -> None:
+        pass
+
+
+class FakeChannel:
+    """
+    Hands out the scripted messages, raising queue.Empty where the script has None.
+    """
+
+    def __init__(self, messages: list):
+        self.messages = messages
+
+    def get(self, timeout: float):
+        message = self.messages.pop(0)
+        if message is None:
+            raise queue.Empty
+        return message
+
+
+class FakeContext:
+    def __init__(self, messages: list, exitcodes: list[int | None]):
+        self.channel = FakeChannel(messages)
+        self.exitcodes = list(exitcodes)
+
+    def Queue(self) -> FakeChannel:
+        return self.channel
+
+    def Event(self):
+        return worker_pool.threading.Event()
+
+    def Process(self, **kwargs) -> FakeProcess:
+        return FakeProcess(self.exitcodes.pop(0))
+
+
+def run_pool(monkeypatch, messages: list, exitcodes: list[int | None]) -> list:
+    context = FakeContext(messages, exitcodes)
+    monkeypatch.setattr(worker_pool.multiprocessing, "get_context", lambda method: context)
+    try:
+        return list(worker_pool.iter_worker_pages(["a", "b"], ["F2F"], 2))
+    finally:
+        # every message is read before the pool gives up on its workers
+        assert messages == []
+
+
+def test_a_worker_that_exited_after_done_is_not_a_crash(monkeypatch):
+    # worker 0 has already sent "done" and exited when the channel first comes up empty
+    messages = [None, ("listings", "F2F", "b", []), ("done", 0, [], {}), ("done", 1, [], {})]
+    assert run_pool(monkeypatch, messages, [0, None]) == [("F2F", "b", [])]
+
+
+def test_a_killed_worker_is_reported_once(monkeypatch):
+    messages = [None, ("done", 0, [], {}), ("listings", "F2F", "b", []), ("done", 1, [], {})]
+    with pytest.raises(RuntimeError, match="1 scraping workers failed: worker exited with code -9"):
+        run_pool(monkeypatch, messages, [-9, None])
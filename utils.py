@@ -1,8 +1,22 @@
+import itertools
 import logging
-import re
+import threading
+from collections.abc import Callable, Collection, Iterator
 from pandas import DataFrame
 import config
+import deck_cost
+import output_writers
+import price_history
+from card_cache import get_cache
+from card_keys import DeckIndex, search_name
+from name_index import correct_name, get_index
+import purchase_planner
+from metrics import RunMetrics
+import service_client
 import web_interaction
+import worker_pool
+from card_store import CardStore
+from classes import Card
 
 
 def instantiate_logger() -> logging:
@@ -19,93 +33,259 @@ def instantiate_logger() -> logging:
 
 def text_to_list() -> list[str]:
     """
-    Converts a .txt file into a list of card names.
+    Converts a .txt file into a list of card names, one per card however many lines name it.
     Expects conventional decklist notation `#   CardName`
     :return: a list of card names
     """
+    index = DeckIndex(correct_name)
+    index.add_file(config.FILENAME)
+    return index.keyword_list()
 
-    file_object = open(config.FILENAME, "r")
-    lines = file_object.readlines()
-    key_list = [re.sub(r'^\d+\s+', '', item).rstrip('\n') for item in lines]
 
-    file_object.close()
-    return key_list
+def text_to_quantities(path: str | None = None) -> dict[str, int]:
+    """
+    Reads a decklist keeping how many copies of each card are wanted.
+    Lines without a leading count are read as one copy, lines naming the same card
+    (in any casing, with set codes or with both faces) are added together.
+    :param path: decklist to read, config.FILENAME when None
+    :return: a dictionary of card name to quantity, in decklist order
+    """
+    index = DeckIndex(correct_name)
+    index.add_file(path or config.FILENAME)
+    return index.quantities()
 
 
-def cost_of_deck(card_df: DataFrame) -> None:
+def cost_of_deck(card_df: DataFrame, quantities: dict[str, int] | None = None) -> deck_cost.DeckCost:
     """
-    Pulls The first time a name is used and gets the price.
-    Adds the prices together to create an estimate of the deck cost.
-    :param card_df: A dataset that contains names and prices.
-    :return: nothing.
+    Finds the cheapest listings that cover the wanted copies of every card,
+    splitting across listings and retailers when one listing lacks enough stock.
+    Logs each purchase, the subtotal per retailer and the estimated deck cost.
+    :param card_df: A dataset that contains names, prices and stock.
+    :param quantities: Copies wanted per card name, one of each card when None.
+    :return: the DeckCost that was logged.
     """
     logger = logging.getLogger("Card_Logger")
 
-    # card_names_group = card_df.groupby('card_name')['price'].min().reset_index()
-    idx = card_df.groupby('card_name')['price'].idxmin()
-    card_details = card_df.loc[idx].reset_index(drop=True)
-    price = 0
+    cost = deck_cost.cheapest_fill(card_df, quantities)
+
+    for row in cost.fills.itertuples(index=False):
+        logger.info(f"{row.quantity}x {row.card_name} \nPr: ${deck_cost.format_cents(row.price_cents)} "
+                    f"Rt: {row.retailer} Cd: {row.condition}"
+                    + (" (availability only, check the quantity)" if row.availability_only and row.quantity > 1
+                       else ""))
+
+    for retailer, subtotal in cost.subtotals.items():
+        logger.info(f"{retailer} subtotal: ${deck_cost.format_cents(subtotal)}")
 
-    for index, row in card_details.iterrows():
-        logger.info(f"{row['card_name']} \nPr: ${row['price']} Rt: {row['retailer']} Cd: {row['condition']}")
-        price += row['price']
+    for name, short in cost.missing.items():
+        logger.info(f"{name}: {short} more needed than found in stock")
 
-    logger.info(f"Lowest cost estimated total of ${price:.2f}")
+    logger.info(f"Lowest cost estimated total of ${deck_cost.format_cents(cost.total_cents)}")
+    return cost
 
 
-def find_card_frame(full_card_name: str) -> str:
+def plan_of_deck(card_df: DataFrame, quantities: dict[str, int] | None = None) -> purchase_planner.PurchasePlan:
     """
-    Takes the provided card name from the retailer
-    and finds any frame keywords.
-    :param full_card_name: Name from the retailer
-    which sometimes provides frame information.
-    :return: a string containing all the frame keywords
+    Plans which retailers to order from once shipping is counted and logs the orders.
+    :param card_df: A dataset that contains names, prices, stock and retailers.
+    :param quantities: Copies wanted per card name, one of each card when None.
+    :return: the PurchasePlan that was logged.
     """
-    res = ""
+    logger = logging.getLogger("Card_Logger")
 
-    keywords = {"extended", "borderless", "promo", "serial numbered", "showcase", "oversized",
-                "retro", "chinese", "japanese"}
+    plan = purchase_planner.plan_purchase(card_df, quantities)
 
-    for keyword in keywords:
-        if keyword in full_card_name.lower():
-            if res == "":
-                res += keyword
-            else:
-                res += f", {keyword}"
-    return res
+    for retailer, subtotal in plan.subtotals.items():
+        logger.info(f"Order from {retailer}: ${deck_cost.format_cents(subtotal)} "
+                    f"+ ${deck_cost.format_cents(plan.shipping[retailer])} shipping")
 
+    kind = "optimal" if plan.exact else "best found"
+    logger.info(f"Cheapest total with shipping ({kind}) of ${deck_cost.format_cents(plan.total_cents)}")
+    return plan
 
-def run_search(temp) -> None:
-    if temp == "Full_Run":
-        keyword_list = text_to_list()
-    else:
-        keyword_list = [temp]
-    master_card_list = []
-    f2f_card_list = []
-    wiz_card_list = []
-    g401_card_list = []
-    logger = logging.getLogger("Card_Logger")
+
+def enabled_retailers() -> list[str]:
+    """
+    Reads the config toggles to find which retailers should be scraped.
+    :return: 3-4 char notation for each enabled retailer
+    """
+    retailers = []
 
     if config.IS_F2F_SCRAPE:
-        f2f_card_list = web_interaction.find_retailer_pages(keyword_list, "F2F")
+        retailers.append("F2F")
 
     if config.IS_WIZ_SCRAPE:
-        wiz_card_list = web_interaction.find_retailer_pages(keyword_list, "WIZ")
+        retailers.append("WIZ")
 
     if config.IS_401_SCRAPE:
-        g401_card_list = web_interaction.find_retailer_pages(keyword_list, "401G")
+        retailers.append("401G")
+
+    return retailers
+
 
-    master_card_list += f2f_card_list + wiz_card_list + g401_card_list
+def warm_up() -> None:
+    """
+    Opens what the first search needs while the user is still typing: the name index,
+    the result cache and, with config.PREWARM_BROWSER, the browser session when a retailer uses it.
+    Importing this module already loaded pandas, playwright and the parsers.
+    """
+    logger = logging.getLogger("Card_Logger")
+    get_index()
+    get_cache()
+
+    if config.PREWARM_BROWSER and not config.SERVICE_URL and any(
+            web_interaction.retailer_backend(retailer) == "browser" for retailer in enabled_retailers()):
+        try:
+            web_interaction.warm_browser()
+        except Exception as error:
+            logger.debug(f"Browser warm up failed: {type(error).__name__}: {error}")
+
+
+def iter_search(keyword_list: list[str], store: CardStore, metrics: RunMetrics,
+                skip: Collection[tuple[str, str]] = (),
+                cancel: threading.Event | None = None) -> Iterator[tuple[str, str, list[Card]]]:
+    """
+    Streams the searches of the enabled retailers, from the scraping service when config.SERVICE_URL
+    is set, else in worker processes when config.SCRAPE_WORKERS asks for more than one.
+    :param keyword_list: card names to search for
+    :param store: CardStore that receives every listing
+    :param metrics: RunMetrics that receives the timing of every search
+    :param skip: (retailer, keyword) pairs that are already done
+    :param cancel: once set, searches that have not started are skipped
+    :return: Iterator of (retailer, keyword, list of datatype Card)
+    """
+    if config.SERVICE_URL:
+        return service_client.iter_service_pages(keyword_list, enabled_retailers(), store, metrics, skip, cancel)
+    workers = worker_pool.worker_count(len(keyword_list))
+    if workers > 1:
+        return worker_pool.iter_worker_pages(keyword_list, enabled_retailers(), workers, store, metrics, skip,
+                                             cancel)
+    return web_interaction.iter_retailer_pages(keyword_list, enabled_retailers(), store, metrics, skip, cancel)
+
+
+def reuse_recent(keyword_list: list[str], store: CardStore, metrics: RunMetrics,
+                 skip: Collection[tuple[str, str]] = ()) -> dict[tuple[str, str], list[Card]]:
+    """
+    Takes the searches the price history says are recent and steady enough to skip,
+    adding their last recorded listings to the store.
+    :param keyword_list: card names about to be searched
+    :param store: CardStore of the run
+    :param metrics: RunMetrics of the run
+    :param skip: (retailer, keyword) pairs that are already done
+    :return: (retailer, keyword) to the reused listings
+    """
+    logger = logging.getLogger("Card_Logger")
+    try:
+        recent = price_history.fresh_listings(keyword_list, enabled_retailers())
+        recent = {pair: cards for pair, cards in recent.items() if pair not in skip}
+    except ImportError:
+        logger.info("Incremental refresh needs the pyarrow package, searching everything")
+        return {}
 
-    if master_card_list:
+    if recent:
+        logger.info(f"{len(recent)} searches are recent and steady, reusing their prices")
+    for (retailer, keyword), cards in recent.items():
+        store.extend_cards(cards)
+        metrics.record(retailer, keyword, "history", listings=len(cards))
+    return recent
 
-        df = DataFrame(master_card_list)
+
+def record_history(store: CardStore, metrics: RunMetrics) -> None:
+    """
+    Appends what this run scraped to the price history and logs the prices that dropped.
+    The run files of earlier days are merged as it goes, quick searches each add a small file.
+    """
+    logger = logging.getLogger("Card_Logger")
+    searched = [(metric['retailer'], metric['keyword']) for metric in metrics.searches
+                if metric['source'] not in ("cache", "history") and not metric['failure']]
+    if not searched:
+        return
+
+    try:
+        with metrics.stage("history"):
+            price_history.record(store, searched)
+            price_history.log_price_drops({keyword for _, keyword in searched})
+            price_history.compact()
+    except ImportError:
+        logger.info("Price history needs the pyarrow package")
+
+
+def run_search(temp, on_update: Callable[[str, str, list[Card], int], None] | None = None,
+               cancel: threading.Event | None = None) -> CardStore:
+    """
+    Scrapes the enabled retailers for one card or the whole decklist.
+    Results are logged, streamed to the results file and passed to on_update as each search finishes,
+    the full cost analysis runs once every retailer is done.
+    :param temp: a card name, or "Full_Run" to read the decklist in config.FILENAME
+    :param on_update: Called with (retailer, keyword, cards, running total in cents) per search
+    :param cancel: set from another thread to stop the run once the searches in progress are done,
+                   what was found is saved but not costed
+    :return: CardStore with every listing found
+    """
+    if temp == "Full_Run":
+        quantities = text_to_quantities()
+    else:
+        quantities = {correct_name(search_name(temp)): 1}
+    keyword_list = list(quantities)
+    logger = logging.getLogger("Card_Logger")
+
+    store = CardStore()
+    metrics = RunMetrics()
+    running = deck_cost.RunningTotal(quantities)
+    writer = output_writers.open_writer() if config.OUTPUT_CSV else None
+
+    recent = {}
+    if config.INCREMENTAL_REFRESH and config.PRICE_HISTORY:
+        recent = reuse_recent(keyword_list, store, metrics)
+    results = itertools.chain(((retailer, keyword, cards) for (retailer, keyword), cards in recent.items()),
+                              iter_search(keyword_list, store, metrics, skip=recent, cancel=cancel))
+
+    try:
+        with metrics.stage("scrape"):
+            for retailer, keyword, cards in results:
+                running.add(cards)
+                logger.info(f"{keyword} @ {retailer}: {len(cards)} listings, "
+                            f"running total ${deck_cost.format_cents(running.total_cents)}")
+                if writer is not None:
+                    writer.write(cards)
+                if on_update is not None:
+                    on_update(retailer, keyword, cards, running.total_cents)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if config.PRICE_HISTORY:
+        record_history(store, metrics)
+
+    if cancel is not None and cancel.is_set():
+        logger.info(f"Search cancelled after {len(metrics.searches)} searches.")
+    elif len(store):
+
+        df = store.to_dataframe()
         logger.debug(df)
-        cost_of_deck(df)
-        if config.OUTPUT_CSV:
-            logger.info("Sorting dictionary")
-            df = df.sort_values(by=['card_name', 'price', 'is_foil', 'condition'])
-            df.to_csv(config.OUTPUT_PATH)
+        with metrics.stage("cost"):
+            cost_of_deck(df, quantities)
+        if config.PLAN_PURCHASE:
+            with metrics.stage("plan"):
+                plan_of_deck(df, quantities)
     else:
         logger.info("Failed to find.")
+
+    write_run_report(metrics)
     logger.info("Program finished.")
+    return store
+
+
+def write_run_report(metrics: RunMetrics) -> None:
+    """
+    Logs the per-retailer summary and writes the report files named in config.
+    :param metrics: timings of the finished run
+    """
+    metrics.log_summary()
+
+    if config.METRICS_REPORT:
+        metrics.write_json(f"{config.METRICS_REPORT}.json")
+        metrics.write_csv(f"{config.METRICS_REPORT}.csv")
+
+    if config.METRICS_PROMETHEUS:
+        metrics.write_prometheus(config.METRICS_PROMETHEUS)
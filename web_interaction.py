@@ -1,100 +1,587 @@
+import asyncio
+import json
 import logging
-from typing import Any
+import queue
+import re
+import threading
+import time
+from collections.abc import Callable, Collection, Iterator
+from typing import Any, NamedTuple
+from urllib.parse import quote, urlsplit, urlunsplit
 from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
-from F2F_scraper import create_card_batch_F2F
-from scraper_401 import create_card_401
-from wizards_tower_scraper import create_card_batch_WIZ
+from lxml import etree
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import config
+import http_fetch
+from adaptive_wait import FETCH_ERRORS, backoff_delay, is_transient, rate_limit_delay, wait_timeout
+from browser_session import BrowserSession, get_session
+from card_cache import get_cache
+from F2F_scraper import create_card_batch_F2F, create_card_batch_F2F_lxml
+from card_store import CardStore
+from classes import Card
+from metrics import RunMetrics
+from parsing import parse_html, xpath_class
+from scraper_401 import create_card_401, create_card_401_lxml, create_cards_401_json, create_cards_401_product
+from wizards_tower_scraper import create_card_batch_WIZ, create_card_batch_WIZ_lxml
 
 
-# TODO: G401 Figure out how to deal with redirects.
+# Everything the scraper needs to know about a storefront search page.
+# The browser waits for either "wait_selector" or the "empty_selector" no-results marker,
+# "wait_until" is "commit" for stores that render their results with javascript.
+# Later result pages are found from the links matching "page_links" inside "pagination_selector"
+# ("lxml_pagination" over http) and fetched with "page_param" added to the search url.
+# "json_url"/"json_parser" are optional and only used by the "json" backend.
+# A search that redirects to a url under "product_path" is read from that product's json with
+# "product_parser", the browser also stops waiting at "product_selector".
+RETAILERS = {
+    "F2F": {
+        "url": "https://www.facetofacegames.com/search/?keyword={keyword}"
+               "&general brand=Magic%3A The Gathering",
+        "wait_until": "commit",
+        "wait_selector": ".hawk-results__action-stockPrice",
+        "empty_selector": ".hawk-results__no-results",
+        "results_selector": ".hawk-results",
+        "item_class": "hawk-results-item__inner",
+        "parser": create_card_batch_F2F,
+        "lxml_items": etree.XPath(f"//*[{xpath_class('hawk-results-item__inner')}]"),
+        "lxml_parser": create_card_batch_F2F_lxml,
+        "page_param": "pg",
+        "page_links": re.compile(r"[?&;]pg=(\d+)"),
+        "pagination_selector": ".hawk-pagination",
+        "lxml_pagination": etree.XPath(f"//*[{xpath_class('hawk-pagination')}]//a/@href", smart_strings=False),
+    },
+    "WIZ": {
+        "url": "https://www.kanatacg.com/products/search?q={keyword}&c=1",
+        "wait_until": "domcontentloaded",
+        "wait_selector": ".inner .product",
+        "empty_selector": ".inner .no-results",
+        "results_selector": ".inner",
+        "item_class": "product enable-msrp",
+        "parser": create_card_batch_WIZ,
+        "lxml_items": etree.XPath(f"//*[{xpath_class('product enable-msrp')}]"),
+        "lxml_parser": create_card_batch_WIZ_lxml,
+        "page_param": "page",
+        "page_links": re.compile(r"[?&;]page=(\d+)"),
+        "pagination_selector": ".pagination",
+        "lxml_pagination": etree.XPath(f"//*[{xpath_class('pagination')}]//a/@href", smart_strings=False),
+    },
+    "401G": {
+        "url": "https://store.401games.ca/pages/search-results?q={keyword}"
+               "&filters=Category,Magic:+The+Gathering+Singles",
+        "wait_until": "commit",
+        "wait_selector": "#products-grid .fs-results-product-card",
+        "empty_selector": "#products-grid .fs-no-results",
+        "results_selector": "#products-grid",
+        "item_class": "fs-results-product-card",
+        "parser": create_card_401,
+        "lxml_items": etree.XPath(f"//*[{xpath_class('fs-results-product-card')}]"),
+        "lxml_parser": create_card_401_lxml,
+        "page_param": "page",
+        "page_links": re.compile(r"[?&;]page=(\d+)"),
+        "pagination_selector": ".fs-pagination",
+        "lxml_pagination": etree.XPath(f"//*[{xpath_class('fs-pagination')}]//a/@href", smart_strings=False),
+        "product_path": "/products/",
+        "product_selector": "form[action*='/cart/add']",
+        "product_parser": create_cards_401_product,
+        "json_url": "https://store.401games.ca/search/suggest.json?q={keyword}"
+                    "&resources[type]=product&resources[limit]=10",
+        "json_parser": create_cards_401_json,
+    },
+}
 
-def find_retailer_pages(keyword_list: list[str], retailer: str) -> list[Any] | None:
+
+def retailer_backend(retailer: str) -> str:
     """
-        Opens the online storefront on a card name
-        and gets the page html for each search of the card name.
+        Finds how a retailer should be fetched, falling back to the browser
+        when the configured backend is not supported by that retailer.
 
         :param retailer: 3-4 char notation for the retailer
-        :param keyword_list: List of card names to search for.
-        :return: List of datatype Card.
+        :return: "browser", "http" or "json"
+    """
+    backend = config.RETAILER_BACKENDS.get(retailer, "browser")
+    if backend == "json" and "json_url" not in RETAILERS[retailer]:
+        return "browser"
+    if backend not in ("browser", "http", "json"):
+        return "browser"
+    return backend
+
+
+def retailer_url(retailer: str, keyword: str, kind: str = "url") -> str:
+    """
+        Builds the search url for a keyword, pointing at config.RETAILER_BASE_URLS
+        instead of the live store when an override is set.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword: Name of the card to search for
+        :param kind: "url" for the search page or "json_url" for the data endpoint
+        :return: Percent encoded absolute url
+    """
+    url = RETAILERS[retailer][kind].format(keyword=quote(keyword, safe=""))
+    url = quote(url, safe=":/?&=%,+")
+
+    base_url = config.RETAILER_BASE_URLS.get(retailer)
+    if base_url:
+        base = urlsplit(base_url)
+        parts = urlsplit(url)
+        url = urlunsplit((base.scheme, base.netloc, parts.path, parts.query, ""))
+
+    return url
+
+
+def page_url(retailer: str, keyword: str, page_number: int) -> str:
+    """
+        Builds the url of a later results page of a search.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword: Name of the card to search for
+        :param page_number: 2 for the second page
+        :return: Percent encoded absolute url
+    """
+    return f"{retailer_url(retailer, keyword)}&{RETAILERS[retailer]['page_param']}={page_number}"
+
+
+def last_page(retailer: str, links: str) -> int:
     """
+        Finds how many results pages a search has from its pagination links.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param links: the hrefs of the search page's pagination links
+        :return: The highest page number linked, 1 when there are no links
+    """
+    return max(map(int, RETAILERS[retailer]["page_links"].findall(links)), default=1)
+
+
+def html_last_page(retailer: str, html: str) -> int:
+    """
+        Finds how many results pages a search has from a downloaded search page,
+        only counting the links of its pagination block.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param html: html of the whole search page
+        :return: The highest page number linked, 1 when there are no links
+    """
+    site = RETAILERS[retailer]
+    # most searches fit on one page, those skip parsing the page a second time
+    if not site["page_links"].search(html):
+        return 1
+    tree = parse_html(html)
+    if tree is None:
+        return 1
+    return last_page(retailer, " ".join(site["lxml_pagination"](tree)))
+
+
+def product_json_url(retailer: str, url: str) -> str | None:
+    """
+        Recognises a search that redirected straight to a product page.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param url: The url the search ended on
+        :return: The url of the product's json, None when the url is not a product page
+    """
+    product_path = RETAILERS[retailer].get("product_path")
+    parts = urlsplit(url)
+    if not product_path or not parts.path.startswith(product_path):
+        return None
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip("/") + ".js", "", ""))
+
+
+def parse_retailer_html(retailer: str, keyword: str, html: str, store: CardStore,
+                        parser_backend: str | None = None) -> int:
+    """
+        Parses the results section of a retailer search page into the card store.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword: Name of the card that was searched
+        :param html: Inner html of the results section
+        :param store: CardStore the listings are appended to
+        :param parser_backend: "lxml" or "bs4", config.PARSER_BACKEND when None
+        :return: The number of listings added
+    """
+    res = 0
+    site = RETAILERS[retailer]
+
+    if (parser_backend or config.PARSER_BACKEND) == "lxml":
+        tree = parse_html(html)
+        if tree is None:
+            return res
+        for item in site["lxml_items"](tree):
+            res += site["lxml_parser"](keyword, item, store) or 0
+        return res
+
+    soup = BeautifulSoup(html, 'html5lib')
+    for item in soup.find_all(class_=site["item_class"]):
+        res += site["parser"](keyword, item, store) or 0
+
+    return res
+
+
+def parse_retailer_json(retailer: str, keyword: str, text: str, store: CardStore) -> int:
+    """
+        Parses the response of a retailer's json search endpoint into the card store.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword: Name of the card that was searched
+        :param text: Raw json body
+        :param store: CardStore the listings are appended to
+        :return: The number of listings added
+    """
+    return RETAILERS[retailer]["json_parser"](keyword, json.loads(text), store)
+
 
-    res = []
+class FetchedPage(NamedTuple):
+    """
+    What one request of a search brought back.
+    """
+    body: str
+    # "html" results section, "json" search endpoint or "product" json of a redirect
+    kind: str = "html"
+    # results pages of the search, read from the pagination links of the first page
+    pages: int = 1
+
+
+class ScrapeRun:
+    """
+    State shared by every retailer of one scrape.
+    """
+
+    def __init__(self, store: CardStore,
+                 on_listings: Callable[[str, str, list[Card]], None] | None = None,
+                 metrics: RunMetrics | None = None, cancel: threading.Event | None = None):
+        self.store = store
+        self.on_listings = on_listings
+        self.metrics = RunMetrics() if metrics is None else metrics
+        self.cancel = cancel
+        self.total_slots = asyncio.Semaphore(max(1, config.MAX_PAGES_TOTAL))
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    def publish(self, retailer: str, keyword: str, cards: list[Card]) -> None:
+        if self.on_listings is not None:
+            self.on_listings(retailer, keyword, cards)
+
+
+def failure_reason(error: Exception) -> str:
+    """
+        Sorts a failed search into a short reason for the run report.
+
+        :param error: exception raised while fetching
+        :return: "timeout", "http" or the exception name
+    """
+    if isinstance(error, (PlaywrightTimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(error, http_fetch.HTTPStatusError):
+        return f"http {error.status}"
+    if isinstance(error, ConnectionError):
+        return "http"
+    return type(error).__name__
+
+
+async def _scrape_retailer(session: BrowserSession | None, retailer: str, keyword_list: list[str],
+                           run: ScrapeRun) -> None:
+    """
+        Searches every keyword on one retailer, either with the pages of the retailer's
+        warm browser context or with pooled http requests.
+        Browser searches stop waiting as soon as the no-results marker shows up and time out
+        after what this retailer usually needs, transient failures are retried with backoff.
+        Requests are spaced out by config.RETAILER_RATE_LIMITS.
+        Each successful search is written to the result cache as it finishes.
+        Later results pages, up to config.MAX_RESULT_PAGES, are fetched at the same time once the
+        first page shows how many there are, and a search that redirects to a product page is
+        read from that product's json.
+
+        :param session: BrowserSession kept between searches, None when no retailer needs a browser
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword_list: List of card names to search for.
+        :param run: Store, page limit, listener and metrics shared with the other retailers
+    """
     logger = logging.getLogger("Card_Logger")
-    logger.info(f"Scraping {retailer}")
+    backend = retailer_backend(retailer)
+    logger.info(f"Scraping {retailer} ({backend})")
+    site = RETAILERS[retailer]
+    cache = get_cache()
+    slot_count = max(1, min(config.MAX_PAGES_PER_RETAILER, len(keyword_list)))
+
+    # the retailer's own page or slot is taken before the overall one, so the searches queued on
+    # one retailer never hold the overall slots the other retailers need
+    async def fetch_product(url: str, timing: dict[str, float]) -> FetchedPage | None:
+        async with run.total_slots:
+            if run.cancelled:
+                return None
+            start = time.perf_counter()
+            response = await http_fetch.fetch_text_async(url)
+            timing['navigation'] += time.perf_counter() - start
+        return FetchedPage(response.text, "product")
+
+    context = None
+    if backend == "browser":
+        context = await session.context(retailer, retailer_url(retailer, ""))
+        waits = wait_timeout(retailer)
+        ready_selector = ", ".join(site[key] for key in ("wait_selector", "empty_selector", "product_selector")
+                                   if key in site)
+
+        async def fetch(url: str, timing: dict[str, float], attempt: int) -> FetchedPage | None:
+            page = await context.acquire(run.metrics)
+            try:
+                async with run.total_slots:
+                    # pages still waiting for a slot are dropped once the run is cancelled
+                    if run.cancelled:
+                        return None
+                    start = time.perf_counter()
+                    await page.goto(url, wait_until=site["wait_until"], timeout=config.NAVIGATION_TIMEOUT * 1000)
+                    timing['navigation'] = time.perf_counter() - start
+
+                    timeout = waits.seconds(attempt)
+                    start = time.perf_counter()
+                    try:
+                        marker = await page.wait_for_selector(ready_selector, timeout=timeout * 1000)
+                    except PlaywrightTimeoutError:
+                        # timed out searches count in the wait statistics too
+                        timing['wait'] = time.perf_counter() - start
+                        waits.timed_out(timeout)
+                        raise
+                    timing['wait'] = time.perf_counter() - start
+                    waits.observe(timing['wait'])
+
+                    product_url = product_json_url(retailer, page.url)
+                    if product_url is None:
+                        if await marker.evaluate("(element, selector) => element.matches(selector)",
+                                                 site["empty_selector"]):
+                            return FetchedPage("")
+                        links = await page.eval_on_selector_all(
+                            f"{site['pagination_selector']} a[href]",
+                            "links => links.map(link => link.getAttribute('href'))")
+                        return FetchedPage(await page.inner_html(site["results_selector"]),
+                                           pages=last_page(retailer, " ".join(links)))
+            finally:
+                await context.release(page)
+            # the product json is small, there is no need to keep the page while it downloads
+            return await fetch_product(product_url, timing)
+    else:
+        retailer_slots = asyncio.Semaphore(slot_count)
 
-    with sync_playwright() as playwright:
-        browser = playwright.chromium.launch(headless=True)
-        page = browser.new_page()
+        async def fetch(url: str, timing: dict[str, float], attempt: int) -> FetchedPage | None:
+            async with retailer_slots, run.total_slots:
+                if run.cancelled:
+                    return None
+                start = time.perf_counter()
+                response = await http_fetch.fetch_text_async(url)
+                timing['navigation'] = time.perf_counter() - start
+            if backend == "json":
+                return FetchedPage(response.text, "json")
+            product_url = product_json_url(retailer, response.url)
+            if product_url is not None:
+                return await fetch_product(product_url, timing)
+            return FetchedPage(response.text, pages=html_last_page(retailer, response.text))
 
-        for keyword in keyword_list:
+    # gives the page, None when it failed or the run was cancelled, with its timing, the retries
+    # made and the error that ended the last attempt
+    async def fetch_retrying(url: str) -> tuple[FetchedPage | None, dict[str, float], int, Exception | None]:
+        attempt = 0
+        while True:
+            timing = {'navigation': 0.0, 'wait': 0.0}
+            delay = rate_limit_delay(retailer)
+            if delay:
+                await asyncio.sleep(delay)
             try:
+                return await fetch(url, timing, attempt), timing, attempt, None
+            except FETCH_ERRORS as error:
+                failure = error
 
-                if retailer == "F2F":
-                    page.goto(
-                        "https://www.facetofacegames.com/search/?keyword=" + keyword +
-                        "&general brand=Magic%3A The Gathering",
-                        wait_until="domcontentloaded")
+            if attempt >= config.FETCH_RETRIES or not is_transient(failure):
+                return None, timing, attempt, failure
+            # back off without holding a page slot so other keywords keep going
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
 
-                    page.wait_for_selector('.hawk-results__action-stockPrice',
-                                           timeout=5000)
+    async def visit(keyword: str) -> None:
+        kind = "json_url" if backend == "json" else "url"
+        first, timing, attempt, failure = await fetch_retrying(retailer_url(retailer, keyword, kind))
+        if first is None:
+            if failure is not None:
+                logger.info(f"{keyword}: failed, retailer {retailer} ({failure_reason(failure)})")
+                run.metrics.record(retailer, keyword, backend, **timing, failure=failure_reason(failure),
+                                   retries=attempt)
+            return
 
-                elif retailer == "WIZ":
-                    page.goto(
-                        "https://www.kanatacg.com/products/search?q=" + keyword + "&c=1",
-                        wait_until="domcontentloaded")
+        pages = [first]
+        complete = True
+        page_count = min(first.pages, max(1, config.MAX_RESULT_PAGES))
+        if page_count > 1:
+            later = await asyncio.gather(*(fetch_retrying(page_url(retailer, keyword, number))
+                                           for number in range(2, page_count + 1)))
+            for number, (page, page_timing, retries, failure) in enumerate(later, 2):
+                attempt += retries
+                if page is not None:
+                    pages.append(page)
+                    continue
+                complete = False
+                if failure is not None:
+                    logger.info(f"{keyword}: page {number} failed, retailer {retailer} "
+                                f"({failure_reason(failure)}), results are incomplete")
+            # the later pages loaded side by side, the slowest of them adds to the search
+            for key in timing:
+                timing[key] += max(page_timing[key] for _, page_timing, _, _ in later)
+        elif first.pages > 1:
+            logger.debug(f"{keyword}: {first.pages} results pages, retailer {retailer}, reading the first")
 
-                    page.wait_for_selector('.inner',
-                                           timeout=5000)
+        # parsing does not await, so the listings of this keyword end up next to each other
+        start = len(run.store)
+        parse_start = time.perf_counter()
+        try:
+            for page in pages:
+                if page.kind == "json":
+                    parse_retailer_json(retailer, keyword, page.body, run.store)
+                elif page.kind == "product":
+                    site["product_parser"](keyword, json.loads(page.body), run.store)
+                elif page.body:
+                    parse_retailer_html(retailer, keyword, page.body, run.store)
+        except ValueError:
+            run.store.truncate(start)
+            logger.info(f"{keyword}: unreadable response, retailer {retailer}")
+            run.metrics.record(retailer, keyword, backend, **timing, failure="parse", retries=attempt)
+            return
+        run.metrics.record(retailer, keyword, backend, **timing, parse=time.perf_counter() - parse_start,
+                           listings=len(run.store) - start, retries=attempt)
 
-                elif retailer == "401G":
-                    page.goto(
-                        "https://store.401games.ca/pages/search-results?q=" + keyword +
-                        "&filters=Category,Magic:+The+Gathering+Singles",
-                        wait_until="domcontentloaded")
+        if cache is not None or run.on_listings is not None:
+            cards = run.store.rows(start)
+            # a search missing some of its pages is shown but searched again next time
+            if cache is not None and complete:
+                cache.put(retailer, keyword, cards, "\n".join(page.body for page in pages))
+            run.publish(retailer, keyword, cards)
 
-                    page.wait_for_selector('#products-grid', timeout=5000)
+    try:
+        await asyncio.gather(*(visit(keyword) for keyword in keyword_list))
+    finally:
+        if context is not None:
+            context.finish_search()
+    logger.info(f"Finished {retailer}")
 
-                else:
-                    return
 
-            except:
-                logger.info(f"{keyword}: failed, retailer {retailer}")
-                continue
+async def _find_all_retailer_pages(missing: dict[str, list[str]], run: ScrapeRun,
+                                   session: BrowserSession | None = None) -> None:
+    await asyncio.gather(*(_scrape_retailer(session, retailer, keywords, run)
+                           for retailer, keywords in missing.items()))
 
-            if retailer == "F2F":
-                html = page.inner_html('.hawk-results')
 
-                soup = BeautifulSoup(html, 'html5lib')
-                for item in soup.find_all(class_="hawk-results-item__inner"):
-                    card_batch = create_card_batch_F2F(keyword, item)
+def find_all_retailer_pages(keyword_list: list[str], retailers: list[str],
+                            on_listings: Callable[[str, str, list[Card]], None] | None = None,
+                            store: CardStore | None = None, metrics: RunMetrics | None = None,
+                            skip: Collection[tuple[str, str]] = (),
+                            cancel: threading.Event | None = None) -> CardStore:
+    """
+        Scrapes several retailers at the same time from one shared browser, which stays open
+        between searches with a warm context per retailer.
+        Each retailer gets up to config.MAX_PAGES_PER_RETAILER pages and no more than
+        config.MAX_PAGES_TOTAL pages are loading at once overall.
+        Searches with a fresh cache entry are served from the cache unless
+        config.FORCE_REFRESH is set, and each keyword is only searched once.
+
+        :param keyword_list: List of card names to search for.
+        :param retailers: 3-4 char notation for each retailer to scrape
+        :param on_listings: Called with (retailer, keyword, cards) as soon as each search is done
+        :param store: CardStore to append to, a new one when None
+        :param metrics: RunMetrics that receives the timing of every search
+        :param skip: (retailer, keyword) pairs that are already done and not searched again
+        :param cancel: once set, searches that have not started are skipped
+        :return: CardStore holding the listings of every retailer.
+    """
+    logger = logging.getLogger("Card_Logger")
+    retailers = [retailer for retailer in retailers if retailer in RETAILERS]
+    unique_keywords = list(dict.fromkeys(keyword_list))
+    cache = get_cache()
+    run = ScrapeRun(CardStore() if store is None else store, on_listings, metrics, cancel)
+    missing = {}
+
+    for retailer in retailers:
+        found = {}
+        if cache is not None and not config.FORCE_REFRESH:
+            found = cache.get_many(retailer, [keyword for keyword in unique_keywords
+                                              if (retailer, keyword) not in skip])
+            if found:
+                logger.info(f"{retailer}: {len(found)} of {len(unique_keywords)} from cache")
+            for keyword, cards in found.items():
+                run.store.extend_cards(cards)
+                run.metrics.record(retailer, keyword, "cache", listings=len(cards))
+                run.publish(retailer, keyword, cards)
+
+        todo = [keyword for keyword in unique_keywords if keyword not in found and (retailer, keyword) not in skip]
+        if todo:
+            missing[retailer] = todo
 
-                    if card_batch is not None:
-                        res += card_batch
+    if missing:
+        if any(retailer_backend(retailer) == "browser" for retailer in missing):
+            # browser searches run on the session's loop, which keeps the browser open for the next search
+            session = get_session()
+            session.run(_find_all_retailer_pages(missing, run, session))
+        else:
+            asyncio.run(_find_all_retailer_pages(missing, run))
+        if cache is not None:
+            cache.evict()
 
-            elif retailer == "WIZ":
-                html = page.inner_html('.inner')
+    return run.store
 
-                soup = BeautifulSoup(html, 'html5lib')
-                for item in soup.find_all(class_="product enable-msrp"):
-                    card_batch = create_card_batch_WIZ(keyword, item)
 
-                    if card_batch is not None:
-                        res += card_batch
+def iter_retailer_pages(keyword_list: list[str], retailers: list[str], store: CardStore | None = None,
+                        metrics: RunMetrics | None = None,
+                        skip: Collection[tuple[str, str]] = (),
+                        cancel: threading.Event | None = None) -> Iterator[tuple[str, str, list[Card]]]:
+    """
+        Streams search results while the scrape is still running.
+        The scrape runs on a background thread and each search is yielded as soon as it finishes.
 
-            elif retailer == "401G":
-                html = page.inner_html('#products-grid')
+        :param keyword_list: List of card names to search for.
+        :param retailers: 3-4 char notation for each retailer to scrape
+        :param store: CardStore that holds every listing once the generator is exhausted
+        :param metrics: RunMetrics that receives the timing of every search
+        :param skip: (retailer, keyword) pairs that are already done and not searched again
+        :param cancel: once set, searches that have not started are skipped and the iterator ends
+                       when the ones in progress are done
+        :return: Iterator of (retailer, keyword, list of datatype Card)
+    """
+    batches = queue.Queue()
+    finished = object()
+    errors = []
 
-                soup = BeautifulSoup(html, 'html5lib')
-                for item in soup.find_all(class_="fs-results-product-card"):
-                    card = create_card_401(keyword, item)
+    def scrape() -> None:
+        try:
+            find_all_retailer_pages(keyword_list, retailers,
+                                    lambda *batch: batches.put(batch), store, metrics, skip, cancel)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            batches.put(finished)
 
-                    if card is not None:
-                        res.append(card)
-            else:
-                return
+    threading.Thread(target=scrape, daemon=True).start()
 
-        logger.info(f"Finished {retailer}")
-        browser.close()
+    while (batch := batches.get()) is not finished:
+        yield batch
 
-    return res
+    if errors:
+        raise errors[0]
+
+
+def warm_browser() -> None:
+    """
+        Starts the browser session ahead of the first search.
+        It stays open until it has been idle for config.BROWSER_IDLE_TIMEOUT seconds.
+    """
+    session = get_session()
+    session.run(session.start())
+
+
+def find_retailer_pages(keyword_list: list[str], retailer: str) -> list[Any] | None:
+    """
+        Opens the online storefront on a card name
+        and gets the page html for each search of the card name.
+
+        :param retailer: 3-4 char notation for the retailer
+        :param keyword_list: List of card names to search for.
+        :return: List of datatype Card.
+    """
+    if retailer not in RETAILERS:
+        return
+
+    return find_all_retailer_pages(keyword_list, [retailer]).rows()
@@ -1,28 +1,36 @@
 import logging
-import decimal as dec
-import re
 from bs4 import PageElement
+from lxml import etree
+from lxml.html import HtmlElement
 import config
-import utils
-from classes import Card, CardCondition
+from card_store import CardStore
+from name_index import same_card
+from normalization import find_frame, price_cents, strip_title_notes, wiz_condition
+from parsing import FindNext, xpath_class
 
 
-def create_card_batch_WIZ(keyword: str, item: PageElement) -> list[Card] | None:
+_find_name = FindNext("name")
+_find_category = FindNext("category")
+_row_xpath = etree.XPath(f".//div[{xpath_class('variant-row')}][{xpath_class('row')}]")
+_qty_xpath = etree.XPath(f"(.//*[{xpath_class('variant-qty')}])[1]")
+_description_xpath = etree.XPath(f"(.//*[{xpath_class('variant-description')}])[1]")
+_price_xpath = etree.XPath(f"(.//*[{xpath_class('regular price')}])[1]")
+_no_stock_price_xpath = etree.XPath(f"(.//*[{xpath_class('price no-stock')}])[1]")
+
+
+def match_WIZ(keyword: str, full_card_name: str) -> tuple[str, bool] | None:
     """
-    Parses information from the website into a card datatype for each different card found.
+    Checks a product title against the searched card name and the foil setting.
 
     :param keyword: Name of the card
-    :param item: A part of a html page, one product entry
-    :return: A list of dictionaries containing the parsed properties of the item
+    :param full_card_name: Product title, which can carry set, finish and frame notes
+    :return: The card name without notes and whether it is foil, None if it should be skipped
     """
-
-    res = []
     logger = logging.getLogger("Card_Logger")
-    full_card_name = item.find_next(class_="name").text
-    card_name = re.sub(r"(?:\s*\(.*|\s* - .*)?", "", full_card_name)
+    card_name = strip_title_notes(full_card_name)
     logger.debug(card_name)
 
-    if keyword.lower() != card_name.lower() or "- Art Series" in full_card_name:
+    if not same_card(keyword, card_name) or "- Art Series" in full_card_name:
         return
 
     if " Foil" in full_card_name:
@@ -32,48 +40,99 @@ def create_card_batch_WIZ(keyword: str, item: PageElement) -> list[Card] | None:
     else:
         is_foil = False
 
-    card_set = item.find_next(class_="category").text
+    return card_name, is_foil
 
-    frame = utils.find_card_frame(full_card_name)
 
-    for row in item.find_all(lambda tag: tag.name == 'div' and 'variant-row'
-                                         in tag.get('class', []) and 'row' in tag.get('class', [])):
+def create_card_batch_WIZ(keyword: str, item: PageElement, store: CardStore) -> int | None:
+    """
+    Parses information from the website into the card store for each different card found.
 
-        stock = row.find(class_="variant-qty").text.split()[0]
-        if "Out" in stock:
-            if not config.ALLOW_OUT_OF_STOCK:
-                continue
-            stock = 0
+    :param keyword: Name of the card
+    :param item: A part of a html page, one product entry
+    :param store: CardStore the parsed listings are appended to
+    :return: The number of listings added, None if the entry is another card
+    """
 
-        condition_test = row.find(class_="variant-description").text
+    full_card_name = item.find_next(class_="name").text
+    match = match_WIZ(keyword, full_card_name)
+    if match is None:
+        return
 
-        if "NM" in condition_test:
-            condition = CardCondition.NM.value
-        elif "Slightly Played" in condition_test:
-            condition = CardCondition.SP.value
-        elif "Moderately Played" in condition_test:
-            condition = CardCondition.MP.value
-        else:
-            condition = ""
+    card_set = item.find_next(class_="category").text
+    rows = []
 
+    for row in item.find_all(lambda tag: tag.name == 'div' and 'variant-row'
+                                         in tag.get('class', []) and 'row' in tag.get('class', [])):
         price_tag = row.find(class_="regular price")
 
         if price_tag is None:
             price_tag = row.find(class_="price no-stock")
 
-        price_tag = price_tag.text.split()[1]
-
-        res_card: Card = {
-            'card_name': card_name,
-            'card_set': card_set,
-            'condition': condition,
-            'is_foil': is_foil,
-            'retailer': 'WIZ',
-            'stock': stock,
-            'price': dec.Decimal("%0.2f" % float(dec.Decimal(price_tag))),
-            'frame': frame
-        }
-        logger.debug(res_card)
-        res.append(res_card)
+        rows.append((row.find(class_="variant-qty").text, row.find(class_="variant-description").text,
+                     None if price_tag is None else price_tag.text))
+
+    return add_listings_WIZ(*match, full_card_name, card_set, rows, store)
+
+
+def create_card_batch_WIZ_lxml(keyword: str, item: HtmlElement, store: CardStore) -> int | None:
+    """
+    Same as create_card_batch_WIZ for an lxml element, using precompiled XPath queries.
+
+    :param keyword: Name of the card
+    :param item: A part of a html page, one product entry
+    :param store: CardStore the parsed listings are appended to
+    :return: The number of listings added, None if the entry is another card
+    """
+    full_card_name = _find_name(item).text_content()
+    match = match_WIZ(keyword, full_card_name)
+    if match is None:
+        return
+
+    card_set = _find_category(item).text_content()
+    rows = []
+
+    for row in _row_xpath(item):
+        price_tag = _price_xpath(row) or _no_stock_price_xpath(row)
+        rows.append((_qty_xpath(row)[0].text_content(), _description_xpath(row)[0].text_content(),
+                     price_tag[0].text_content() if price_tag else None))
+
+    return add_listings_WIZ(*match, full_card_name, card_set, rows, store)
+
+
+def add_listings_WIZ(card_name: str, is_foil: bool, full_card_name: str, card_set: str,
+                     rows: list[tuple[str, str, str | None]], store: CardStore) -> int:
+    """
+    Turns the variant rows read from one product entry into listings.
+
+    :param card_name: Name of the card
+    :param is_foil: Whether the product is foil
+    :param full_card_name: Product title, used to find frame keywords
+    :param card_set: Set name
+    :param rows: (quantity text, description, price text) of every variant row
+    :param store: CardStore the parsed listings are appended to
+    :return: The number of listings added
+    """
+
+    res = 0
+    logger = logging.getLogger("Card_Logger")
+
+    frame = find_frame(full_card_name)
+
+    for qty_text, condition_test, price_tag in rows:
+        # a variant without a price cannot be bought
+        if price_tag is None:
+            continue
+
+        stock = qty_text.split()[0]
+        if "Out" in stock:
+            if not config.ALLOW_OUT_OF_STOCK:
+                continue
+            stock = 0
+
+        store.append(card_name, card_set, wiz_condition(condition_test), is_foil, 'WIZ', int(stock),
+                     price_cents(price_tag), frame)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(store.row(-1))
+        res += 1
 
     return res
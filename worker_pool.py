@@ -0,0 +1,152 @@
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
+from collections.abc import Collection, Iterator
+from typing import Any
+import config
+import web_interaction
+from browser_session import close_session
+from card_store import CardStore
+from classes import Card
+from metrics import RunMetrics
+
+
+def worker_count(keyword_count: int) -> int:
+    """
+    Number of scraping processes to start for a search.
+    :param keyword_count: unique keywords in the search
+    :return: config.SCRAPE_WORKERS, every core when it is 0, never more than the keywords
+    """
+    workers = config.SCRAPE_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, keyword_count))
+
+
+def split_keywords(keyword_list: list[str], workers: int) -> list[list[str]]:
+    """
+    Deals unique keywords out round-robin so every worker gets a similar mix of searches.
+    :param keyword_list: card names, duplicates are searched once
+    :param workers: number of chunks
+    :return: one non-empty keyword list per worker
+    """
+    unique_keywords = list(dict.fromkeys(keyword_list))
+    return [chunk for chunk in (unique_keywords[i::workers] for i in range(workers)) if chunk]
+
+
+def config_snapshot() -> dict[str, Any]:
+    """
+    Copies the settings of this process, including changes made in the GUI,
+    since spawned workers import config.py fresh.
+    :return: setting name to value
+    """
+    return {name: value for name, value in vars(config).items() if name.isupper()}
+
+
+def _scrape_chunk(index: int, keyword_list: list[str], retailers: list[str], snapshot: dict[str, Any],
+                  log_level: int, channel, skip: set[tuple[str, str]], stop) -> None:
+    """
+    Worker entry point. Scrapes one chunk with its own browser and sends
+    log records, listings and finally its metrics back over the channel.
+    Setting the shared stop event cancels the searches that have not started.
+    """
+    vars(config).update(snapshot)
+    logger = logging.getLogger("Card_Logger")
+    logger.handlers.clear()
+    logger.addHandler(logging.handlers.QueueHandler(channel))
+    logger.setLevel(log_level)
+    logger.propagate = False
+
+    metrics = RunMetrics()
+    try:
+        web_interaction.find_all_retailer_pages(keyword_list, retailers,
+                                                lambda *batch: channel.put(("listings", *batch)),
+                                                CardStore(), metrics, skip, stop)
+    except Exception as error:
+        channel.put(("error", f"{type(error).__name__}: {error}"))
+    finally:
+        # multiprocessing workers skip atexit, so the browser is closed here
+        close_session()
+        channel.put(("done", index, metrics.searches, metrics.blocked))
+
+
+def iter_worker_pages(keyword_list: list[str], retailers: list[str], workers: int,
+                      store: CardStore | None = None,
+                      metrics: RunMetrics | None = None,
+                      skip: Collection[tuple[str, str]] = (),
+                      cancel: threading.Event | None = None) -> Iterator[tuple[str, str, list[Card]]]:
+    """
+        Streams search results from several scraping processes, each with its own browser.
+        Keywords are split between the processes and their results merged into one store,
+        so it can stand in for web_interaction.iter_retailer_pages on large decklists.
+
+        :param keyword_list: List of card names to search for.
+        :param retailers: 3-4 char notation for each retailer to scrape
+        :param workers: number of processes
+        :param store: CardStore that holds every listing once the generator is exhausted
+        :param metrics: RunMetrics that receives the timing of every search
+        :param skip: (retailer, keyword) pairs that are already done and not searched again
+        :param cancel: once set, the workers skip searches that have not started and the iterator
+                       ends when the ones in progress are done
+        :return: Iterator of (retailer, keyword, list of datatype Card)
+    """
+    logger = logging.getLogger("Card_Logger")
+    chunks = split_keywords([keyword for keyword in keyword_list
+                             if any((retailer, keyword) not in skip for retailer in retailers)], workers)
+    # spawn everywhere: forking a process that already runs Qt or playwright threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    channel = context.Queue()
+    stop = context.Event()
+    snapshot = config_snapshot()
+    if not chunks:
+        return
+    logger.info(f"Splitting {sum(map(len, chunks))} keywords over {len(chunks)} processes")
+
+    processes = [context.Process(target=_scrape_chunk, daemon=True,
+                                 args=(index, chunk, retailers, snapshot, logger.getEffectiveLevel(), channel,
+                                       {pair for pair in skip if pair[1] in chunk}, stop))
+                 for index, chunk in enumerate(chunks)]
+    for process in processes:
+        process.start()
+
+    errors = []
+    finished = set()
+    running = len(processes)
+    try:
+        while running:
+            if cancel is not None and cancel.is_set() and not stop.is_set():
+                stop.set()
+            try:
+                message = channel.get(timeout=0.2)
+            except queue.Empty:
+                # a worker that crashed or was killed never sends "done", one that exited cleanly
+                # has sent it and it is still on its way
+                for index, process in enumerate(processes):
+                    if index not in finished and process.exitcode:
+                        finished.add(index)
+                        running -= 1
+                        errors.append(f"worker exited with code {process.exitcode}")
+                continue
+            if isinstance(message, logging.LogRecord):
+                logger.handle(message)
+            elif message[0] == "listings":
+                _, retailer, keyword, cards = message
+                if store is not None:
+                    store.extend_cards(cards)
+                yield retailer, keyword, cards
+            elif message[0] == "error":
+                errors.append(message[1])
+            elif message[0] == "done" and message[1] not in finished:
+                finished.add(message[1])
+                running -= 1
+                if metrics is not None:
+                    metrics.merge(message[2], message[3])
+    finally:
+        for process in processes:
+            if running:
+                process.terminate()
+            process.join()
+
+    if errors:
+        raise RuntimeError(f"{len(errors)} scraping workers failed: {errors[0]}")